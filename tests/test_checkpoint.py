@@ -0,0 +1,110 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from context import woogenerator
+from woogenerator.checkpoint import CheckpointStore
+from woogenerator.matching import Match
+from woogenerator.namespace.core import MatchNamespace, ParserNamespace
+from woogenerator.parsing.abstract import CsvParseBase, ImportObject
+from woogenerator.utils import Registrar
+
+
+class TestCheckpointStore(unittest.TestCase):
+    object_count = 100
+
+    def setUp(self):
+        Registrar.DEBUG_ERROR = False
+        Registrar.DEBUG_WARN = False
+        Registrar.DEBUG_MESSAGE = False
+        Registrar.DEBUG_PROGRESS = False
+        self.path = tempfile.mkdtemp('_checkpoint')
+
+        self.parsers = ParserNamespace()
+        for name, offset in [('master', 0), ('slave', self.object_count)]:
+            parser = CsvParseBase([], {})
+            for rowcount in range(offset, offset + self.object_count):
+                parser.register_object(ImportObject(
+                    {'E-mail': 'user%d@example.com' % rowcount},
+                    rowcount=rowcount
+                ))
+            setattr(self.parsers, name, parser)
+        self.parsers.anomalous['master.noemails'] = [
+            self.parsers.master.objects[0]
+        ]
+
+        self.matches = MatchNamespace()
+        for rowcount in range(self.object_count):
+            self.matches.globals.add_match(Match(
+                [self.parsers.master.objects[rowcount]],
+                [self.parsers.slave.objects[self.object_count + rowcount]]
+            ))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_save_load(self):
+        store = CheckpointStore(self.path)
+        store.save_parsers(self.parsers)
+        store.save('matches', self.matches)
+        store.progress = 'report'
+
+        store = CheckpointStore(self.path)
+        self.assertEqual(store.progress, 'report')
+        matches = store.load('matches')
+        # loading matches loads the parsers it refers to
+        self.assertEqual(sorted(store.loaded.keys()), ['master', 'matches', 'slave'])
+        master = store.load('master')
+        slave = store.load('slave')
+        self.assertEqual(len(matches.globals), self.object_count)
+        for rowcount, match in enumerate(matches.globals):
+            self.assertIs(match.m_object, master.objects[rowcount])
+            self.assertIs(
+                match.s_object, slave.objects[self.object_count + rowcount]
+            )
+        self.assertIn(0, matches.globals.m_indices)
+
+        parsers = store.load_parsers()
+        self.assertIs(parsers.master, master)
+        self.assertIs(parsers.anomalous['master.noemails'][0], master.objects[0])
+
+    def test_lazy_load(self):
+        store = CheckpointStore(self.path)
+        store.save_parsers(self.parsers)
+        store.save('settings', {'progress': 'sync'})
+
+        store = CheckpointStore(self.path)
+        self.assertEqual(store.load('settings'), {'progress': 'sync'})
+        self.assertEqual(store.loaded.keys(), ['settings'])
+        with self.assertRaises(UserWarning):
+            store.load('updates')
+
+    def test_parsers_saved_once(self):
+        store = CheckpointStore(self.path)
+        store.save_parsers(self.parsers)
+        master_size = os.path.getsize(store.get_stage_path('master'))
+        store.save('matches', self.matches)
+        # matches only refer to the objects stored with the parsers
+        self.assertLess(
+            os.path.getsize(store.get_stage_path('matches')), master_size
+        )
+        os.remove(store.get_stage_path('master'))
+        store.save_parsers(self.parsers)
+        self.assertFalse(os.path.exists(store.get_stage_path('master')))
+
+    def test_version(self):
+        store = CheckpointStore(self.path)
+        store.progress = 'sync'
+        with open(store.manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+        manifest['version'] = CheckpointStore.version + 1
+        with open(store.manifest_path, 'w') as manifest_file:
+            json.dump(manifest, manifest_file)
+        with self.assertRaises(UserWarning):
+            CheckpointStore(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
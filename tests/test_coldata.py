@@ -1,17 +1,27 @@
 import logging
+import os
+import re
+import shutil
+import tempfile
+import time
 import unittest
 from collections import OrderedDict
+from copy import deepcopy
 from pprint import pformat, pprint
 from unittest import TestCase
 
+import jsonpath_ng
+import mock
 import pytest
+from tabulate import tabulate
 
-from context import woogenerator
+from context import get_testdata, woogenerator
 from woogenerator.coldata import (ColDataAbstract, ColDataAttachment,
-                                  ColDataProductMeridian,
-                                  ColDataWcProdCategory,
+                                  ColDataProduct, ColDataProductMeridian,
+                                  ColDataUser, ColDataWcProdCategory,
                                   ColDataWpPost)
-from woogenerator.utils import Registrar
+from woogenerator.utils import (JSONPathUtils, Registrar, SanitationUtils,
+                                VectorUtils)
 
 from .abstract import AbstractWooGeneratorTestCase
 
@@ -736,6 +746,476 @@ class TestColDataWcProd(TestColData):
             col_values_native.get('title')
         )
 
+class TestColDataPathAccessors(TestColData):
+    coldata_classes = [ColDataProduct, ColDataUser]
+    targets = ['wc-wp-api-v2', 'wp-sql', 'gen-csv']
+    bench_items = 20
+
+    def setUp(self):
+        super(TestColDataPathAccessors, self).setUp()
+        self.api_product = SanitationUtils.decode_json(
+            get_testdata('sample_wc_wp_api_v2_product.json')
+        )
+        self.core_product = OrderedDict([
+            (handle, value) for handle, value in ColDataProduct.translate_data_from(
+                self.api_product, 'wc-wp-api-v2'
+            ).items() if value is not None
+        ])
+
+    @classmethod
+    def parse_path(cls, path, quote_chars=' '):
+        if any([char in path for char in quote_chars]):
+            path = '"%s"' % path
+        return jsonpath_ng.parse(path)
+
+    @classmethod
+    def reference_get(cls, data, path):
+        if re.match(ColDataAbstract.re_simple_path, path):
+            return data[path]
+        return cls.parse_path(path).find(data)[0].value
+
+    @classmethod
+    def reference_update(cls, data, path, value):
+        if re.match(ColDataAbstract.re_simple_path, path):
+            data[path] = value
+            return data
+        return JSONPathUtils.blank_update(
+            cls.parse_path(path, ' :'), data, value
+        )
+
+    @classmethod
+    def reference_translate_paths(cls, coldata_class, data, target, direction):
+        """
+        Translate paths the way ColDataAbstract did before accessors were
+        compiled, by parsing every path for every item.
+        """
+        response = OrderedDict()
+        for handle, target_path in \
+        coldata_class.get_target_path_translation(target).items():
+            if target_path is None:
+                continue
+            get_path, set_path = target_path, handle
+            if direction == 'to':
+                get_path, set_path = handle, target_path
+            try:
+                value = cls.reference_get(data, get_path)
+            except (IndexError, KeyError):
+                continue
+            cls.reference_update(response, set_path, deepcopy(value))
+        return response
+
+    def get_target_sample(self, coldata_class, target):
+        return coldata_class.translate_data_to(self.core_product, target)
+
+    def get_core_samples(self, count):
+        """
+        Return `count` copies of the core product with varying prices and
+        stock, so that whole columns of them can be normalized.
+        """
+        prices = [u'12.5', u'', u'3', u'$4.50', u'1.005', u'-2', u'1000']
+        samples = []
+        for index in range(count):
+            sample = OrderedDict(self.core_product)
+            sample['regular_price'] = prices[index % len(prices)]
+            sample['sale_price'] = prices[(index + 1) % len(prices)]
+            sample['stock_status'] = bool(index % 2)
+            samples.append(sample)
+        return samples
+
+    def test_compiled_path_translation_equivalence(self):
+        for coldata_class in self.coldata_classes:
+            for target in self.targets:
+                target_sample = self.get_target_sample(coldata_class, target)
+                self.assertEqual(
+                    coldata_class.translate_paths_from(target_sample, target),
+                    self.reference_translate_paths(
+                        coldata_class, target_sample, target, 'from'
+                    )
+                )
+                self.assertEqual(
+                    coldata_class.translate_paths_to(self.core_product, target),
+                    self.reference_translate_paths(
+                        coldata_class, self.core_product, target, 'to'
+                    )
+                )
+
+    def test_compiled_path_getter_missing(self):
+        getter = ColDataProduct.compile_path_getter('meta.foo.bar')
+        for data in [{}, {'meta': None}, {'meta': {'foo': 'baz'}}, {'meta': []}]:
+            with self.assertRaises(KeyError):
+                getter(data)
+        self.assertEqual(getter({'meta': {'foo': {'bar': 1}}}), 1)
+
+    def test_compiled_path_setter_blank(self):
+        setter = ColDataProduct.compile_path_setter('meta.foo')
+        for data in [{}, {'meta': {}}]:
+            self.assertEqual(setter(data, 1), {'meta': {'foo': 1}})
+        setter = ColDataProduct.compile_path_setter('meta.foo bar')
+        self.assertEqual(
+            setter({'meta': {}}, 1),
+            {'meta': {}, 'meta.foo bar': 1}
+        )
+
+    @classmethod
+    def get_container_ids(cls, data):
+        """ Return the ids of every dict and list in `data`. """
+        ids = set()
+        stack = [data]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                ids.add(id(node))
+                stack.extend(node.values())
+            elif isinstance(node, list):
+                ids.add(id(node))
+                stack.extend(node)
+        return ids
+
+    def test_translate_data_no_mutation(self):
+        for coldata_class in self.coldata_classes:
+            for target in self.targets:
+                target_sample = self.get_target_sample(coldata_class, target)
+                sample_copy = deepcopy(target_sample)
+                core_data = coldata_class.translate_data_from(
+                    target_sample, target
+                )
+                self.assertEqual(target_sample, sample_copy)
+                self.assertEqual(
+                    core_data,
+                    coldata_class.translate_data_from(sample_copy, target)
+                )
+                core_copy = deepcopy(self.core_product)
+                target_data = coldata_class.translate_data_to(
+                    self.core_product, target
+                )
+                self.assertEqual(self.core_product, core_copy)
+                self.assertEqual(
+                    target_data,
+                    coldata_class.translate_data_to(core_copy, target)
+                )
+
+    def test_copy_update_in_path(self):
+        data = {'meta': {'foo': 1}, 'other': {'bar': 2}}
+        response = ColDataProduct.copy_update_in_path(data, 'meta.baz', 3)
+        self.assertEqual(data, {'meta': {'foo': 1}, 'other': {'bar': 2}})
+        self.assertEqual(
+            response, {'meta': {'foo': 1, 'baz': 3}, 'other': {'bar': 2}}
+        )
+        self.assertIs(response['other'], data['other'])
+        owned = {}
+        response = ColDataProduct.copy_update_in_path(
+            data, 'meta.baz', 3, owned
+        )
+        self.assertIs(
+            ColDataProduct.copy_update_in_path(response, 'meta.qux', 4, owned),
+            response
+        )
+        self.assertEqual(response['meta'], {'foo': 1, 'baz': 3, 'qux': 4})
+        self.assertEqual(data['meta'], {'foo': 1})
+
+    def test_translate_batch(self):
+        for coldata_class in self.coldata_classes:
+            for target in self.targets:
+                target_sample = self.get_target_sample(coldata_class, target)
+                records = [target_sample, {}, target_sample]
+                self.assertEqual(
+                    coldata_class.translate_batch_from(records, target),
+                    [
+                        coldata_class.translate_data_from(record, target)
+                        for record in records
+                    ]
+                )
+                records = [self.core_product, None]
+                self.assertEqual(
+                    coldata_class.translate_batch_to(records, target),
+                    [
+                        coldata_class.translate_data_to(record, target)
+                        for record in records
+                    ]
+                )
+            gen_sample = self.get_target_sample(coldata_class, 'gen-csv')
+            self.assertEqual(
+                coldata_class.translate_batch_from_to_simple(
+                    [gen_sample, gen_sample], 'gen-csv', 'wc-csv'
+                ),
+                [coldata_class.translate_data_from_to_simple(
+                    gen_sample, 'gen-csv', 'wc-csv'
+                )] * 2
+            )
+
+    def test_translate_batch_columnar(self):
+        core_samples = self.get_core_samples(VectorUtils.min_length * 2)
+        for coldata_class in self.coldata_classes:
+            for target in self.targets:
+                self.assertEqual(
+                    coldata_class.translate_batch_to(core_samples, target),
+                    [
+                        coldata_class.translate_data_to(record, target)
+                        for record in core_samples
+                    ]
+                )
+                records = [
+                    coldata_class.translate_data_to(record, target)
+                    for record in core_samples
+                ] + [{}]
+                self.assertEqual(
+                    coldata_class.translate_batch_from(records, target),
+                    [
+                        coldata_class.translate_data_from(record, target)
+                        for record in records
+                    ]
+                )
+                with mock.patch.object(coldata_class, 'columnar_types', False):
+                    self.assertEqual(
+                        coldata_class.translate_batch_from(records, target),
+                        [
+                            coldata_class.translate_data_from(record, target)
+                            for record in records
+                        ]
+                    )
+
+    def test_translation_plan_cached(self):
+        plan = ColDataProduct.get_translation_plan('wc-wp-api-v2', 'from')
+        self.assertIs(
+            ColDataProduct.get_translation_plan(
+                'wc-wp-api-v2', 'from', ['path']
+            ),
+            plan
+        )
+        self.assertIsNot(
+            ColDataProduct.get_translation_plan('wc-wp-api-v2', 'to'), plan
+        )
+
+    @pytest.mark.slow
+    def test_translate_batch_benchmark(self):
+        """
+        Report the per-item cost of translating a batch of items compared to
+        resolving the translation of each item separately, as
+        `translate_data_from` and `translate_data_to` did before plans.
+        """
+        table = []
+        for coldata_class in self.coldata_classes:
+            for target in self.targets:
+                target_sample = self.get_target_sample(coldata_class, target)
+                items = [target_sample] * self.bench_items
+                timings = OrderedDict()
+                start = time.time()
+                for item in items:
+                    coldata_class.translation_plan_cache.clear()
+                    coldata_class.translate_data_from(item, target)
+                timings['resolved per item'] = time.time() - start
+                start = time.time()
+                coldata_class.translate_batch_from(items, target)
+                timings['batch'] = time.time() - start
+                table.append(
+                    [coldata_class.__name__, target] + [
+                        '%.1f' % (1000000 * timing / self.bench_items)
+                        for timing in timings.values()
+                    ]
+                )
+        print("per-item batch translation cost (us):\n%s" % tabulate(
+            table, headers=['class', 'target'] + timings.keys()
+        ))
+
+    @pytest.mark.slow
+    def test_columnar_types_benchmark(self):
+        """
+        Report the per-item cost of normalizing the types of core items before
+        they are translated to each target, a column at a time compared to an
+        item at a time.
+        """
+        table = []
+        core_samples = self.get_core_samples(self.bench_items * 100)
+        for coldata_class in self.coldata_classes:
+            for target in self.targets:
+                plan = coldata_class.get_translation_plan(target, 'to')
+                kind, steps = plan['stages'][0]
+                self.assertEqual(kind, 'types')
+                timings = OrderedDict()
+                start = time.time()
+                for record in core_samples:
+                    coldata_class.apply_morph_steps(record, steps)
+                timings['scalar'] = time.time() - start
+                start = time.time()
+                coldata_class.apply_type_steps_batch(core_samples, steps)
+                timings['columnar'] = time.time() - start
+                table.append(
+                    [coldata_class.__name__, target] + [
+                        '%.1f' % (1000000 * timing / len(core_samples))
+                        for timing in timings.values()
+                    ]
+                )
+        print("per-item type normalization cost (us):\n%s" % tabulate(
+            table, headers=['class', 'target'] + timings.keys()
+        ))
+
+    @pytest.mark.slow
+    def test_copy_on_write_benchmark(self):
+        """
+        Report how many of the containers in the translated data are new
+        instead of being shared with the source, and the per-item cost of
+        translating data compared to deep copying it first.
+        """
+        table = []
+        for coldata_class in self.coldata_classes:
+            for target in self.targets:
+                target_sample = self.get_target_sample(coldata_class, target)
+                sample_ids = self.get_container_ids(target_sample)
+                core_data = coldata_class.translate_data_from(
+                    target_sample, target
+                )
+                core_ids = self.get_container_ids(core_data)
+                new = len(core_ids - sample_ids)
+                items = [
+                    deepcopy(target_sample) for _ in range(self.bench_items)
+                ]
+                timings = OrderedDict()
+                start = time.time()
+                for item in items:
+                    coldata_class.translate_data_from(deepcopy(item), target)
+                timings['deepcopy first'] = time.time() - start
+                start = time.time()
+                for item in items:
+                    coldata_class.translate_data_from(item, target)
+                timings['copy on write'] = time.time() - start
+                table.append(
+                    [coldata_class.__name__, target, new, len(core_ids)] + [
+                        '%.1f' % (1000000 * timing / self.bench_items)
+                        for timing in timings.values()
+                    ]
+                )
+                self.assertLessEqual(new, len(core_ids))
+        print("new containers and per-item translation cost (us):\n%s" % (
+            tabulate(table, headers=[
+                'class', 'target', 'new', 'containers'
+            ] + timings.keys())
+        ))
+
+    @pytest.mark.slow
+    def test_translation_benchmark(self):
+        """
+        Report the per-item cost of translating data from each target with
+        compiled accessors compared to parsing paths on every item.
+        """
+        table = []
+        for coldata_class in self.coldata_classes:
+            for target in self.targets:
+                target_sample = self.get_target_sample(coldata_class, target)
+                items = [
+                    deepcopy(target_sample) for _ in range(self.bench_items)
+                ]
+                timings = OrderedDict()
+                start = time.time()
+                for item in items:
+                    self.reference_translate_paths(
+                        coldata_class, item, target, 'from'
+                    )
+                timings['paths (parsed)'] = time.time() - start
+                start = time.time()
+                for item in items:
+                    coldata_class.translate_paths_from(item, target)
+                timings['paths (compiled)'] = time.time() - start
+                start = time.time()
+                for item in items:
+                    coldata_class.translate_data_from(item, target)
+                timings['translate_data_from'] = time.time() - start
+                table.append(
+                    [coldata_class.__name__, target] + [
+                        '%.1f' % (1000000 * timing / self.bench_items)
+                        for timing in timings.values()
+                    ]
+                )
+                self.assertLess(
+                    timings['paths (compiled)'], timings['paths (parsed)']
+                )
+        print("per-item translation cost (us):\n%s" % tabulate(
+            table, headers=['class', 'target'] + timings.keys()
+        ))
+
+class TestColDataPropertyTables(TestColData):
+    coldata_classes = [
+        ColDataProduct, ColDataUser, ColDataAttachment, ColDataWcProdCategory
+    ]
+    properties = ['path', 'type', 'write', 'read', 'structure', 'default']
+
+    def setUp(self):
+        super(TestColDataPropertyTables, self).setUp()
+        self.path = os.path.join(
+            tempfile.mkdtemp('_coldata'), 'coldata-tables.pickle.gz'
+        )
+        self.property_tables = dict(ColDataAbstract.property_tables)
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.path))
+        ColDataAbstract.property_tables.clear()
+        ColDataAbstract.property_tables.update(self.property_tables)
+
+    def test_tables_match_find_in(self):
+        for coldata_class in self.coldata_classes:
+            for target in [None] + coldata_class.get_target_names():
+                ancestors = coldata_class.get_target_ancestors(
+                    coldata_class.targets, target
+                )
+                for property_ in self.properties:
+                    expected = coldata_class.find_in(
+                        coldata_class.data, property_, ancestors
+                    )
+                    self.assertEqual(
+                        coldata_class.get_handles_property(property_, target)
+                        .items(),
+                        expected.items()
+                    )
+                    for handle in coldata_class.data:
+                        self.assertEqual(
+                            coldata_class.get_handle_property(
+                                handle, property_, target
+                            ),
+                            expected.get(
+                                handle,
+                                coldata_class.get_property_default(
+                                    property_, handle
+                                )
+                            )
+                        )
+
+    def test_unknown_target(self):
+        with self.assertRaises(UserWarning):
+            ColDataProduct.get_handle_property('id', 'path', 'not-a-target')
+
+    def test_save_load(self):
+        self.assertTrue(ColDataAbstract.save_property_tables(self.path))
+        expected = ColDataProduct.get_property_table('wc-wp-api-v2-edit')
+        ColDataAbstract.property_tables.clear()
+        self.assertTrue(ColDataAbstract.load_property_tables(self.path))
+        self.assertIn(ColDataProduct.__name__, ColDataAbstract.property_tables)
+        self.assertEqual(
+            ColDataProduct.get_property_table('wc-wp-api-v2-edit'), expected
+        )
+
+    def test_load_stale(self):
+        self.assertFalse(ColDataAbstract.load_property_tables(self.path))
+        ColDataAbstract.save_property_tables(self.path)
+        with mock.patch.object(
+            ColDataAbstract, 'property_tables_version',
+            ColDataAbstract.property_tables_version + 1
+        ):
+            self.assertFalse(ColDataAbstract.load_property_tables(self.path))
+        with mock.patch.object(
+            ColDataAbstract, 'get_source_hash', return_value='changed'
+        ):
+            self.assertFalse(ColDataAbstract.load_property_tables(self.path))
+        self.assertTrue(ColDataAbstract.load_property_tables(self.path))
+
+    def test_init_property_tables(self):
+        ColDataAbstract.init_property_tables(self.path)
+        self.assertTrue(os.path.isfile(self.path))
+        with mock.patch.object(
+            ColDataAbstract, 'save_property_tables'
+        ) as save_property_tables:
+            ColDataAbstract.init_property_tables(self.path)
+        self.assertFalse(save_property_tables.called)
+
+
 if __name__ == '__main__':
     unittest.main()
 
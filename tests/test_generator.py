@@ -1,8 +1,10 @@
 from __future__ import print_function
 
+import io
 import os
 import shutil
 import tempfile
+import time
 import unittest
 from datetime import datetime
 from pprint import pformat, pprint
@@ -30,10 +32,12 @@ from woogenerator.generator import (do_match_categories, do_match_images,
                                     populate_slave_parsers)
 from woogenerator.images import process_images
 from woogenerator.matching import ProductMatcher
-from woogenerator.namespace.core import MatchNamespace, UpdateNamespace
+from woogenerator.namespace.core import (MatchNamespace, ParserNamespace,
+                                        UpdateNamespace)
 from woogenerator.namespace.prod import SettingsNamespaceProd
 from woogenerator.parsing.api import ApiParseWoo
 from woogenerator.parsing.special import SpecialGruopList, CsvParseSpecial
+from woogenerator.parsing import tree
 from woogenerator.parsing.tree import ItemList
 from woogenerator.parsing.woo import CsvParseWoo, WooProdList
 from woogenerator.parsing.xero import ApiParseXero
@@ -436,10 +440,233 @@ class TestGeneratorDummySpecials(AbstractSyncManagerTestCase):
                 )
             )
 
+    @classmethod
+    def get_tree_signature(cls, object_data):
+        """ Everything about a parsed object that parallel parsing affects. """
+        if not hasattr(object_data, 'rowcount'):
+            return object_data
+        signature = [
+            type(object_data).__name__,
+            dict(object_data),
+            getattr(object_data.parent, 'rowcount', None),
+            object_data.child_register.keys(),
+        ]
+        for attr in ['attachments', 'categories', 'attributes', 'specials']:
+            value = getattr(object_data, attr, None)
+            if hasattr(value, 'keys'):
+                value = value.keys()
+            signature.append(value)
+        if hasattr(object_data, 'attaches'):
+            signature.append([
+                attachee.rowcount for attachee in object_data.attaches
+            ])
+        return signature
+
+    def assert_master_parsers_equal(self, parallel, serial):
+        self.assertEqual(parallel.rowcount, serial.rowcount)
+        self.assertEqual(
+            parallel.root_data.child_register.keys(),
+            serial.root_data.child_register.keys()
+        )
+        for register_name in [
+                'objects', 'items', 'taxos', 'products', 'categories',
+                'attributes', 'vattributes', 'variations', 'attachments',
+                'categories_name', 'special_items']:
+            serial_register = getattr(serial, register_name)
+            parallel_register = getattr(parallel, register_name)
+            self.assertEqual(
+                parallel_register.keys(), serial_register.keys(),
+                register_name
+            )
+            for index, value in serial_register.items():
+                if isinstance(value, list):
+                    serial_signature = map(self.get_tree_signature, value)
+                    parallel_signature = map(
+                        self.get_tree_signature, parallel_register[index]
+                    )
+                else:
+                    serial_signature = self.get_tree_signature(value)
+                    parallel_signature = self.get_tree_signature(
+                        parallel_register[index]
+                    )
+                self.assertEqual(
+                    parallel_signature, serial_signature,
+                    "%s[%s]" % (register_name, index)
+                )
+        # these registers are indexed by id
+        for register_name in [
+                'updated_products', 'updated_variations',
+                'onspecial_products', 'onspecial_variations']:
+            self.assertEqual(
+                map(
+                    self.get_tree_signature,
+                    getattr(parallel, register_name).values()
+                ),
+                map(
+                    self.get_tree_signature,
+                    getattr(serial, register_name).values()
+                ),
+                register_name
+            )
+
+    def test_dummy_populate_master_parsers_parallel(self):
+        self.populate_master_parsers()
+        self.settings.master_parse_workers = 2
+        parsers = ParserNamespace()
+        populate_master_parsers(parsers, self.settings)
+        self.assert_master_parsers_equal(parsers.master, self.parsers.master)
+
+    def test_dummy_populate_master_parsers_one_worker(self):
+        self.populate_master_parsers()
+
+        def analyse_rows(parser, unicode_rows, file_name="rows", **kwargs):
+            return parser.analyse_rows_parallel(unicode_rows, file_name, 1)
+
+        parsers = ParserNamespace()
+        with mock.patch.object(
+            tree.CsvParseTree, 'analyse_rows', autospec=True,
+            side_effect=analyse_rows
+        ), mock.patch.object(
+            tree, 'analyse_tree_chunk'
+        ) as analyse_tree_chunk, mock.patch.object(
+            tree.multiprocessing, 'Pool'
+        ) as pool:
+            populate_master_parsers(parsers, self.settings)
+        self.assertFalse(analyse_tree_chunk.called)
+        self.assertFalse(pool.called)
+        self.assert_master_parsers_equal(parsers.master, self.parsers.master)
+
+    def test_dummy_populate_master_parsers_concurrent(self):
+        self.settings.do_dyns = True
+        self.settings.dprc_file = os.path.join(TESTS_DATA_DIR, "DPRC.csv")
+        self.settings.dprp_file = os.path.join(TESTS_DATA_DIR, "DPRP.csv")
+        serial = ParserNamespace()
+        populate_master_parsers(serial, self.settings)
+        serial_rules = [
+            self.settings.dprc_rules, self.settings.dprp_rules,
+            self.settings.special_rules
+        ]
+        self.assertTrue(all(serial_rules))
+
+        self.settings.master_concurrency = 3
+        parsers = ParserNamespace()
+        populate_master_parsers(parsers, self.settings)
+        self.assert_master_parsers_equal(parsers.master, serial.master)
+        for rules, serial_rules in zip([
+                self.settings.dprc_rules, self.settings.dprp_rules,
+                self.settings.special_rules
+        ], serial_rules):
+            self.assertEqual(rules.keys(), serial_rules.keys())
+        self.assertEqual(parsers.dyn.taxos.keys(), serial.dyn.taxos.keys())
+
+    def test_dummy_populate_master_parsers_cached(self):
+        self.populate_master_parsers()
+        temp_dir = tempfile.mkdtemp('_master_cache')
+        self.settings.in_dir = temp_dir
+        self.settings.do_master_cache = True
+        try:
+            with mock.patch.object(
+                tree, 'analyse_tree_chunk',
+                side_effect=tree.analyse_tree_chunk
+            ) as analyse_tree_chunk:
+                populate_master_parsers(ParserNamespace(), self.settings)
+                # Product A and Specials
+                self.assertEqual(analyse_tree_chunk.call_count, 2)
+                analyse_tree_chunk.reset_mock()
+
+                parsers = ParserNamespace()
+                populate_master_parsers(parsers, self.settings)
+                self.assertEqual(analyse_tree_chunk.call_count, 0)
+                self.assert_master_parsers_equal(
+                    parsers.master, self.parsers.master
+                )
+
+                with open(self.settings.master_file) as master_file:
+                    master_data = master_file.read()
+                self.settings.master_file = os.path.join(
+                    temp_dir, 'master_changed.csv'
+                )
+                with open(self.settings.master_file, 'w') as master_file:
+                    master_file.write(master_data.replace(
+                        'unique blends', 'unique mixes'
+                    ))
+                parsers = ParserNamespace()
+                populate_master_parsers(parsers, self.settings)
+                self.assertEqual(analyse_tree_chunk.call_count, 1)
+        finally:
+            shutil.rmtree(temp_dir)
+        category = parsers.master.find_category({
+            parsers.master.category_container.title_key: 'Company A Product A'
+        })
+        self.assertIn('unique mixes', category['descsum'])
+        # reused objects have the modification time of the changed file
+        for object_data in parsers.master.taxos.values():
+            self.assertEqual(
+                object_data['modified_gmt'],
+                parsers.master.defaults['modified_gmt']
+            )
+
+    @pytest.mark.slow
+    def test_dummy_master_parse_benchmark(self):
+        """
+        Compare parsing a master file made of copies of the dummy subtree
+        serially and in worker processes.
+        """
+        with open(self.settings.master_file) as master_file:
+            lines = master_file.read().splitlines()
+        specials_start = [
+            index for index, line in enumerate(lines)
+            if line.startswith('Specials')
+        ][0]
+        header = lines[0]
+        subtree = lines[1:specials_start]
+        specials = lines[specials_start:]
+        temp_dir = tempfile.mkdtemp('_master_parse')
+        table = []
+        try:
+            for copies in [10, 50]:
+                master_path = os.path.join(temp_dir, 'master_%d.csv' % copies)
+                with open(master_path, 'w') as master_file:
+                    master_file.write(header + '\n')
+                    for copy in range(copies):
+                        cells = subtree[0].split(',')
+                        cells[5] = 'A%03d' % copy
+                        master_file.write(
+                            '\n'.join([','.join(cells)] + subtree[1:]) + '\n'
+                        )
+                    master_file.write('\n'.join(specials) + '\n')
+                self.settings.master_file = master_path
+                for workers in [None, 2, 4]:
+                    self.settings.master_parse_workers = workers
+                    parsers = ParserNamespace()
+                    start = time.time()
+                    populate_master_parsers(parsers, self.settings)
+                    table.append([
+                        copies * len(subtree), workers or 1,
+                        len(parsers.master.objects),
+                        '%.2f' % (time.time() - start)
+                    ])
+        finally:
+            shutil.rmtree(temp_dir)
+        print("master parse benchmark:\n%s" % tabulate(
+            table, headers=['rows', 'workers', 'objects', 'total (s)']
+        ))
+
     def test_dummy_export_master_parsers(self):
         self.populate_master_parsers()
+        self.settings.init_dirs()
         export_master_parser(self.settings, self.parsers)
 
+    def test_dummy_analyse_slave_stream_not_array(self):
+        parser = self.settings.slave_parser_class(
+            **self.settings.slave_parser_args
+        )
+        for json_str in ['{"id": 1}', '  null', '']:
+            with mock.patch.object(parser, 'register_warning') as warning:
+                parser.analyse_stream(io.BytesIO(json_str))
+            self.assertTrue(warning.called)
+        self.assertFalse(parser.objects)
+
     @pytest.mark.first
     def test_dummy_populate_slave_parsers(self):
         # self.populate_master_parsers()
@@ -0,0 +1,230 @@
+import argparse
+import random
+import time
+import unittest
+from collections import OrderedDict
+
+import dill
+import pytest
+from tabulate import tabulate
+
+from context import woogenerator
+from woogenerator.matching import (CardMatcher, IndexList, Match, MatchList,
+                                   NocardEmailMatcher, UserMatcher,
+                                   UsernameMatcher)
+from woogenerator.parsing.abstract import ImportObject
+from woogenerator.utils import DescriptorUtils, Registrar, SanitationUtils
+
+
+class SyntheticUser(ImportObject):
+    """ A lightweight stand in for ImportUser with just the matching keys. """
+    email = DescriptorUtils.safe_key_property('E-mail')
+    MYOBID = DescriptorUtils.safe_key_property('MYOB Card ID')
+    username = DescriptorUtils.safe_key_property('Wordpress Username')
+
+
+class TestIndexList(unittest.TestCase):
+    def test_membership(self):
+        indices = IndexList(['a', 'b'])
+        self.assertIn('a', indices)
+        self.assertNotIn('c', indices)
+        indices.append('c')
+        self.assertIn('c', indices)
+        indices.remove('a')
+        self.assertNotIn('a', indices)
+        self.assertEqual(indices.pop(), 'c')
+        self.assertNotIn('c', indices)
+        del indices[0]
+        self.assertNotIn('b', indices)
+        indices += ['d']
+        self.assertIn('d', indices)
+        self.assertEqual(indices, ['d'])
+
+    def test_pickle(self):
+        indices = dill.loads(dill.dumps(IndexList(['a', 'b'])))
+        self.assertIsInstance(indices, IndexList)
+        self.assertIn('b', indices)
+
+
+class TestMatchList(unittest.TestCase):
+    def setUp(self):
+        Registrar.DEBUG_ERROR = False
+        Registrar.DEBUG_WARN = False
+        Registrar.DEBUG_MESSAGE = False
+        Registrar.DEBUG_PROGRESS = False
+
+    def test_add_match_duplicate_index(self):
+        match_list = MatchList()
+        m_object = SyntheticUser({}, rowcount=1)
+        s_object = SyntheticUser({}, rowcount=2)
+        match_list.add_match(Match([m_object], [s_object]))
+        self.assertIn(1, match_list.m_indices)
+        self.assertIn(2, match_list.s_indices)
+        with self.assertRaises(AssertionError):
+            match_list.add_match(Match([m_object], []))
+
+    def test_filtering_matcher_excludes_later_matches(self):
+        """
+        Matches added to a MatchList after a FilteringMatcher is created from
+        its indices should still be excluded.
+        """
+        globals_ = MatchList()
+        card_matcher = CardMatcher(globals_.s_indices, globals_.m_indices)
+        m_object = SyntheticUser({'MYOB Card ID': 'C1'}, rowcount=1)
+        s_object = SyntheticUser({'MYOB Card ID': 'C1'}, rowcount=2)
+        globals_.add_match(Match([m_object], [s_object]))
+        card_matcher.process_registers(
+            {'C1': [s_object]}, {'C1': [m_object]}
+        )
+        self.assertFalse(card_matcher.matches)
+
+    def test_filtering_matcher_plain_list(self):
+        card_matcher = CardMatcher([2], [1])
+        self.assertIsInstance(card_matcher.s_match_indices, IndexList)
+        self.assertIn(2, card_matcher.s_match_indices)
+        self.assertIn(1, card_matcher.m_match_indices)
+
+
+class TestMatchingBenchmark(unittest.TestCase):
+    """
+    Benchmark matching on synthetic users the same way merger.do_match does.
+    A third of users match on username, a third on card and a third on email.
+    """
+    user_counts = [10000, 100000, 500000]
+
+    def setUp(self):
+        Registrar.DEBUG_ERROR = False
+        Registrar.DEBUG_WARN = False
+        Registrar.DEBUG_MESSAGE = False
+        Registrar.DEBUG_PROGRESS = False
+
+    @classmethod
+    def make_registers(cls, count, rowcount_offset=0, datas=None):
+        registers = OrderedDict([
+            ('usernames', OrderedDict()),
+            ('cards', OrderedDict()),
+            ('nocards', OrderedDict()),
+            ('emails', OrderedDict()),
+        ])
+        if datas is None:
+            datas = []
+            for i in range(count):
+                data = {'E-mail': 'user%d@example.com' % i}
+                if i % 3 == 0:
+                    data['Wordpress Username'] = 'user%d' % i
+                if i % 3 != 2:
+                    data['MYOB Card ID'] = 'C%06d' % i
+                datas.append(data)
+        for i, data in enumerate(datas):
+            user = SyntheticUser(data, rowcount=rowcount_offset + i)
+            if user.username:
+                registers['usernames'].setdefault(user.username, []).append(user)
+            if user.MYOBID:
+                registers['cards'].setdefault(user.MYOBID, []).append(user)
+            else:
+                registers['nocards'][user.index] = user
+            # keyed like CsvParseUser.register_email
+            registers['emails'].setdefault(
+                SanitationUtils.normalize_val(user.email), []
+            ).append(user)
+        return registers
+
+    @classmethod
+    def do_match(cls, master, slave):
+        """ Same sequence of matchers as merger.do_match used to run. """
+        globals_ = MatchList()
+        username_matcher = UsernameMatcher()
+        username_matcher.process_registers(
+            slave['usernames'], master['usernames']
+        )
+        globals_.add_matches(username_matcher.pure_matches)
+        card_matcher = CardMatcher(globals_.s_indices, globals_.m_indices)
+        card_matcher.process_registers(slave['cards'], master['cards'])
+        globals_.add_matches(card_matcher.pure_matches)
+        email_matcher = NocardEmailMatcher(
+            globals_.s_indices, globals_.m_indices
+        )
+        email_matcher.process_registers(slave['nocards'], master['emails'])
+        globals_.add_matches(email_matcher.pure_matches)
+        return globals_, OrderedDict([
+            ('username', username_matcher),
+            ('card', card_matcher),
+            ('email', email_matcher),
+        ])
+
+    @classmethod
+    def do_user_match(cls, master, slave):
+        """ Match the same way merger.do_match does. """
+        user_matcher = UserMatcher()
+        user_matcher.process_parsers(
+            argparse.Namespace(**slave), argparse.Namespace(**master)
+        )
+        globals_ = MatchList()
+        for name in ['username', 'card', 'email']:
+            globals_.add_matches(user_matcher[name].pure_matches)
+        return globals_, user_matcher
+
+    @classmethod
+    def match_indices(cls, match_list):
+        return [
+            (
+                [obj.index for obj in match.m_objects],
+                [obj.index for obj in match.s_objects]
+            ) for match in match_list
+        ]
+
+    def test_user_matcher_equivalence(self):
+        """
+        Matching on all keys at once gives the same matches as running the
+        username, card and email matchers in sequence.
+        """
+        rand = random.Random(1)
+        def make_datas(count):
+            datas = []
+            for _ in range(count):
+                data = {'E-mail': 'user%d@example.com' % rand.randint(0, 60)}
+                if rand.random() < 0.4:
+                    data['Wordpress Username'] = 'user%d' % rand.randint(0, 60)
+                if rand.random() < 0.5:
+                    data['MYOB Card ID'] = 'C%06d' % rand.randint(0, 60)
+                datas.append(data)
+            return datas
+        master = self.make_registers(0, datas=make_datas(100))
+        slave = self.make_registers(0, 100, datas=make_datas(100))
+        expected_globals, expected = self.do_match(master, slave)
+        globals_, user_matcher = self.do_user_match(master, slave)
+        self.assertEqual(
+            self.match_indices(globals_), self.match_indices(expected_globals)
+        )
+        for name, matcher in expected.items():
+            for match_type in [
+                'pure', 'duplicate', 'slaveless', 'masterless', 'all'
+            ]:
+                self.assertEqual(
+                    self.match_indices(user_matcher[name]._matches[match_type]),
+                    self.match_indices(matcher._matches[match_type])
+                )
+            self.assertTrue(matcher.matches)
+
+    @pytest.mark.slow
+    def test_matching_benchmark(self):
+        table = []
+        for count in self.user_counts:
+            master = self.make_registers(count)
+            slave = self.make_registers(count, count)
+            timings = OrderedDict()
+            for name, do_match in [
+                ('sequential', self.do_match),
+                ('multi-key', self.do_user_match),
+            ]:
+                start = time.time()
+                globals_, _ = do_match(master, slave)
+                timings[name] = time.time() - start
+                self.assertEqual(len(globals_), count)
+            table.append([count] + [
+                '%.2f (%.1f us/user)' % (timing, 1000000 * timing / count)
+                for timing in timings.values()
+            ])
+        print("matching benchmark (s):\n%s" % tabulate(
+            table, headers=['users'] + timings.keys()
+        ))
@@ -0,0 +1,46 @@
+import argparse
+import unittest
+
+from context import woogenerator
+from woogenerator.namespace.core import ParserNamespace
+from woogenerator.utils.reporter import (RenderableReporter,
+                                         do_main_summary_group)
+
+
+class TestParserNamespaceCacheCounts(unittest.TestCase):
+    def test_add_cache_counts(self):
+        parsers = ParserNamespace()
+        self.assertFalse(parsers.cache_counts)
+        parsers.add_cache_counts('subtree cache', 3, 1)
+        parsers.add_cache_counts('image manifest', 5, 0)
+        parsers.add_cache_counts('subtree cache', 2, 2)
+        self.assertEqual(
+            list(parsers.cache_counts.keys()),
+            ['subtree cache', 'image manifest']
+        )
+        self.assertEqual(
+            dict(parsers.cache_counts['subtree cache']),
+            {'hits': 5, 'misses': 3}
+        )
+        summary = parsers.get_cache_summary_text()
+        self.assertIn('subtree cache', summary)
+        self.assertIn('image manifest', summary)
+        self.assertIn('misses', summary)
+
+    def test_main_summary_group(self):
+        parsers = ParserNamespace()
+        parsers.add_cache_counts('image manifest', 4, 1)
+        settings = argparse.Namespace(
+            master_name='master', slave_name='slave',
+            master_pkey='codesum', slave_pkey='ID'
+        )
+        reporter = RenderableReporter()
+        do_main_summary_group(reporter, None, None, parsers, settings)
+        summary = reporter.get_summary_text()
+        self.assertIn('Caches', summary)
+        self.assertIn('image manifest', summary)
+        self.assertIn('image manifest', reporter.get_summary_html())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,59 @@
+import cPickle
+import io
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
 import unittest
 from collections import OrderedDict
-from context import woogenerator
-from woogenerator.parsing.abstract import ImportObject
+
+import pytest
+import unicodecsv
+from tabulate import tabulate
+
+from context import TESTS_DATA_DIR, woogenerator
+from woogenerator.coldata import ColDataProduct
+from woogenerator.matching import CardMatcher
+from woogenerator.parsing.abstract import (CompactRecord, CsvParseBase,
+                                           ImportObject, ObjList,
+                                           ObjectSearchIndex,
+                                           dumps_object_graph,
+                                           loads_object_graph)
+from woogenerator.parsing.user import (CsvParseUser, ImportUser,
+                                       ImportUserCompact)
+from woogenerator.utils import Registrar, SanitationUtils, SeqUtils
 
 class TestObjList(unittest.TestCase):
-    pass
+    def setUp(self):
+        Registrar.DEBUG_ERROR = False
+        Registrar.DEBUG_WARN = False
+        Registrar.DEBUG_MESSAGE = False
+        self.obj_list = ObjList([
+            ImportObject(OrderedDict([
+                ('title', 'Item %d' % rowcount),
+                ('codesum', 'A%d' % rowcount),
+                ('regular_price', '%d.5' % rowcount),
+                ('stock_status', 'instock'),
+            ]), rowcount=rowcount) for rowcount in range(3)
+        ])
+
+    def test_to_target_types(self):
+        kwargs = {
+            'coldata_class': ColDataProduct,
+            'coldata_target': 'wc-csv',
+            'extra_colnames': OrderedDict([('codesum', 'Code')])
+        }
+        response = self.obj_list.to_target_types(**kwargs)
+        self.assertEqual(
+            response,
+            [object_.to_target_type(**kwargs) for object_ in self.obj_list]
+        )
+        self.assertEqual(response[1]['SKU'], 'A1')
+        self.assertEqual(response[1]['Code'], 'A1')
+        self.assertEqual(response[1]['regular_price'], '1.50')
 
 class TestImportObject(unittest.TestCase):
     pass
@@ -326,3 +375,428 @@ class TestImportObject(unittest.TestCase):
 #
 #     for usr in usr_parser.objects.values()[:3]:
 #         pprint(OrderedDict(usr))
+
+
+class TestCsvParseBaseStream(unittest.TestCase):
+    """ Test that rows are analysed without being buffered in memory. """
+
+    class CountingRows(object):
+        """ An iterator of rows which counts the rows consumed. """
+
+        def __init__(self, count):
+            self.rows = iter(
+                [[u'E-mail']] +
+                [[u'user%d@example.com' % i] for i in range(count)]
+            )
+            self.consumed = 0
+
+        def __iter__(self):
+            return self
+
+        def next(self):
+            row = self.rows.next()
+            self.consumed += 1
+            return row
+
+    class DiscardingParser(CsvParseBase):
+        """ Parser which registers nothing, so memory is only used by rows. """
+
+        def register_object(self, object_data):
+            pass
+
+    def setUp(self):
+        Registrar.DEBUG_ERROR = False
+        Registrar.DEBUG_WARN = False
+        Registrar.DEBUG_MESSAGE = False
+        Registrar.DEBUG_PROGRESS = True
+        self.parser = CsvParseBase(['E-mail'], OrderedDict())
+
+    def tearDown(self):
+        Registrar.DEBUG_PROGRESS = False
+
+    def test_rows_are_streamed(self):
+        consumed = []
+        rows = self.CountingRows(100)
+        parser = self.parser
+
+        def register_object(object_data):
+            consumed.append(rows.consumed)
+            CsvParseBase.register_object(parser, object_data)
+
+        parser.register_object = register_object
+        parser.analyse_rows(rows)
+        self.assertEqual(len(parser.objects), 100)
+        # each object is registered as soon as its row is read
+        self.assertEqual(consumed, range(2, 102))
+
+    def test_limit_is_lazy(self):
+        rows = self.CountingRows(100)
+        self.parser.analyse_rows(rows, limit=10)
+        self.assertEqual(rows.consumed, 10)
+        self.assertTrue(self.parser.objects)
+
+    def test_analyse_stream_progress(self):
+        stream = io.BytesIO(
+            '"E-mail"\n' + ''.join(
+                '"user%d@example.com"\n' % i for i in range(100)
+            )
+        )
+        self.assertEqual(
+            self.parser.get_stream_size(stream), len(stream.getvalue())
+        )
+        self.parser.analyse_stream(stream, dialect_suggestion='ActOut')
+        self.assertEqual(len(self.parser.objects), 100)
+        self.assertEqual(
+            self.parser.progress_counter.total, len(stream.getvalue())
+        )
+        self.assertEqual(self.parser.progress_counter.items_plural, 'bytes')
+
+    @classmethod
+    def measure_file_memory(cls, file_path, queue):
+        """ Analyse a file in a child process, report peak memory growth (kb). """
+        Registrar.DEBUG_PROGRESS = True
+        with open('/proc/self/statm') as statm:
+            start_rss = int(statm.read().split()[1]) \
+                * resource.getpagesize() / 1024
+        parser = cls.DiscardingParser(['E-mail'], OrderedDict())
+        parser.analyse_file(file_path, dialect_suggestion='ActOut')
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        queue.put((parser.rowcount, peak_rss - start_rss))
+
+    @pytest.mark.slow
+    def test_analyse_file_memory_benchmark(self):
+        tmp_dir = tempfile.mkdtemp('_analyse_file')
+        table = []
+        try:
+            for row_count in [10000, 100000, 500000]:
+                file_path = os.path.join(tmp_dir, 'rows_%d.csv' % row_count)
+                with open(file_path, 'w') as csv_file:
+                    csv_file.write('"E-mail"\n')
+                    for i in xrange(row_count):
+                        csv_file.write('"user%d@example.com"\n' % i)
+                queue = multiprocessing.Queue()
+                process = multiprocessing.Process(
+                    target=self.measure_file_memory, args=(file_path, queue)
+                )
+                start = time.time()
+                process.start()
+                rowcount, peak_kb = queue.get()
+                process.join()
+                table.append([
+                    row_count,
+                    '%.1f' % (os.path.getsize(file_path) / 1048576.0),
+                    '%.1f' % (peak_kb / 1024.0),
+                    '%.2f' % (time.time() - start)
+                ])
+        finally:
+            shutil.rmtree(tmp_dir)
+        print("\nanalyse_file memory benchmark:\n%s" % tabulate(table, headers=[
+            'rows', 'file (MB)', 'peak growth (MB)', 'time (s)'
+        ]))
+
+
+class ImportObjectCompact(ImportObject, CompactRecord):
+    record_class = CompactRecord
+
+
+class TestCompactRecord(unittest.TestCase):
+    user_data = OrderedDict([
+        ('MYOB Card ID', u'C001280'),
+        ('E-mail', u'lhayeb@wikia.com'),
+        ('Wordpress Username', u'lhayeb'),
+        ('Role', u'WN'),
+        ('First Name', u'Lorry'),
+        ('Surname', u'Haye'),
+        ('Company', u'Skinte'),
+        ('Mobile Phone', u'0447 267 588'),
+        ('Address 1', u'68283 Monterey Lane'),
+        ('City', u'Naruto'),
+        ('Postcode', u'779-0311'),
+        ('Country', u'JP'),
+    ])
+
+    def setUp(self):
+        Registrar.DEBUG_ERROR = False
+        Registrar.DEBUG_WARN = False
+        Registrar.DEBUG_MESSAGE = False
+        Registrar.DEBUG_PROGRESS = False
+
+    def test_mapping(self):
+        record = CompactRecord([('b', 1), ('a', 2)])
+        record['c'] = 3
+        record['b'] = 4
+        self.assertEqual(record.keys(), ['b', 'a', 'c'])
+        self.assertEqual(record.values(), [4, 2, 3])
+        self.assertEqual(list(reversed(record)), ['c', 'a', 'b'])
+        self.assertEqual(record, OrderedDict([('b', 4), ('a', 2), ('c', 3)]))
+        self.assertNotEqual(record, OrderedDict([('a', 2), ('b', 4), ('c', 3)]))
+        self.assertEqual(dict(record), {'a': 2, 'b': 4, 'c': 3})
+        self.assertEqual(json.loads(json.dumps(record)), dict(record))
+        del record['b']
+        self.assertEqual(record.items(), [('a', 2), ('c', 3)])
+        self.assertEqual(record.popitem(), ('c', 3))
+        self.assertEqual(record.setdefault('d', 5), 5)
+        self.assertEqual(list(record.iteritems()), [('a', 2), ('d', 5)])
+        record.clear()
+        self.assertFalse(record)
+        self.assertEqual(record.keys(), [])
+
+    def test_shapes_are_shared(self):
+        first = CompactRecord([('a', 1), ('b', 2)])
+        second = CompactRecord([('a', 3), ('b', 4)])
+        self.assertIs(first._shape, second._shape)
+        del first['a']
+        del second['a']
+        self.assertIs(first._shape, second._shape)
+
+    def test_import_object(self):
+        object_data = ImportObjectCompact(self.user_data, rowcount=3)
+        expected = ImportObject(self.user_data, rowcount=3)
+        self.assertEqual(object_data.items(), expected.items())
+        self.assertEqual(object_data.index, 3)
+        object_data.update({'rowcount': 4, 'City': u'Novo'})
+        self.assertEqual(object_data.rowcount, 3)
+        self.assertEqual(object_data['City'], u'Novo')
+
+        copied = cPickle.loads(cPickle.dumps(object_data, -1))
+        self.assertIsInstance(copied, ImportObjectCompact)
+        self.assertEqual(copied.items(), object_data.items())
+        objects = loads_object_graph(dumps_object_graph(
+            ObjList([object_data])
+        ))
+        self.assertEqual(objects[0].items(), object_data.items())
+
+    def test_import_user(self):
+        user = ImportUserCompact(self.user_data, rowcount=3)
+        expected = ImportUser(self.user_data, rowcount=3)
+        self.assertEqual(user.keys(), expected.keys())
+        self.assertEqual(user.index, expected.index)
+        self.assertEqual(user.email, expected.email)
+        self.assertEqual(user['Name'].first_name, u'Lorry')
+
+        matcher = CardMatcher()
+        matcher.process_registers(
+            {user.MYOBID: [user]},
+            {expected.MYOBID: [expected]}
+        )
+        self.assertEqual(len(matcher.pure_matches), 1)
+
+    @classmethod
+    def measure_object_memory(cls, container, data, count, queue):
+        """ Create objects in a child process, report memory growth (kb). """
+        def get_rss():
+            with open('/proc/self/statm') as statm:
+                return int(statm.read().split()[1]) \
+                    * resource.getpagesize() / 1024
+        start_rss = get_rss()
+        objects = [
+            container(
+                OrderedDict(
+                    (key, value + unicode(rowcount))
+                    for key, value in data.items()
+                ),
+                rowcount=rowcount
+            )
+            for rowcount in xrange(count)
+        ]
+        queue.put(get_rss() - start_rss)
+        del objects
+
+    @pytest.mark.slow
+    def test_memory_benchmark(self):
+        count = 100000
+        table = []
+        for container in [
+                ImportObject, ImportObjectCompact,
+                ImportUser, ImportUserCompact]:
+            queue = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=self.measure_object_memory,
+                args=(container, self.user_data, count, queue)
+            )
+            process.start()
+            growth_kb = queue.get()
+            process.join()
+            table.append([
+                container.__name__,
+                '%.1f' % (growth_kb / 1024.0),
+                '%.0f' % (growth_kb * 1024.0 / count),
+            ])
+        print("\nmemory per %d objects:\n%s" % (count, tabulate(
+            table, headers=['container', 'growth (MB)', 'per object (bytes)']
+        )))
+
+
+class TestObjectSearchIndex(unittest.TestCase):
+    search_keys = ['ID', 'slug', 'title']
+
+    def setUp(self):
+        Registrar.DEBUG_ERROR = False
+        Registrar.DEBUG_WARN = False
+        Registrar.DEBUG_MESSAGE = False
+        self.parser = CsvParseBase(['ID', 'slug', 'title'], OrderedDict())
+        for rowcount, (wpid, slug, title) in enumerate([
+            (1, 'a', 'A'), (2, 'b', 'B'), (None, 'c', 'A')
+        ], 1):
+            self.parser.register_object(ImportObject(OrderedDict([
+                ('ID', wpid), ('slug', slug), ('title', title)
+            ]), rowcount=rowcount))
+
+    def find(self, search_data, indexed=True):
+        search_index = None
+        if indexed:
+            search_index = self.parser.get_search_index(
+                'objects', self.parser.objects, self.search_keys
+            )
+        return self.parser.find_object(
+            search_data, self.parser.objects, self.search_keys, search_index
+        )
+
+    def assert_found(self, search_data, rowcount):
+        for indexed in [False, True]:
+            result = self.find(search_data, indexed)
+            if rowcount is None:
+                self.assertIsNone(result)
+            else:
+                self.assertEqual(result.rowcount, rowcount)
+
+    def test_find_object(self):
+        self.assert_found({'ID': 2}, 2)
+        self.assert_found({'slug': 'c', 'title': 'A'}, 3)
+        # all keys with values must match
+        self.assert_found({'ID': 1, 'slug': 'b'}, None)
+        self.assert_found({'ID': None, 'slug': 'a', 'title': ''}, 1)
+        self.assert_found({'ID': 4}, None)
+        with self.assertRaises(AssertionError):
+            self.find({'title': 'A'})
+
+    def test_index_updates(self):
+        search_index = self.parser.get_search_index(
+            'objects', self.parser.objects, self.search_keys
+        )
+        self.assertIsInstance(search_index, ObjectSearchIndex)
+        self.assert_found({'ID': 2}, 2)
+
+        # changed objects are re-indexed when they are registered again
+        self.parser.objects[2]['ID'] = 5
+        self.assert_found({'ID': 2}, None)
+        self.parser.register_object(self.parser.objects[2])
+        self.assert_found({'ID': 5}, 2)
+
+        # objects put in the registry directly are indexed when searched
+        self.parser.objects[4] = ImportObject(
+            OrderedDict([('ID', 4), ('slug', 'd')]), rowcount=4
+        )
+        self.assert_found({'ID': 4}, 4)
+        del self.parser.objects[1]
+        self.assert_found({'slug': 'a'}, None)
+
+        # indices are rebuilt for a new registry instead of being pickled
+        self.assertNotIn('search_indices', self.parser.__getstate__())
+        self.parser.clear_transients()
+        self.assertIsNot(self.parser.get_search_index(
+            'objects', self.parser.objects, self.search_keys
+        ), search_index)
+
+    @pytest.mark.slow
+    def test_find_object_benchmark(self):
+        table = []
+        for count in [1000, 5000]:
+            self.parser.clear_transients()
+            for rowcount in range(1, count + 1):
+                self.parser.register_object(ImportObject(OrderedDict([
+                    ('ID', rowcount), ('slug', 'slug-%d' % rowcount)
+                ]), rowcount=rowcount))
+            row = [count]
+            for indexed in [False, True]:
+                start = time.time()
+                for rowcount in range(1, count + 1):
+                    self.find({'ID': rowcount}, indexed)
+                row.append('%.2f' % (time.time() - start))
+            table.append(row)
+        print("\nfind_object benchmark:\n%s" % tabulate(
+            table, headers=['objects', 'scan (s)', 'indexed (s)']
+        ))
+
+
+class TestCsvParseBaseRowPlan(unittest.TestCase):
+    """ Test that rows extracted with the row plan match retrieving each col. """
+
+    class GenParser(CsvParseBase):
+        sanitize_cell = SanitationUtils.sanitize_cell
+
+    def setUp(self):
+        Registrar.DEBUG_ERROR = False
+        Registrar.DEBUG_WARN = False
+        Registrar.DEBUG_MESSAGE = False
+
+    def read_rows(self, file_name):
+        with open(os.path.join(TESTS_DATA_DIR, file_name)) as csv_file:
+            return [
+                row for row in unicodecsv.reader(csv_file, encoding='utf8')
+                if any(row)
+            ]
+
+    def get_fixtures(self):
+        """ Get parsers which have analysed the headers and rows of fixtures. """
+        user_rows = self.read_rows('merger_master_dummy.csv')
+        gen_rows = self.read_rows('generator_master_dummy.csv')
+        gen_cols = SeqUtils.filter_unique_true([
+            SanitationUtils.sanitize_cell(cell) for cell in gen_rows[0]
+        ])
+        defaults = OrderedDict([('post_status', u' publish '), ('Missing', 1)])
+        return [
+            (
+                'user', CsvParseUser(
+                    cols=user_rows[0] + ['Missing', 'No Default'],
+                    defaults=defaults
+                ),
+                user_rows
+            ),
+            (
+                'generator', self.GenParser(
+                    gen_cols + ['Missing', 'No Default'], defaults
+                ),
+                gen_rows
+            ),
+        ]
+
+    def test_extract_row(self):
+        for _, parser, rows in self.get_fixtures():
+            parser.analyse_header(rows[0])
+            self.assertTrue(parser.row_plan)
+            for row in rows[1:] + [rows[1][:3], []]:
+                row_data = parser.get_parser_data(row=row)
+                row_plan = parser.row_plan
+                parser.row_plan = None
+                self.assertEqual(
+                    row_data.items(), parser.get_parser_data(row=row).items()
+                )
+                parser.row_plan = row_plan
+            self.assertEqual(row_data['Missing'], u'1')
+            self.assertNotIn('No Default', row_data)
+
+        parser.clear_transients()
+        self.assertIsNone(parser.row_plan)
+
+    @pytest.mark.slow
+    def test_extract_row_benchmark(self):
+        repeat = 100
+        table = []
+        for name, parser, rows in self.get_fixtures():
+            parser.analyse_header(rows[0])
+            row = [name, len(rows[1:]) * repeat]
+            for planned in [False, True]:
+                start = time.time()
+                for _ in range(repeat):
+                    # start each pass like a new file
+                    parser.row_plan = None
+                    if planned:
+                        parser.compile_row_plan()
+                    for unicode_row in rows[1:]:
+                        parser.get_parser_data(row=unicode_row)
+                row.append('%.0f' % (row[1] / (time.time() - start)))
+            table.append(row)
+        print("\nrow extraction benchmark:\n%s" % tabulate(table, headers=[
+            'fixture', 'rows', 'retrieved (rows/s)', 'planned (rows/s)'
+        ]))
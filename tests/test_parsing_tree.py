@@ -0,0 +1,113 @@
+import cPickle
+import unittest
+from copy import deepcopy
+
+from context import woogenerator
+from woogenerator.parsing.abstract import dumps_object_graph, loads_object_graph
+from woogenerator.parsing.tree import (ImportTreeItem, ImportTreeRoot,
+                                       ImportTreeTaxo)
+from woogenerator.utils import Registrar
+
+
+class TestImportTreeMemos(unittest.TestCase):
+    def setUp(self):
+        Registrar.DEBUG_ERROR = False
+        Registrar.DEBUG_WARN = False
+        Registrar.DEBUG_MESSAGE = False
+        Registrar.DEBUG_PROGRESS = False
+
+        self.root = ImportTreeRoot()
+        self.taxo = ImportTreeTaxo(
+            {'VISIBILITY': 'hidden'}, rowcount=1, parent=self.root, depth=0
+        )
+        self.subtaxo = ImportTreeTaxo(
+            {}, rowcount=2, parent=self.taxo, depth=1
+        )
+        self.item = ImportTreeItem({}, rowcount=3, parent=self.subtaxo, depth=2)
+        self.other_taxo = ImportTreeTaxo(
+            {'VISIBILITY': 'visible'}, rowcount=4, parent=self.root, depth=0
+        )
+
+    def test_ancestors(self):
+        self.assertEqual(self.item.ancestors, [self.taxo, self.subtaxo])
+        self.assertIs(self.item.ancestor_tuple, self.item.ancestor_tuple)
+        self.assertEqual(self.item.taxo_ancestors, [self.taxo, self.subtaxo])
+        self.assertEqual(self.item.item_ancestors, [])
+        self.assertEqual(self.taxo.ancestors, [])
+
+        # reassigning a parent clears the ancestors of its descendants
+        self.subtaxo.parent = self.other_taxo
+        self.assertEqual(self.item.ancestors, [self.other_taxo, self.subtaxo])
+        self.assertEqual(
+            self.item.get_ancestor_self_key('rowcount'), [3, 4, 2]
+        )
+
+    def test_inherit_key(self):
+        self.assertEqual(self.item.get_inherited_value('VISIBILITY'), 'hidden')
+
+        # a key changing on an ancestor clears the values it passed down
+        self.subtaxo['VISIBILITY'] = 'shown'
+        self.assertEqual(self.item.get_inherited_value('VISIBILITY'), 'shown')
+        del self.subtaxo['VISIBILITY']
+        self.assertEqual(self.item.get_inherited_value('VISIBILITY'), 'hidden')
+        self.taxo['VISIBILITY'] = ''
+        self.assertIsNone(self.item.get_inherited_value('VISIBILITY'))
+
+        self.subtaxo.parent = self.other_taxo
+        self.item.inherit_key('VISIBILITY')
+        self.assertEqual(self.item['VISIBILITY'], 'visible')
+
+    def test_memos_not_pickled(self):
+        self.item.get_inherited_value('VISIBILITY')
+        item = loads_object_graph(dumps_object_graph(self.item))
+        self.assertNotIn('_ancestors', vars(item))
+        self.assertNotIn('_inherited', vars(item))
+        self.assertEqual(
+            [ancestor.rowcount for ancestor in item.ancestors], [1, 2]
+        )
+        self.assertEqual(item.get_inherited_value('VISIBILITY'), 'hidden')
+
+
+class TestImportTreeReduce(unittest.TestCase):
+    def setUp(self):
+        Registrar.DEBUG_ERROR = False
+        Registrar.DEBUG_WARN = False
+        Registrar.DEBUG_MESSAGE = False
+        Registrar.DEBUG_PROGRESS = False
+
+        self.root = ImportTreeRoot()
+        self.taxo = ImportTreeTaxo(
+            {'VISIBILITY': 'hidden'}, rowcount=1, parent=self.root, depth=0
+        )
+        self.subtaxo = ImportTreeTaxo(
+            {}, rowcount=2, parent=self.taxo, depth=1
+        )
+        self.item = ImportTreeItem(
+            {'CODE': 'A'}, rowcount=3, parent=self.subtaxo, depth=2
+        )
+
+    def test_pickle(self):
+        taxo = cPickle.loads(cPickle.dumps(self.taxo, cPickle.HIGHEST_PROTOCOL))
+        self.assertIsInstance(taxo, ImportTreeTaxo)
+        self.assertEqual(taxo.items(), self.taxo.items())
+        # unpickling does not register children with their parents again
+        self.assertEqual(len(taxo.parent.children), 1)
+        self.assertEqual(len(taxo.children), 1)
+        subtaxo = taxo.children[0]
+        self.assertIs(subtaxo.parent, taxo)
+        item = subtaxo.children[0]
+        self.assertIsInstance(item, ImportTreeItem)
+        self.assertEqual(item.items(), self.item.items())
+        self.assertEqual(item.ancestors, [taxo, subtaxo])
+
+    def test_deepcopy(self):
+        item = deepcopy(self.item)
+        self.assertIsInstance(item, ImportTreeItem)
+        self.assertIsNot(item, self.item)
+        self.assertEqual(item.items(), self.item.items())
+        self.assertEqual(item.rowcount, self.item.rowcount)
+        self.assertIs(item.parent, self.subtaxo)
+
+
+if __name__ == '__main__':
+    unittest.main()
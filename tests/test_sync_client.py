@@ -1,9 +1,18 @@
+import json
 import logging
+import multiprocessing
+import os
+import resource
+import shutil
+import sqlite3
+import tempfile
+import time
 import unittest
 from collections import OrderedDict
 from pprint import pformat
 
 import pytest
+from tabulate import tabulate
 
 from context import TESTS_DATA_DIR, get_testdata, woogenerator
 from woogenerator.client.core import (SyncClientGDrive, SyncClientSqlWP,
@@ -13,12 +22,17 @@ from woogenerator.client.prod import ProdSyncClientWC
 from woogenerator.client.user import UsrSyncClientWP
 from woogenerator.coldata import ColDataWpPost, ColDataProductMeridian
 from woogenerator.conf.parser import ArgumentParserCommon, ArgumentParserProd
+from woogenerator.generator import (analyse_slave_incremental,
+                                    merge_api_items, upload_changes_batch)
 from woogenerator.namespace.core import (MatchNamespace, ParserNamespace,
                                          SettingsNamespaceProto,
                                          UpdateNamespace)
 from woogenerator.namespace.prod import SettingsNamespaceProd
 from woogenerator.namespace.user import SettingsNamespaceUser
-from woogenerator.utils import Registrar, SanitationUtils, TimeUtils
+from woogenerator.utils import (JsonLinesCache, Registrar, SanitationUtils,
+                               TimeUtils)
+
+from utils import MockApiServer
 
 from .abstract import AbstractWooGeneratorTestCase
 
@@ -100,7 +114,7 @@ class TestSyncClientAccordance(AbstractSyncClientTestCase):
         client_args = self.settings.slave_download_client_args
 
         with client_class(**client_args) as client:
-            rows = client.get_rows(None, limit=1)
+            rows = list(client.get_rows(None, limit=1))
             headers = rows[0]
             first_values = rows[1]
             wp_sql_first_post_raw = OrderedDict(zip(headers, first_values))
@@ -196,7 +210,7 @@ class TestSyncClientAccordanceProd(AbstractSyncClientTestCase):
 
         with client_class(**client_args) as client:
             client.coldata_class = ColDataProductMeridian
-            rows = client.get_rows(None, limit=1, filter_pkey=wc_api_first_prod_id)
+            rows = list(client.get_rows(None, limit=1, filter_pkey=wc_api_first_prod_id))
             headers = rows[0]
             first_values = rows[1]
             wp_sql_first_prod_raw = OrderedDict(zip(headers, first_values))
@@ -312,6 +326,433 @@ class TestSyncClientAccordanceProd(AbstractSyncClientTestCase):
         pass
 
 
+class TestSyncClientConcurrentPages(unittest.TestCase):
+    """ Test fetching pages concurrently from a local stand in API. """
+    item_count = 95
+    per_page = 10
+
+    def setUp(self):
+        Registrar.DEBUG_PROGRESS = False
+        Registrar.DEBUG_API = False
+        self.items = [{'id': i} for i in range(self.item_count)]
+
+    def get_pages(self, api, concurrency=None):
+        connect_params = {
+            'url': api.url,
+            'consumer_key': 'key',
+            'consumer_secret': 'secret',
+            'no_auth': True,
+            'limit': self.per_page,
+            'concurrency': concurrency,
+        }
+        with SyncClientWC(connect_params) as client:
+            iterator = client.get_iterator('products')
+            try:
+                return list(iterator)
+            finally:
+                iterator.close()
+
+    def test_concurrent_pages_in_order(self):
+        with MockApiServer(self.items) as api:
+            pages = self.get_pages(api, concurrency=4)
+        self.assertEqual(len(pages), 10)
+        self.assertEqual(
+            [item for page in pages for item in page],
+            self.items
+        )
+        self.assertEqual(len(api.requests), 10)
+
+    def test_concurrent_matches_serial(self):
+        with MockApiServer(self.items) as api:
+            serial_pages = self.get_pages(api)
+            concurrent_pages = self.get_pages(api, concurrency=3)
+        self.assertEqual(serial_pages, concurrent_pages)
+
+    def test_concurrent_single_page(self):
+        with MockApiServer(self.items[:5]) as api:
+            pages = self.get_pages(api, concurrency=4)
+        self.assertEqual(pages, [self.items[:5]])
+
+    def test_concurrent_faster(self):
+        with MockApiServer(self.items, delay=0.05) as api:
+            start = time.time()
+            self.get_pages(api)
+            serial_duration = time.time() - start
+            start = time.time()
+            self.get_pages(api, concurrency=5)
+            concurrent_duration = time.time() - start
+        self.assertLess(concurrent_duration, serial_duration)
+
+
+class TestSyncClientBatch(unittest.TestCase):
+    """ Test uploading batches of changes to a local stand in API. """
+
+    def setUp(self):
+        Registrar.DEBUG_PROGRESS = False
+        Registrar.DEBUG_API = False
+        Registrar.DEBUG_WARN = False
+        self.items = [{'id': i, 'name': 'item %d' % i} for i in range(1, 8)]
+
+    def get_client(self, api, batch_size=3):
+        connect_params = {
+            'url': api.url,
+            'consumer_key': 'key',
+            'consumer_secret': 'secret',
+            'no_auth': True,
+            'batch_size': batch_size,
+        }
+        return ProdSyncClientWC(connect_params)
+
+    def test_batch_mode(self):
+        with MockApiServer(self.items) as api:
+            with self.get_client(api) as client:
+                self.assertTrue(client.batch_mode)
+                self.assertEqual(client.batch_endpoint, 'products/batch')
+            with self.get_client(api, None) as client:
+                self.assertFalse(client.batch_mode)
+
+    def test_upload_changes_batch(self):
+        updates = [
+            (pkey, {'name': 'new item %d' % pkey}) for pkey in [1, 99, 3, 4, 5]
+        ]
+        with MockApiServer(self.items) as api:
+            with self.get_client(api) as client:
+                results = client.upload_changes_batch(
+                    create=[{'name': 'created', 'parent': -1}],
+                    update=updates,
+                    delete=[7]
+                )
+        self.assertEqual(
+            [len(batch.get('create', [])) + len(batch.get('update', []))
+             + len(batch.get('delete', [])) for batch in api.batches],
+            [3, 3, 1]
+        )
+        self.assertEqual(api.batches[0]['create'], [{'name': 'created'}])
+        self.assertEqual(results['create'][0]['id'], 8)
+        self.assertEqual(len(results['update']), len(updates))
+        for (pkey, changes), result in zip(updates, results['update']):
+            if pkey == 99:
+                self.assertIsInstance(result, UserWarning)
+                self.assertIn('Invalid ID', str(result))
+                continue
+            self.assertEqual(result['id'], pkey)
+            self.assertEqual(result['name'], changes['name'])
+        self.assertEqual(results['delete'][0]['id'], 7)
+        self.assertIsNone(api.find_item(7))
+
+    def test_generator_upload_changes_batch(self):
+        batch_updates = [
+            ('update %d' % pkey, pkey, {'name': 'new'}) for pkey in [2, 99, 6]
+        ]
+        with MockApiServer(self.items) as api:
+            with self.get_client(api) as client:
+                responses = upload_changes_batch(client, batch_updates)
+        self.assertEqual(
+            [sync_update for sync_update, _ in responses],
+            ['update 2', 'update 99', 'update 6']
+        )
+        self.assertEqual(responses[0][1]['id'], 2)
+        self.assertIsInstance(responses[1][1], UserWarning)
+        self.assertEqual(responses[2][1]['name'], 'new')
+
+    def test_upload_changes_batch_request_fails(self):
+        with MockApiServer(self.items) as api:
+            with self.get_client(api) as client:
+                api.fail_batches = True
+                results = client.upload_changes_batch(
+                    update=[(1, {'name': 'new'}), (2, {'name': 'new'})]
+                )
+        self.assertEqual(len(results['update']), 2)
+        for result in results['update']:
+            self.assertIsInstance(result, Exception)
+
+
+class SqliteSyncClientSqlWP(SyncClientSqlWP):
+    """ A stand in for SyncClientSqlWP which reads from a SQLite database. """
+    fetch_calls = 0
+
+    class CountingCursor(sqlite3.Cursor):
+        def fetchmany(self, *args, **kwargs):
+            SqliteSyncClientSqlWP.fetch_calls += 1
+            return super(SqliteSyncClientSqlWP.CountingCursor, self).fetchmany(
+                *args, **kwargs
+            )
+
+    def get_connection(self):
+        return sqlite3.connect(self.db_params['database'])
+
+    def get_cursor(self, connection):
+        return connection.cursor(self.CountingCursor)
+
+
+class TestSyncClientSqlStream(unittest.TestCase):
+    """ Test streaming rows from a SQLite stand in for the WP database. """
+    post_count = 25
+    meta_keys = ['_thumbnail_id', '_unrelated']
+
+    def setUp(self):
+        Registrar.DEBUG_PROGRESS = False
+        Registrar.DEBUG_API = False
+        self.db_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.db_dir, 'wp.sqlite')
+        self.make_database(self.db_path, self.post_count)
+        SqliteSyncClientSqlWP.fetch_calls = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.db_dir)
+
+    @classmethod
+    def make_database(cls, db_path, post_count):
+        col_paths = ColDataWpPost.get_target_path_translation('wp-sql')
+        core_cols = [
+            path for path in col_paths.values()
+            if path and '.' not in path
+        ]
+        connection = sqlite3.connect(db_path)
+        connection.execute("CREATE TABLE wp_posts (%s)" % ", ".join(core_cols))
+        connection.execute(
+            "CREATE TABLE wp_postmeta (post_id, meta_key, meta_value)"
+        )
+        for post_id in range(1, post_count + 1):
+            post = dict([(col, u'%s %d' % (col, post_id)) for col in core_cols])
+            post['ID'] = post_id
+            post['post_modified_gmt'] = u'2017-01-%02d 00:00:00' % min(post_id, 28)
+            connection.execute(
+                "INSERT INTO wp_posts (%s) VALUES (%s)" % (
+                    ", ".join(core_cols), ", ".join(['?'] * len(core_cols))
+                ),
+                [post[col] for col in core_cols]
+            )
+            connection.executemany(
+                "INSERT INTO wp_postmeta VALUES (?, ?, ?)",
+                [
+                    (post_id, meta_key, u'%s %d' % (meta_key, post_id))
+                    for meta_key in cls.meta_keys
+                ]
+            )
+        connection.commit()
+        connection.close()
+
+    @classmethod
+    def get_client(cls, db_path, **kwargs):
+        return SqliteSyncClientSqlWP(
+            {}, {'database': db_path, 'tbl_prefix': 'wp_'}, **kwargs
+        )
+
+    def test_get_rows(self):
+        with self.get_client(self.db_path) as client:
+            rows = list(client.get_rows(None))
+        headers = rows[0]
+        self.assertIn(u'id', headers)
+        self.assertIn(u'featured_media_id', headers)
+        self.assertEqual(len(rows), self.post_count + 1)
+        first_post = dict(zip(headers, rows[1]))
+        self.assertEqual(first_post[u'id'], u'1')
+        self.assertEqual(first_post[u'featured_media_id'], u'_thumbnail_id 1')
+        for row in rows:
+            for cell in row:
+                self.assertIsInstance(cell, unicode)
+
+    def test_get_rows_filter(self):
+        with self.get_client(self.db_path) as client:
+            rows = list(client.get_rows(None, filter_pkey=3))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(dict(zip(rows[0], rows[1]))[u'id'], u'3')
+
+    def test_get_rows_since(self):
+        with self.get_client(self.db_path) as client:
+            rows = list(client.get_rows(None, since='2017-01-20'))
+        ids = [dict(zip(rows[0], row))[u'id'] for row in rows[1:]]
+        self.assertEqual(ids, [u'21', u'22', u'23', u'24', u'25'])
+        with self.get_client(self.db_path, since='2017-01-24T00:00:00') as client:
+            rows = list(client.get_rows(None))
+        self.assertEqual(len(rows), 2)
+
+    def test_get_rows_streams(self):
+        with self.get_client(self.db_path, fetch_size=10) as client:
+            rows = client.get_rows(None)
+            rows.next()
+            rows.next()
+            self.assertEqual(SqliteSyncClientSqlWP.fetch_calls, 1)
+            self.assertEqual(len(list(rows)), self.post_count - 1)
+        # three batches of 10 rows, then an empty batch
+        self.assertEqual(SqliteSyncClientSqlWP.fetch_calls, 4)
+
+    @classmethod
+    def measure_rows_memory(cls, db_path, stream, queue):
+        """ Consume rows in a child process, report peak memory growth (kb). """
+        with open('/proc/self/statm') as statm:
+            start_rss = int(statm.read().split()[1]) \
+                * resource.getpagesize() / 1024
+        with cls.get_client(db_path) as client:
+            rows = client.get_rows(None)
+            if not stream:
+                # old behaviour, every row is materialized
+                rows = list(rows)
+            row_count = sum(1 for _ in rows)
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        queue.put((row_count, peak_rss - start_rss))
+
+    @pytest.mark.slow
+    def test_get_rows_memory_benchmark(self):
+        table = []
+        for post_count in [10000, 50000, 200000]:
+            db_path = os.path.join(self.db_dir, 'wp_%d.sqlite' % post_count)
+            self.make_database(db_path, post_count)
+            row = [post_count]
+            for stream in [False, True]:
+                queue = multiprocessing.Queue()
+                process = multiprocessing.Process(
+                    target=self.measure_rows_memory,
+                    args=(db_path, stream, queue)
+                )
+                start = time.time()
+                process.start()
+                row_count, peak_kb = queue.get()
+                process.join()
+                self.assertEqual(row_count, post_count + 1)
+                row += ['%.1f' % (peak_kb / 1024.0), '%.2f' % (time.time() - start)]
+            table.append(row)
+        print("get_rows memory benchmark:\n%s" % tabulate(table, headers=[
+            'posts', 'list peak (MB)', 'list (s)', 'stream peak (MB)', 'stream (s)'
+        ]))
+
+
+class TestSyncClientIncremental(unittest.TestCase):
+    """ Test downloading only the items modified since the last download. """
+
+    class Settings(dict):
+        """ Just the settings used by incremental slave downloads. """
+        def __init__(self, data_dir, **kwargs):
+            super(TestSyncClientIncremental.Settings, self).__init__(**kwargs)
+            self.__dict__ = self
+            self.download_slave = True
+            self.slave_incremental = True
+            self.do_categories = False
+            self.do_images = False
+            self.slave_path = os.path.join(data_dir, 'slave-1.json')
+            self.slave_cache_path = os.path.join(data_dir, 'slave-cache.json')
+            self.slave_watermark_path = os.path.join(
+                data_dir, 'slave-watermark.json'
+            )
+
+    class Parser(object):
+        def __init__(self):
+            self.analysed = []
+
+        def analyse_api_objs(self, api_datas):
+            self.analysed.extend(api_datas)
+
+    def setUp(self):
+        Registrar.DEBUG_PROGRESS = False
+        Registrar.DEBUG_API = False
+        Registrar.DEBUG_MESSAGE = False
+        self.data_dir = tempfile.mkdtemp()
+        self.items = [
+            {
+                'id': i,
+                'name': 'item %d' % i,
+                'date_modified_gmt': '2017-01-%02dT00:00:00' % i
+            } for i in range(1, 26)
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def get_client(self, api):
+        connect_params = {
+            'url': api.url,
+            'consumer_key': 'key',
+            'consumer_secret': 'secret',
+            'no_auth': True,
+            'limit': 10,
+        }
+        return ProdSyncClientWC(connect_params)
+
+    def test_get_items_since(self):
+        with MockApiServer(self.items) as api:
+            with self.get_client(api) as client:
+                items = list(client.get_items(since='2017-01-20 00:00:00'))
+        self.assertEqual([item['id'] for item in items], range(21, 26))
+        self.assertIn('modified_after=2017-01-20T00%3A00%3A00', api.requests[0])
+        # modified_after is read in the site's local time unless dates_are_gmt
+        self.assertIn('dates_are_gmt=true', api.requests[0])
+
+    def test_merge_api_items(self):
+        merged = merge_api_items(
+            [{'id': 1, 'v': 'a'}, {'id': 2, 'v': 'a'}],
+            [{'id': 2, 'v': 'b'}, {'id': 3, 'v': 'b'}]
+        )
+        self.assertEqual(merged, [
+            {'id': 1, 'v': 'a'}, {'id': 2, 'v': 'b'}, {'id': 3, 'v': 'b'}
+        ])
+
+    def test_analyse_slave_incremental(self):
+        settings = self.Settings(self.data_dir)
+        parsers = ParserNamespace()
+
+        # no cache yet, so everything is downloaded
+        parsers.slave = self.Parser()
+        with MockApiServer(self.items) as api:
+            with self.get_client(api) as client:
+                analyse_slave_incremental(parsers, settings, client)
+        self.assertEqual(len(parsers.slave.analysed), 25)
+        self.assertNotIn('modified_after', api.requests[0])
+        self.assertNotIn('dates_are_gmt', api.requests[0])
+        with open(settings.slave_cache_path, 'w') as cache_file:
+            json.dump(parsers.slave.analysed, cache_file)
+        with open(settings.slave_watermark_path, 'w') as watermark_file:
+            json.dump({'since': '2017-01-22T00:00:00'}, watermark_file)
+
+        # only modified items are downloaded, and merged with the cache
+        self.items[2]['name'] = 'modified item 3'
+        self.items[2]['date_modified_gmt'] = '2017-02-01T00:00:00'
+        parsers.slave = self.Parser()
+        with MockApiServer(self.items) as api:
+            with self.get_client(api) as client:
+                analyse_slave_incremental(parsers, settings, client)
+        self.assertIn('modified_after=2017-01-22T00%3A00%3A00', api.requests[0])
+        self.assertEqual(len(api.requests), 1)
+        self.assertEqual(len(parsers.slave.analysed), 25)
+        self.assertEqual(parsers.slave.analysed[2]['name'], 'modified item 3')
+        self.assertTrue(settings.slave_watermark)
+
+    def test_analyse_slave_incremental_jsonl(self):
+        settings = self.Settings(self.data_dir)
+        settings.slave_cache_path = os.path.join(
+            self.data_dir, 'slave-cache.jsonl.gz'
+        )
+        parsers = ParserNamespace()
+
+        # no cache yet, so everything is downloaded into the cache
+        parsers.slave = self.Parser()
+        with MockApiServer(self.items) as api:
+            with self.get_client(api) as client:
+                analyse_slave_incremental(parsers, settings, client)
+        self.assertEqual(len(parsers.slave.analysed), 25)
+        self.assertEqual(len(JsonLinesCache(settings.slave_cache_path)), 25)
+        with open(settings.slave_watermark_path, 'w') as watermark_file:
+            json.dump({'since': '2017-01-22T00:00:00'}, watermark_file)
+
+        # modified items are upserted into the cache
+        self.items[2]['name'] = 'modified item 3'
+        self.items[2]['date_modified_gmt'] = '2017-02-01T00:00:00'
+        parsers.slave = self.Parser()
+        with MockApiServer(self.items) as api:
+            with self.get_client(api) as client:
+                analyse_slave_incremental(parsers, settings, client)
+        self.assertIn('modified_after=2017-01-22T00%3A00%3A00', api.requests[0])
+        self.assertEqual(len(parsers.slave.analysed), 25)
+        self.assertEqual(
+            [item['id'] for item in parsers.slave.analysed[-4:]],
+            [3, 23, 24, 25]
+        )
+        self.assertEqual(parsers.slave.analysed[-4]['name'], 'modified item 3')
+        cache = JsonLinesCache(settings.slave_cache_path)
+        self.assertEqual(cache.line_count, 29)
+        self.assertEqual(cache.get(3)['name'], 'modified item 3')
+
+
 @unittest.skip('Tests not mocked yet')
 class TestSyncClientDestructive(AbstractSyncClientTestCase):
 
@@ -2,9 +2,16 @@ from os import sys, path
 from time import sleep
 import unittest
 
+import mock
+
 from context import woogenerator
 from woogenerator.utils import (ProgressCounter, SanitationUtils,
-                                UnicodeCsvDialectUtils, Registrar)
+                                UnicodeCsvDialectUtils, Registrar, VectorUtils)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class testProgressCounter(unittest.TestCase):
@@ -32,6 +39,60 @@ class testUnicodeCsvDialectUtils(unittest.TestCase):
         # print UnicodeCsvDialectUtils.dialect_to_str(csvdialect)
 
 
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class testVectorUtils(unittest.TestCase):
+
+    def map_scalar(self, function, values):
+        response = []
+        for value in values:
+            try:
+                response.append(function(value))
+            except TypeError as exc:
+                response.append(exc)
+        return response
+
+    def assert_column_equal(self, function, values):
+        self.assertTrue(VectorUtils.get_column_function(function)(values))
+        expected = self.map_scalar(function, values)
+        result = VectorUtils.map_column(function, values)
+        self.assertEqual(map(type, result), map(type, expected))
+        self.assertEqual(
+            [value for value in result if not isinstance(value, Exception)],
+            [value for value in expected if not isinstance(value, Exception)]
+        )
+
+    def test_float_column(self):
+        self.assert_column_equal(float, [u'1.5', u' 2 ', 3, u'-4.25', True] * 2)
+
+    def test_currency_column(self):
+        self.assert_column_equal(
+            SanitationUtils.similar_currency_comparison,
+            [u'', u'$12.5', u'3', u'-1.2', u'4.50', u'1000000', u'0.1'] * 2
+        )
+
+    def test_scalar_fallback(self):
+        # ambiguous values are left to the scalar function
+        values = [u'1.5', None] * 4
+        self.assertIsNone(VectorUtils.float_column(values))
+        self.assertTrue(all(
+            isinstance(value, TypeError)
+            for value in VectorUtils.map_column(float, values)[1::2]
+        ))
+        values = [u'2.675', u'1.005', u'abc', None] * 2
+        self.assertIsNone(VectorUtils.currency_column(values))
+        self.assertEqual(
+            VectorUtils.map_column(
+                SanitationUtils.similar_currency_comparison, values
+            ),
+            self.map_scalar(SanitationUtils.similar_currency_comparison, values)
+        )
+        with mock.patch('woogenerator.utils.core.numpy', None):
+            self.assertIsNone(VectorUtils.get_column_function(float))
+            self.assertEqual(
+                VectorUtils.map_column(float, [u'1.5'] * 8), [1.5] * 8
+            )
+
+
 class test_sanitation_utils(unittest.TestCase):
 
     def test_slugify(self):
@@ -0,0 +1,128 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from context import woogenerator
+from woogenerator.utils import JsonLinesCache, Registrar
+
+
+class TestJsonLinesCache(unittest.TestCase):
+    def setUp(self):
+        Registrar.DEBUG_ERROR = False
+        Registrar.DEBUG_WARN = False
+        Registrar.DEBUG_MESSAGE = False
+        Registrar.DEBUG_PROGRESS = False
+        self.data_dir = tempfile.mkdtemp('_jsonl')
+        self.items = [
+            {'id': i, 'name': u'item %d \u00e9' % i} for i in range(1, 11)
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def get_path(self, name):
+        return os.path.join(self.data_dir, name)
+
+    def test_is_jsonl_path(self):
+        self.assertTrue(JsonLinesCache.is_jsonl_path('slave.jsonl'))
+        self.assertTrue(JsonLinesCache.is_jsonl_path('slave.jsonl.gz'))
+        self.assertFalse(JsonLinesCache.is_jsonl_path('slave.json'))
+        self.assertFalse(JsonLinesCache.is_jsonl_path(None))
+
+    def test_write_upsert(self):
+        for name in ['slave.jsonl', 'slave.jsonl.gz']:
+            path = self.get_path(name)
+            cache = JsonLinesCache(path)
+            self.assertEqual(cache.write(self.items), 10)
+            self.assertEqual(list(cache), self.items)
+
+            self.assertEqual(cache.upsert([
+                {'id': 3, 'name': 'modified item 3'},
+                {'id': 11, 'name': 'item 11'},
+            ]), 2)
+            self.assertEqual(len(cache), 11)
+            self.assertEqual(cache.superseded_count, 1)
+            self.assertEqual(cache.get(3), {'id': 3, 'name': 'modified item 3'})
+            self.assertEqual(cache.get(4), self.items[3])
+            self.assertIsNone(cache.get(12))
+            self.assertEqual(
+                [item['id'] for item in cache],
+                [1, 2, 4, 5, 6, 7, 8, 9, 10, 3, 11]
+            )
+
+            # the index is reused while it matches the file, and rebuilt if not
+            reopened = JsonLinesCache(path)
+            self.assertEqual(reopened.offsets, cache.offsets)
+            os.remove(reopened.index_path)
+            rebuilt = JsonLinesCache(path)
+            self.assertEqual(rebuilt.offsets, cache.offsets)
+            self.assertEqual(rebuilt.length, cache.length)
+            self.assertEqual(rebuilt.line_count, cache.line_count)
+
+    def test_upsert_appends(self):
+        path = self.get_path('slave.jsonl')
+        cache = JsonLinesCache(path)
+        cache.write(self.items)
+        with open(path) as cache_file:
+            head = cache_file.read()
+        cache.upsert([{'id': 3, 'name': 'modified item 3'}])
+        with open(path) as cache_file:
+            self.assertTrue(cache_file.read().startswith(head))
+
+    def test_gzip_members(self):
+        path = self.get_path('slave.jsonl.gz')
+        cache = JsonLinesCache(path)
+        cache.write(self.items[:5])
+        cache.upsert(self.items[5:])
+        with gzip.open(path) as cache_file:
+            self.assertEqual(len(cache_file.readlines()), 10)
+
+    def test_compact(self):
+        path = self.get_path('slave.jsonl')
+        cache = JsonLinesCache(path)
+        cache.write(self.items[:2])
+        cache.upsert(self.items[:2])
+        cache.compact()
+        self.assertEqual(cache.superseded_count, 2)
+        cache.upsert(self.items[:1])
+        cache.compact()
+        self.assertEqual(cache.superseded_count, 0)
+        self.assertEqual(list(cache), [self.items[1], self.items[0]])
+        self.assertEqual(sorted(os.listdir(self.data_dir)), [
+            'slave.jsonl', 'slave.jsonl' + JsonLinesCache.index_suffix
+        ])
+        self.assertEqual(JsonLinesCache(path).offsets, cache.offsets)
+
+
+    def test_write_interrupted(self):
+        """ A write which fails part way leaves the file as it was. """
+        path = self.get_path('slave.jsonl')
+        cache = JsonLinesCache(path)
+        cache.write(self.items)
+
+        def failing_download():
+            yield {'id': 1, 'name': 'new item 1'}
+            raise IOError("connection dropped")
+
+        with self.assertRaises(IOError):
+            JsonLinesCache(path).write(failing_download())
+        self.assertEqual(list(JsonLinesCache(path)), self.items)
+        self.assertEqual(sorted(os.listdir(self.data_dir)), [
+            'slave.jsonl', 'slave.jsonl' + JsonLinesCache.index_suffix
+        ])
+
+    def test_truncate(self):
+        """ The index of a file which is about to be overwritten isn't loaded. """
+        path = self.get_path('slave.jsonl')
+        with open(path, 'w') as cache_file:
+            cache_file.write('{"id": 1}\n{"id": 2, "na')
+        cache = JsonLinesCache(path, truncate=True)
+        self.assertEqual(len(cache), 0)
+        cache.write(self.items)
+        self.assertEqual(list(JsonLinesCache(path)), self.items)
+
+
+if __name__ == '__main__':
+    unittest.main()
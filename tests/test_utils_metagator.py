@@ -1,10 +1,16 @@
+import multiprocessing
 import os
 import shutil
 import tempfile
+import time
 import unittest
 
+import pytest
+from PIL import Image
+from tabulate import tabulate
+
 from context import TESTS_DATA_DIR, woogenerator
-from woogenerator.images import MetaGator
+from woogenerator.images import ImageManifest, MetaGator, process_image_file
 from woogenerator.utils import Registrar, TimeUtils
 
 
@@ -68,6 +74,185 @@ class testMetaGator(unittest.TestCase):
         self.assertEquals(response, self.newmeta)
 
 
+class TestProcessImageFile(unittest.TestCase):
+    thumbsize = (100, 100)
+
+    def setUp(self):
+        self.raw_dir = tempfile.mkdtemp('_img_raw')
+        self.dst_dir = tempfile.mkdtemp('_img_dst')
+
+    def tearDown(self):
+        shutil.rmtree(self.raw_dir)
+        shutil.rmtree(self.dst_dir)
+
+    def make_job(self, file_name, **kwargs):
+        job = {
+            'raw_path': os.path.join(self.raw_dir, file_name),
+            'dst_path': os.path.join(self.dst_dir, file_name),
+            'title': u'TITLE',
+            'description': u'DESCRIPTION',
+            'do_remeta_images': True,
+            'do_resize_images': True,
+            'thumbsize': self.thumbsize,
+        }
+        job.update(**kwargs)
+        return job
+
+    def copy_raw(self, path):
+        shutil.copy2(path, self.raw_dir)
+        return os.path.basename(path)
+
+    def test_remeta_and_resize(self):
+        for sample in ['sample_img.jpg', 'sample_img.png']:
+            file_name = self.copy_raw(os.path.join(TESTS_DATA_DIR, sample))
+            job = self.make_job(file_name)
+            result = process_image_file(job)
+            self.assertEqual(result['meta'], {'title': u'', 'description': u''})
+            self.assertEqual(result['file_path'], job['dst_path'])
+            self.assertTrue(result['width'] <= self.thumbsize[0])
+            self.assertTrue(result['height'] <= self.thumbsize[1])
+            self.assertEqual(
+                Image.open(job['dst_path']).size,
+                (result['width'], result['height'])
+            )
+            self.assertEqual(
+                MetaGator(job['raw_path']).read_meta(),
+                {'title': u'TITLE', 'description': u'DESCRIPTION'}
+            )
+            self.assertTrue(result['modified_time'])
+
+    def test_no_resize(self):
+        file_name = self.copy_raw(os.path.join(TESTS_DATA_DIR, 'sample_img.jpg'))
+        job = self.make_job(
+            file_name, do_remeta_images=False, do_resize_images=False
+        )
+        result = process_image_file(job)
+        self.assertEqual(result['file_path'], job['raw_path'])
+        self.assertEqual(
+            (result['width'], result['height']),
+            Image.open(job['raw_path']).size
+        )
+        self.assertFalse(os.path.exists(job['dst_path']))
+
+    def test_missing_file(self):
+        result = process_image_file(self.make_job('missing.jpg'))
+        self.assertNotIn('meta', result)
+        self.assertTrue(result['meta_error'].startswith('error reading meta: '))
+
+    def test_pool_matches_serial(self):
+        raw_dir = os.path.join(TESTS_DATA_DIR, 'imgs_raw')
+        file_names = [
+            self.copy_raw(os.path.join(raw_dir, file_name))
+            for file_name in sorted(os.listdir(raw_dir))[:8]
+        ]
+        jobs = [
+            self.make_job(file_name, do_remeta_images=False)
+            for file_name in file_names
+        ]
+        serial = [process_image_file(job) for job in jobs]
+        for file_name in file_names:
+            os.remove(os.path.join(self.dst_dir, file_name))
+        pool = multiprocessing.Pool(2)
+        try:
+            parallel = pool.map(process_image_file, jobs)
+        finally:
+            pool.terminate()
+            pool.join()
+        keys = ['meta', 'file_path', 'width', 'height']
+        self.assertEqual(
+            [[result.get(key) for key in keys] for result in serial],
+            [[result.get(key) for key in keys] for result in parallel]
+        )
+
+    def test_manifest(self):
+        file_name = self.copy_raw(os.path.join(TESTS_DATA_DIR, 'sample_img.jpg'))
+        manifest_path = os.path.join(self.dst_dir, 'manifest.json')
+        manifest = ImageManifest(manifest_path)
+        job = self.make_job(file_name, use_manifest=True)
+        first = process_image_file(job)
+        manifest.update(file_name, first)
+        manifest.save()
+        self.assertEqual(manifest.misses, 1)
+
+        # reset modified times like an rsync or checkout would
+        for path in [job['raw_path'], job['dst_path']]:
+            os.utime(path, (0, 0))
+
+        manifest = ImageManifest(manifest_path)
+        job['manifest_entry'] = manifest.get(file_name)
+        second = process_image_file(job)
+        manifest.update(file_name, second)
+        self.assertTrue(second.get('manifest_hit'))
+        self.assertEqual(manifest.hits, 1)
+        for key in ['file_path', 'width', 'height', 'modified_time']:
+            self.assertEqual(first[key], second[key])
+
+        job['title'] = u'NEW TITLE'
+        third = process_image_file(job)
+        manifest.update(file_name, third)
+        self.assertFalse(third.get('manifest_hit'))
+        self.assertEqual(manifest.misses, 1)
+        self.assertEqual(
+            MetaGator(job['raw_path']).read_meta()['title'], u'NEW TITLE'
+        )
+
+        job['manifest_entry'] = manifest.get(file_name)
+        job['thumbsize'] = (50, 50)
+        fourth = process_image_file(job)
+        self.assertFalse(fourth.get('manifest_hit'))
+        self.assertTrue(fourth['width'] <= 50)
+
+    def test_manifest_error(self):
+        manifest = ImageManifest()
+        manifest.update('missing.jpg', process_image_file(
+            self.make_job('missing.jpg', use_manifest=True)
+        ))
+        self.assertEqual(manifest.misses, 1)
+        self.assertIsNone(manifest.get('missing.jpg'))
+
+    @pytest.mark.slow
+    def test_process_image_file_benchmark(self):
+        raw_dir = os.path.join(TESTS_DATA_DIR, 'imgs_raw')
+        file_names = [
+            self.copy_raw(os.path.join(raw_dir, file_name))
+            for file_name in sorted(os.listdir(raw_dir))
+        ]
+        jobs = [
+            self.make_job(file_name, do_remeta_images=False)
+            for file_name in file_names
+        ]
+        table = []
+        for workers in [1, 2, 4]:
+            shutil.rmtree(self.dst_dir)
+            os.mkdir(self.dst_dir)
+            start = time.time()
+            if workers > 1:
+                pool = multiprocessing.Pool(workers)
+                try:
+                    pool.map(process_image_file, jobs)
+                finally:
+                    pool.terminate()
+                    pool.join()
+            else:
+                map(process_image_file, jobs)
+            table.append([workers, len(jobs), '%.2f' % (time.time() - start)])
+        manifest = ImageManifest()
+        for file_name, result in zip(file_names, map(process_image_file, [
+                dict(job, use_manifest=True) for job in jobs
+        ])):
+            manifest.update(file_name, result)
+        start = time.time()
+        results = map(process_image_file, [
+            dict(job, manifest_entry=manifest.get(file_name))
+            for file_name, job in zip(file_names, jobs)
+        ])
+        self.assertTrue(all([result.get('manifest_hit') for result in results]))
+        table.append(['1 (manifest)', len(jobs), '%.2f' % (time.time() - start)])
+        print("process_image_file benchmark (cpus: %d):\n%s" % (
+            multiprocessing.cpu_count(),
+            tabulate(table, headers=['workers', 'images', 'total (s)'])
+        ))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,8 @@
 # coding=utf-8
 
+import io
+import itertools
+import json
 import unittest
 from unittest import TestCase
 
@@ -95,6 +98,50 @@ class TestSanitationUtils(TestCase):
         # is actually
         # eyJ1c2VyX2xvZ2luIjogImFkbWluIiwgImZpcnN0X25hbWUiOiAibm_wn5GMb2Twn5GMbGUiLCAidXNlcl91cmwiOiAiaHR0cDovL3d3dy5sYXNlcnBoaWxlLmNvbS9hc2QifQ==
 
+    def test_iter_decode_json_array(self):
+        items = [
+            12345, -1.5e3, 1e-7, True, None, u"a\u00e9\"]",
+            {"x": [1, {"y": "]"}]}, [], {}
+        ]
+        for indent in [None, 2]:
+            json_str = json.dumps(items, indent=indent, ensure_ascii=False)
+            for chunk_size in [1, 2, 7, 65536]:
+                self.assertEqual(
+                    list(SanitationUtils.iter_decode_json_array(
+                        io.BytesIO(json_str.encode('utf8')),
+                        chunk_size=chunk_size
+                    )),
+                    json.loads(json_str)
+                )
+        self.assertEqual(
+            list(SanitationUtils.iter_decode_json_array(io.BytesIO(' [ ] '))),
+            []
+        )
+        for json_str in ['', '{}', '[1,', '[1 2]', '[1,]']:
+            with self.assertRaises(ValueError):
+                list(SanitationUtils.iter_decode_json_array(
+                    io.BytesIO(json_str), chunk_size=2
+                ))
+
+    def test_starts_json_array(self):
+        for json_str, expected in [
+                (' \n[1, 2]', True), ('[]', True), ('{"x": [1]}', False),
+                ('null', False), ('', False)
+        ]:
+            json_file = io.BytesIO(json_str)
+            self.assertEqual(
+                SanitationUtils.starts_json_array(json_file), expected
+            )
+            self.assertEqual(json_file.tell(), 0)
+
+    def test_iter_decode_json_array_stops_early(self):
+        json_file = io.BytesIO(json.dumps(range(100000)))
+        decoded = SanitationUtils.iter_decode_json_array(
+            json_file, chunk_size=1024
+        )
+        self.assertEqual(list(itertools.islice(decoded, 3)), [0, 1, 2])
+        self.assertEqual(json_file.tell(), 1024)
+
     def test_similar_phone_comparison(self):
         pass
         # n1 = u"D\u00C8RWENT"
@@ -1,3 +1,7 @@
+import json
+import os
+import shutil
+import tempfile
 import time
 import unittest
 from datetime import datetime
@@ -6,7 +10,7 @@ import pytz
 
 from context import woogenerator
 from woogenerator.namespace.prod import SettingsNamespaceProd
-from woogenerator.utils import Registrar, TimeUtils
+from woogenerator.utils import Registrar, StageTimer, TimeUtils
 
 from .abstract import AbstractWooGeneratorTestCase
 
@@ -259,5 +263,76 @@ class TestTimeUtilsNormalize(AbstractWooGeneratorTestCase):
             utc_timestamp
         )
 
+class TestStageTimer(unittest.TestCase):
+    def setUp(self):
+        StageTimer.reset()
+
+    def tearDown(self):
+        StageTimer.reset()
+
+    def test_stages(self):
+        @StageTimer.timed(items=len)
+        def populate(count):
+            time.sleep(0.01)
+            return range(count)
+
+        with StageTimer.stage('main'):
+            populate(3)
+            populate(4)
+            with StageTimer.stage('match') as record:
+                StageTimer.add_items(2)
+                sum(range(100000))
+            self.assertEqual(record['items'], 2)
+
+        self.assertEqual(
+            StageTimer.stages.keys(),
+            ['main', 'main/populate', 'main/match']
+        )
+        main = StageTimer.stages['main']
+        populate = StageTimer.stages['main/populate']
+        self.assertEqual(main['depth'], 0)
+        self.assertEqual(populate['depth'], 1)
+        self.assertEqual(populate['calls'], 2)
+        self.assertEqual(populate['items'], 7)
+        self.assertIsNone(main['items'])
+        self.assertTrue(populate['wall_time'] >= 0.02)
+        self.assertTrue(main['wall_time'] >= populate['wall_time'])
+        self.assertTrue(main['process_peak_rss'] > 0)
+        # sub-stages run within their parent, so it grows at least as much
+        match = StageTimer.stages['main/match']
+        self.assertTrue(populate['rss_growth'] >= 0)
+        self.assertTrue(
+            main['rss_growth'] >= populate['rss_growth'] + match['rss_growth']
+        )
+
+        summary = StageTimer.get_summary_text()
+        self.assertIn('main/populate', summary)
+        self.assertIn('rss growth (MB)', summary)
+        self.assertIn('process peak rss (MB)', summary)
+
+    def test_stage_exception(self):
+        with self.assertRaises(ValueError):
+            with StageTimer.stage('fail'):
+                raise ValueError()
+        self.assertEqual(StageTimer.stages['fail']['calls'], 1)
+        with StageTimer.stage('after'):
+            pass
+        self.assertEqual(StageTimer.stages['after']['depth'], 0)
+
+    def test_write_json(self):
+        with StageTimer.stage('main'):
+            StageTimer.add_items(1)
+        tmp_dir = tempfile.mkdtemp('_stages')
+        try:
+            path = os.path.join(tmp_dir, 'stages.json')
+            StageTimer.write_json(path)
+            with open(path) as stages_file:
+                stages = json.load(stages_file)['stages']
+        finally:
+            shutil.rmtree(tmp_dir)
+        self.assertEqual(len(stages), 1)
+        self.assertEqual(stages[0]['stage'], 'main')
+        self.assertEqual(stages[0]['items'], 1)
+
 if __name__ == '__main__':
     unittest.main()
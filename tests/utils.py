@@ -1,5 +1,13 @@
-import mock
+import BaseHTTPServer
+import json
 import socket
+import SocketServer
+import threading
+import time
+import urllib
+import urlparse
+
+import mock
 
 class MockUtils(object):
     @classmethod
@@ -50,3 +58,134 @@ class ConnectionUtils(object):
             return socket.gethostname()
         except Exception as _:
             pass
+
+
+class ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class MockApiServer(object):
+    """
+    A local stand in for a paginated WP / WC REST API endpoint, served from a
+    background thread.
+    """
+
+    def __init__(self, items, delay=0):
+        self.items = items
+        self.delay = delay
+        self.requests = []
+        self.batches = []
+        self.fail_batches = False
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        return 'http://%s:%d' % self.server.server_address
+
+    def find_item(self, pkey):
+        for item in self.items:
+            if item.get('id') == pkey:
+                return item
+
+    def process_batch(self, batch):
+        """ Mimic the WC batch endpoint, reporting errors per item. """
+        self.batches.append(batch)
+        response = {}
+        for data in batch.get('create', []):
+            item = dict(data)
+            item['id'] = max([0] + [i['id'] for i in self.items]) + 1
+            self.items.append(item)
+            response.setdefault('create', []).append(item)
+        for data in batch.get('update', []):
+            item = self.find_item(data.get('id'))
+            if item is None:
+                item = {'id': data.get('id'), 'error': {
+                    'code': 'woocommerce_rest_invalid_id',
+                    'message': 'Invalid ID.',
+                    'data': {'status': 400}
+                }}
+            else:
+                item.update(data)
+            response.setdefault('update', []).append(item)
+        for pkey in batch.get('delete', []):
+            item = self.find_item(pkey)
+            if item is None:
+                item = {'id': pkey, 'error': {
+                    'code': 'woocommerce_rest_invalid_id',
+                    'message': 'Invalid ID.',
+                    'data': {'status': 404}
+                }}
+            else:
+                self.items.remove(item)
+            response.setdefault('delete', []).append(item)
+        return response
+
+    def make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                parsed = urlparse.urlparse(self.path)
+                query = dict(urlparse.parse_qsl(parsed.query))
+                api.requests.append(self.path)
+                per_page = int(query.get('per_page', 10))
+                page = int(query.get('page', 1))
+                items = api.items
+                if 'modified_after' in query:
+                    items = [
+                        item for item in items
+                        if item.get('date_modified_gmt') > query['modified_after']
+                    ]
+                total_pages = max(1, -(-len(items) // per_page))
+                body = json.dumps(
+                    items[(page - 1) * per_page:page * per_page]
+                )
+                if api.delay:
+                    time.sleep(api.delay)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('X-WP-Total', str(len(items)))
+                self.send_header('X-WP-TotalPages', str(total_pages))
+                if page < total_pages:
+                    query['page'] = page + 1
+                    self.send_header('Link', '<%s%s?%s>; rel="next"' % (
+                        api.url, parsed.path, urllib.urlencode(query)
+                    ))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                api.requests.append(self.path)
+                length = int(self.headers.get('Content-Length', 0))
+                data = json.loads(self.rfile.read(length))
+                if api.fail_batches:
+                    body = json.dumps({'code': 'internal_server_error'})
+                    self.send_response(500)
+                elif urlparse.urlparse(self.path).path.endswith('/batch'):
+                    body = json.dumps(api.process_batch(data))
+                    self.send_response(200)
+                else:
+                    body = json.dumps({'code': 'rest_no_route'})
+                    self.send_response(404)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def __enter__(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.make_handler())
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def __exit__(self, exit_type, value, traceback):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,153 @@
+"""
+Persist the state of a sync run stage by stage so that it can be resumed.
+"""
+
+from __future__ import absolute_import
+
+import gzip
+import json
+import os
+
+import dill
+
+from .namespace.core import ParserNamespace
+from .utils import Registrar, TimeUtils
+
+
+class CheckpointStore(Registrar):
+    """
+    Store the output of each stage of a sync run in its own file.
+
+    Each stage is a gzipped dill pickle in the checkpoint directory, listed
+    with the format version and the progress of the run in a JSON manifest.
+
+    The master and slave parsers are stored once. Any stage pickled after
+    them (the parser namespace, matches, updates) refers to their objects by
+    persistent id instead of copying them, so loading such a stage only loads
+    the parsers it refers to, and the objects keep their identity.
+    """
+    version = 2
+    manifest_name = 'checkpoint.json'
+    parser_stages = ['master', 'slave']
+    compresslevel = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.manifest = {
+            'version': self.version,
+            'progress': None,
+            'stages': {}
+        }
+        self.loaded = {}
+        self.refs = {}
+        if os.path.isfile(self.manifest_path):
+            with open(self.manifest_path) as manifest_file:
+                self.manifest = json.load(manifest_file)
+            if self.manifest.get('version') != self.version:
+                raise UserWarning(
+                    "checkpoint %s has version %s, expected %s" % (
+                        self.path, self.manifest.get('version'), self.version
+                    )
+                )
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.path, self.manifest_name)
+
+    @property
+    def progress(self):
+        return self.manifest.get('progress')
+
+    @progress.setter
+    def progress(self, value):
+        self.manifest['progress'] = value
+        self.save_manifest()
+
+    def save_manifest(self):
+        with open(self.manifest_path, 'w') as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=2)
+
+    def get_stage_path(self, stage):
+        return os.path.join(self.path, '%s.pickle.gz' % stage)
+
+    def __contains__(self, stage):
+        return stage in self.manifest['stages']
+
+    def register_refs(self, stage, parser):
+        """ Register the parser stored as `stage` and its objects as refs. """
+        self.refs[id(parser)] = (stage, None)
+        for index, object_ in parser.objects.items():
+            self.refs[id(object_)] = (stage, index)
+
+    def save(self, stage, value):
+        """ Store `value` as the output of `stage`. """
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+        def persistent_id(obj):
+            ref = self.refs.get(id(obj))
+            if ref and ref[0] != stage:
+                return ref
+
+        stage_path = self.get_stage_path(stage)
+        with gzip.open(stage_path, 'wb', self.compresslevel) as stage_file:
+            pickler = dill.Pickler(stage_file, dill.HIGHEST_PROTOCOL)
+            pickler.persistent_id = persistent_id
+            pickler.dump(value)
+
+        if stage in self.parser_stages:
+            self.register_refs(stage, value)
+        self.loaded[stage] = value
+        self.manifest['stages'][stage] = {
+            'file': os.path.basename(stage_path),
+            'size': os.path.getsize(stage_path),
+            'saved': TimeUtils.get_ms_timestamp(),
+        }
+        self.save_manifest()
+
+        if self.DEBUG_MESSAGE:
+            self.register_message("saved %s to %s" % (stage, stage_path))
+
+    def load(self, stage):
+        """ Load the output of `stage`, and any parsers it refers to. """
+        if stage in self.loaded:
+            return self.loaded[stage]
+        if stage not in self:
+            raise UserWarning(
+                "checkpoint %s has no stage %s" % (self.path, stage)
+            )
+
+        def persistent_load(ref):
+            ref_stage, index = ref
+            parser = self.load(ref_stage)
+            if index is None:
+                return parser
+            return parser.objects[index]
+
+        with gzip.open(self.get_stage_path(stage), 'rb') as stage_file:
+            unpickler = dill.Unpickler(stage_file)
+            unpickler.persistent_load = persistent_load
+            value = unpickler.load()
+
+        if stage in self.parser_stages:
+            self.register_refs(stage, value)
+        self.loaded[stage] = value
+
+        if self.DEBUG_MESSAGE:
+            self.register_message("loaded %s from %s" % (stage, self.path))
+        return value
+
+    def save_parsers(self, parsers):
+        """ Store the parsers, only storing master and slave once. """
+        for stage in self.parser_stages:
+            if self.loaded.get(stage) is not getattr(parsers, stage):
+                self.save(stage, getattr(parsers, stage))
+        namespace = ParserNamespace()
+        namespace.anomalous = parsers.anomalous
+        self.save('parsers', namespace)
+
+    def load_parsers(self):
+        parsers = self.load('parsers')
+        for stage in self.parser_stages:
+            setattr(parsers, stage, self.load(stage))
+        return parsers
@@ -6,14 +6,16 @@ Boilerplate for unifying interfaces for disparate API clients.
 from __future__ import absolute_import
 
 import codecs
+import datetime
 import functools
 import itertools
 import os
 import re
 import time
-from collections import Iterable, OrderedDict
+from collections import Iterable, OrderedDict, deque
 from contextlib import closing
 from copy import copy
+from multiprocessing.pool import ThreadPool
 from pprint import pformat
 from StringIO import StringIO
 from urllib import urlencode
@@ -34,7 +36,8 @@ from wordpress import API
 from wordpress.helpers import UrlUtils
 
 from ..coldata import ColDataProductMeridian, ColDataWpEntity, ColDataWpPost
-from ..utils import FileUtils, ProgressCounter, Registrar, SanitationUtils
+from ..utils import (FileUtils, JsonLinesCache, ProgressCounter, Registrar,
+                     SanitationUtils, TimeUtils)
 
 
 class AbstractServiceInterface(object):
@@ -130,6 +133,26 @@ class SyncClientAbstract(ClientAbstract):
         super(SyncClientAbstract, self).__init__(connect_params, **kwargs)
         self.limit = kwargs.get('limit')
 
+    @classmethod
+    def normalize_since(cls, since):
+        """
+        Return the naiive GMT datetime represented by `since`, which can be a
+        datetime or a date / datetime string in wp or iso8601 format.
+        """
+        if not since or isinstance(since, datetime.datetime):
+            return since
+        since = SanitationUtils.coerce_unicode(since).split('.')[0]
+        for fmt in [
+            TimeUtils.iso8601_datetime_format,
+            TimeUtils.wp_datetime_format,
+            TimeUtils.wp_date_format
+        ]:
+            try:
+                return TimeUtils.star_strp_datetime(since, fmt)
+            except ValueError:
+                continue
+        raise UserWarning("could not parse since: %s" % repr(since))
+
     def analyse_remote(self, parser, *args, **kwargs):
         """
         Abstract method for analysing remote data using parser
@@ -281,8 +304,30 @@ class SyncClientLocal(SyncClientAbstract):
     def __exit__(self, exit_type, value, traceback):
         pass
 
+    @classmethod
+    def iter_api_data(cls, data_path):
+        """
+        Yield the api items cached in a JSON or JSON Lines file. A JSON file
+        which does not hold an array yields nothing.
+        """
+        if JsonLinesCache.is_jsonl_path(data_path):
+            for item in JsonLinesCache(data_path):
+                yield item
+            return
+        with open(data_path, 'rbU') as data_file:
+            if not SanitationUtils.starts_json_array(data_file):
+                return
+            for item in SanitationUtils.iter_decode_json_array(data_file):
+                yield item
+
     def analyse_remote(self, parser, **kwargs):
         data_path = kwargs.pop('data_path', None)
+        if JsonLinesCache.is_jsonl_path(data_path):
+            limit = kwargs.get('limit', self.limit)
+            parser.analyse_api_objs(
+                itertools.islice(self.iter_api_data(data_path), limit)
+            )
+            return
         analysis_kwargs = {
             'dialect_suggestion': kwargs.get('dialect_suggestion', self.dialect_suggestion),
             'encoding': kwargs.get('encoding', self.encoding),
@@ -305,28 +350,32 @@ class SyncClientLocal(SyncClientAbstract):
         data_path = kwargs.pop('data_path', None)
         # encoding = kwargs.pop('encoding', None)
 
-        with open(data_path, 'rbU') as data_file:
-            decoded = SanitationUtils.decode_json(data_file.read())
-            if not decoded:
-                warn = UserWarning("could not analyse_remote_categories, json not decoded")
-                self.register_warning(warn)
-
-            if isinstance(decoded, list):
-                parser.process_api_categories_raw(decoded)
+        decoded = self.iter_api_data(data_path)
+        try:
+            first_decoded = next(decoded)
+        except StopIteration:
+            warn = UserWarning("could not analyse_remote_categories, json not decoded")
+            self.register_warning(warn)
+            return
+
+        parser.process_api_categories_raw(
+            itertools.chain([first_decoded], decoded)
+        )
 
     def analyse_remote_imgs(self, parser, **kwargs):
         data_path = kwargs.pop('data_path', None)
         # encoding = kwargs.pop('encoding', None)
 
-        with open(data_path, 'rbU') as data_file:
-            decoded = SanitationUtils.decode_json(data_file.read())
-            if not decoded:
-                warn = UserWarning("could not analyse_remote_imgs, json not decoded")
-                self.register_warning(warn)
+        decoded = self.iter_api_data(data_path)
+        try:
+            first_decoded = next(decoded)
+        except StopIteration:
+            warn = UserWarning("could not analyse_remote_imgs, json not decoded")
+            self.register_warning(warn)
+            return
 
-            if isinstance(decoded, list):
-                for decoded_item in decoded:
-                    parser.analyse_api_image_raw(decoded_item)
+        for decoded_item in itertools.chain([first_decoded], decoded):
+            parser.analyse_api_image_raw(decoded_item)
 
 
 class SyncClientLocalStream(SyncClientLocal):
@@ -356,6 +405,7 @@ class SyncClientGDrive(SyncClientAbstract):
         self.skip_download = gdrive_params.pop('skip_download', None)
         self.gdrive_params = gdrive_params
         credentials = self.get_credentials()
+        self.credentials = credentials
         auth_http = credentials.authorize(httplib2.Http())
 
         superconnect_params = {
@@ -417,7 +467,10 @@ class SyncClientGDrive(SyncClientAbstract):
         if gid:
             download_url += "&gid=" + str(gid)
         if download_url:
-            resp, content = self.service._http.request(download_url)
+            # Http objects are not thread safe, so each download gets its own
+            # and sheets can be downloaded concurrently
+            auth_http = self.credentials.authorize(httplib2.Http())
+            resp, content = auth_http.request(download_url)
             if resp.status == 200:
                 self.register_message('Status: %s' % resp)
                 if content:
@@ -431,8 +484,49 @@ class SyncClientGDrive(SyncClientAbstract):
         return time.strptime(self.drive_file['modifiedDate'],
                              '%Y-%m-%dT%H:%M:%S.%fZ')
 
+    def download_remote(self, data_path=None, **kwargs):
+        """
+        Download a sheet as csv, saving it to `data_path` if given.
+
+        Returns:
+        ----
+            The content of the sheet, or None if it could not be downloaded.
+        """
+        gid = kwargs.get('gid')
+        encoding = kwargs.get('encoding', self.encoding)
+        if Registrar.DEBUG_GDRIVE:
+            message = "Downloading spreadsheet"
+            if gid:
+                message += " with gid %s" % gid
+            if data_path:
+                message += " to: %s" % data_path
+            Registrar.register_message(message)
+
+        content = self.download_file_content_csv(gid)
+        if not content:
+            return
+        if data_path:
+            with codecs.open(data_path, encoding=encoding, mode='w') as out_file:
+                out_file.write(content)
+
+        if Registrar.DEBUG_GDRIVE:
+            message = "downloaded contents of spreadsheet"
+            if gid:
+                message += ' with gid %s' % gid
+            if data_path:
+                message += ' to file %s' % data_path
+            Registrar.register_message(message)
+        return content
+
     def analyse_remote(self, parser, data_path=None, **kwargs):
+        """
+        Download a sheet and analyse it with `parser`.
+
+        If the sheet has already been downloaded with download_remote, its
+        `content` can be given instead of downloading it again.
+        """
         gid = kwargs.pop('gid', None)
+        content = kwargs.pop('content', None)
 
         analysis_kwargs = {
             'encoding': kwargs.get('encoding', self.encoding),
@@ -440,24 +534,13 @@ class SyncClientGDrive(SyncClientAbstract):
         }
 
         if not self.skip_download:
-            if Registrar.DEBUG_GDRIVE:
-                message = "Downloading spreadsheet"
-                if gid:
-                    message += " with gid %s" % gid
-                if data_path:
-                    message += " to: %s" % data_path
-                Registrar.register_message(message)
-
-            content = self.download_file_content_csv(gid)
+            if content is None:
+                content = self.download_remote(
+                    data_path, gid=gid, encoding=analysis_kwargs['encoding']
+                )
             if not content:
                 return
             if data_path:
-                with codecs.open(
-                    data_path,
-                    encoding=analysis_kwargs['encoding'],
-                    mode='w'
-                ) as out_file:
-                    out_file.write(content)
                 parser.analyse_file(
                     data_path, **analysis_kwargs)
             else:
@@ -467,13 +550,6 @@ class SyncClientGDrive(SyncClientAbstract):
                         limit=analysis_kwargs['limit']
                     )
 
-            if Registrar.DEBUG_GDRIVE:
-                message = "downloaded contents of spreadsheet"
-                if gid:
-                    message += ' with gid %s' % gid
-                if out_file:
-                    message += ' to file %s' % data_path
-
 # TODO: probably move REST stuff to rest.py
 
 class SyncClientRest(SyncClientAbstract):
@@ -496,6 +572,12 @@ class SyncClientRest(SyncClientAbstract):
     pagination_offset_key = 'filter[offset]'
     total_pages_key = 'X-WP-TotalPages'
     total_items_key = 'X-WP-Total'
+    since_param = 'filter[updated_at_min]'
+    # the param which makes the api read `since_param` as GMT instead of the
+    # site's local time, if it needs one
+    since_gmt_param = None
+    batch_actions = ['create', 'update', 'delete']
+    batch_supported = False
     page_nesting = True
     search_param = None
     meta_listed = False
@@ -523,6 +605,10 @@ class SyncClientRest(SyncClientAbstract):
             self.total_pages_key = kwargs.get('total_pages_key')
             self.total_items_key = kwargs.get('total_items_key')
             self.progress_counter = None
+            self.concurrency = kwargs.get('concurrency') or 1
+            self.thread_pool = None
+            self.pending_endpoints = None
+            self.pending_results = None
 
             endpoint_queries = UrlUtils.get_query_dict_singular(endpoint)
 
@@ -581,94 +667,98 @@ class SyncClientRest(SyncClientAbstract):
         def __iter__(self):
             return self
 
-        def next(self):
-            """ Used by Iterable to get next item in the API """
-            if Registrar.DEBUG_API:
-                Registrar.register_message('start')
-
-            if self.next_endpoint is None:
-                if Registrar.DEBUG_API:
-                    Registrar.register_message(
-                        'stopping due to no next endpoint')
-                raise StopIteration()
-
-            # get API response
+        def get_response(self, endpoint):
+            """
+            Get the response to `endpoint`, retrying once if the request times
+            out. Safe to call from worker threads.
+            """
             try:
                 if Registrar.DEBUG_API:
-                    Registrar.register_message("api calling endpoint %s" % self.next_endpoint)
-                self.prev_response = self.service.get(self.next_endpoint)
+                    Registrar.register_message("api calling endpoint %s" % endpoint)
+                response = self.service.get(endpoint)
             except (ReadTimeout, ConnectionError) as exc:
-                # instead of processing this endoint, do the page product by
-                # product
-                # if self.limit > 1:
-                #     new_limit = 1
-                #     if Registrar.DEBUG_API:
-                #         Registrar.register_message('reducing limit in %s' %
-                #                                    self.next_endpoint)
-                #
-                #     assert \
-                #     self.pagination_limit_key, \
-                #     "pagination_limit_key required to reduce limit"
-                #     self.next_endpoint = UrlUtils.set_query_singular(
-                #         self.next_endpoint,
-                #         self.pagination_limit_key,
-                #         new_limit
-                #     )
-                #     self.next_endpoint = UrlUtils.del_query_singular(
-                #         self.next_endpoint,
-                #         self.pagination_number_key
-                #     )
-                #     if self.offset:
-                #         self.next_endpoint = UrlUtils.set_query_singular(
-                #             self.next_endpoint,
-                #             self.pagination_offset_key,
-                #             self.offset
-                #         )
-                #
-                #     self.limit = new_limit
-                #
-                #     if Registrar.DEBUG_API:
-                #         Registrar.register_message('new endpoint %s' %
-                #                                    self.next_endpoint)
-
                 sleep_time = 5
 
                 if Registrar.DEBUG_API:
                     Registrar.register_message(
                         'timed out, retrying %s after %ss' % (
-                            self.next_endpoint,
+                            endpoint,
                             sleep_time
                         )
                     )
 
                 time.sleep(sleep_time)
 
-                self.prev_response = self.service.get(self.next_endpoint)
+                response = self.service.get(endpoint)
 
             # handle API errors
-            if self.prev_response.status_code in range(400, 500):
+            if response.status_code in range(400, 500):
                 raise requests.ConnectionError('api call failed: %dd with %s' % (
-                    self.prev_response.status_code, self.prev_response.text))
+                    response.status_code, response.text))
+
+            return response
 
+        def decode_response(self, response, endpoint):
+            """ Decode the json in a response, raising if it contains errors. """
             # can still 200 and fail
             try:
-                prev_response_json = self.prev_response.json()
+                response_json = response.json()
             except JSONDecodeError:
-                prev_response_json = {}
+                response_json = {}
                 exc = requests.ConnectionError(
                     'api call to %s failed: %s' %
-                    (self.next_endpoint, self.prev_response.text))
+                    (endpoint, response.text))
                 Registrar.register_error(exc)
 
-            # if Registrar.DEBUG_API:
-            #     Registrar.register_message('first api response: %s' % str(prev_response_json))
-            if 'errors' in prev_response_json:
+            if 'errors' in response_json:
                 raise requests.ConnectionError('first api call returned errors: %s' %
-                                               (prev_response_json['errors']))
-
-            # process API headers
-            self.process_headers(self.prev_response)
+                                               (response_json['errors']))
+            return response_json
 
+        def start_concurrent(self):
+            """
+            Once the total number of pages is known, queue up the remaining
+            pages to be fetched by a pool of `concurrency` threads.
+            """
+            self.pending_endpoints = deque([
+                (page, UrlUtils.set_query_singular(
+                    self.next_endpoint, self.pagination_number_key, page
+                ))
+                for page in range(self.next_page, self.total_pages + 1)
+            ])
+            self.pending_results = deque()
+            self.next_endpoint = None
+            session = getattr(getattr(self.service, 'requester', None), 'session', None)
+            if session is not None:
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=self.concurrency,
+                    pool_maxsize=self.concurrency
+                )
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+            self.thread_pool = ThreadPool(self.concurrency)
+            self.fill_pending()
+
+        def fill_pending(self):
+            """ Keep at most `concurrency` pages in flight. """
+            while self.pending_endpoints \
+            and len(self.pending_results) < self.concurrency:
+                page, endpoint = self.pending_endpoints.popleft()
+                self.pending_results.append((
+                    page, endpoint,
+                    self.thread_pool.apply_async(self.get_response, (endpoint,))
+                ))
+
+        def close(self):
+            """ Stop any pages still being fetched. """
+            if self.thread_pool is not None:
+                self.thread_pool.terminate()
+                self.thread_pool.join()
+                self.thread_pool = None
+            self.pending_endpoints = None
+            self.pending_results = None
+
+        def update_progress(self, page):
             if self.progress_counter is None:
                 total_items = 0
                 if self.total_items is not None:
@@ -679,11 +769,66 @@ class SyncClientRest(SyncClientAbstract):
                     total_items, items_plural='api_items', verb_past='downloaded'
                 )
             result_count = 0
-            if self.limit and self.next_page:
-                result_count = self.limit * self.next_page
+            if self.limit and page:
+                result_count = self.limit * page
             if Registrar.DEBUG_PROGRESS:
                 self.progress_counter.maybe_print_update(result_count)
 
+        def next_concurrent(self):
+            """ Get the next page fetched by the thread pool, in page order. """
+            if not self.pending_results:
+                if Registrar.DEBUG_API:
+                    Registrar.register_message(
+                        'stopping due to no pending pages')
+                self.close()
+                raise StopIteration()
+
+            page, endpoint, result = self.pending_results.popleft()
+            self.fill_pending()
+            try:
+                self.prev_response = result.get()
+            except BaseException:
+                self.close()
+                raise
+
+            response_json = self.decode_response(self.prev_response, endpoint)
+            self.update_progress(page)
+
+            if Registrar.DEBUG_API:
+                Registrar.register_message("api returned json: %s" % response_json)
+
+            return response_json
+
+        def next(self):
+            """ Used by Iterable to get next item in the API """
+            if Registrar.DEBUG_API:
+                Registrar.register_message('start')
+
+            if self.pending_results is not None:
+                return self.next_concurrent()
+
+            if self.next_endpoint is None:
+                if Registrar.DEBUG_API:
+                    Registrar.register_message(
+                        'stopping due to no next endpoint')
+                raise StopIteration()
+
+            # get API response
+            endpoint = self.next_endpoint
+            self.prev_response = self.get_response(endpoint)
+            prev_response_json = self.decode_response(self.prev_response, endpoint)
+
+            # process API headers
+            self.process_headers(self.prev_response)
+
+            # the first page tells us how many pages there are, so the rest
+            # can be fetched concurrently.
+            if self.concurrency > 1 and self.next_endpoint \
+            and self.next_page and self.total_pages:
+                self.start_concurrent()
+
+            self.update_progress(self.next_page)
+
             if Registrar.DEBUG_API:
                 Registrar.register_message("api returned json: %s" % prev_response_json)
 
@@ -697,6 +842,8 @@ class SyncClientRest(SyncClientAbstract):
 
         self.limit = connect_params.get('limit')
         self.offset = connect_params.get('offset')
+        self.concurrency = connect_params.get('concurrency')
+        self.batch_size = connect_params.get('batch_size')
         self.since = kwargs.get('since')
 
         for param in self.mandatory_params:
@@ -722,15 +869,13 @@ class SyncClientRest(SyncClientAbstract):
 
         super(SyncClientRest, self).__init__(superconnect_params, **kwargs)
 
-    def analyse_remote(self, parser, **kwargs):
+    def get_items(self, **kwargs):
+        """
+        Yield each item in the API, only those modified after `since` if given.
+        """
         limit = kwargs.get('limit', self.limit)
         since = kwargs.get('since', self.since)
         search = kwargs.get('search')
-        if since:
-            pass
-            # TODO: implement kwargs['since']
-
-        result_count = 0
 
         # api_iterator = self.ApiIterator(self.service, self.endpoint_plural)
         endpoint_plural = self.endpoint_plural
@@ -749,8 +894,33 @@ class SyncClientRest(SyncClientAbstract):
             # print "search_param and search DNE, %s %s" % (self.search_param, search)
             # quit()
             pass
+        if since:
+            endpoint_plural = UrlUtils.set_query_singular(
+                endpoint_plural,
+                self.since_param,
+                TimeUtils.star_strf_datetime(
+                    self.normalize_since(since),
+                    TimeUtils.iso8601_datetime_format
+                )
+            )
+            if self.since_gmt_param:
+                endpoint_plural = UrlUtils.set_query_singular(
+                    endpoint_plural, self.since_gmt_param, 'true'
+                )
 
         api_iterator = self.get_iterator(endpoint_plural)
+        try:
+            for item in self.get_page_items(api_iterator, limit):
+                yield item
+        finally:
+            api_iterator.close()
+
+    def analyse_remote(self, parser, **kwargs):
+        parser.analyse_api_objs(self.get_items(**kwargs))
+
+    def get_page_items(self, api_iterator, limit=None):
+        """ Yield each item in each page of `api_iterator`. """
+        result_count = 0
         progress_counter = None
         for page in api_iterator:
             if progress_counter is None:
@@ -775,7 +945,7 @@ class SyncClientRest(SyncClientAbstract):
 
             for page_item in page_items:
 
-                parser.analyse_api_obj(page_item)
+                yield page_item
                 result_count += 1
                 if limit and result_count > limit:
                     if Registrar.DEBUG_API:
@@ -823,6 +993,99 @@ class SyncClientRest(SyncClientAbstract):
         response = self.service.put(service_endpoint, data)
         return self.process_response(response)
 
+    @property
+    def batch_mode(self):
+        """ Whether changes should be uploaded in batches. """
+        return bool(self.batch_supported and self.batch_size)
+
+    @property
+    def batch_endpoint(self):
+        return '%s/batch' % urlparse(self.endpoint_plural).path
+
+    def upload_batch(self, **kwargs):
+        """
+        Upload a single batch of items to the batch endpoint.
+
+        kwargs are lists of items for each of `batch_actions`. Items to update
+        must contain their id, items to delete are ids.
+        Returns the decoded response, a list of results for each action.
+        """
+        data = OrderedDict([
+            (action, kwargs[action]) for action in self.batch_actions
+            if kwargs.get(action)
+        ])
+        if Registrar.DEBUG_API:
+            Registrar.register_message("uploading batch %s: %s" % (
+                self.batch_endpoint,
+                pformat(data)[:1000]
+            ))
+        response = self.service.post(self.batch_endpoint, data)
+        return self.process_response(response).json()
+
+    @classmethod
+    def get_batch_item_result(cls, action, item):
+        """ Convert an item in a batch response to an exception if it failed. """
+        if isinstance(item, dict) and item.get('error'):
+            error = item['error']
+            if isinstance(error, dict):
+                error = error.get('message', error)
+            return UserWarning("could not %s %s: %s" % (
+                action, item.get('id'), error
+            ))
+        return item
+
+    def upload_changes_batch(self, create=None, update=None, delete=None):
+        """
+        Upload items in batches of at most `batch_size` items.
+
+        Args:
+            create (list): data of each item to create
+            update (list): (pkey, data) pairs of each item to update
+            delete (list): pkey of each item to delete
+
+        Returns:
+            OrderedDict: for each action, a list containing the api data of
+            each item in the order it was given, or an exception if the item
+            could not be uploaded.
+        """
+        queue = [
+            ('create', self.get_create_data(data)) for data in (create or [])
+        ] + [
+            ('update', dict(data.items() + [('id', pkey)]))
+            for pkey, data in (update or [])
+        ] + [
+            ('delete', pkey) for pkey in (delete or [])
+        ]
+        results = OrderedDict([(action, []) for action in self.batch_actions])
+        batch_size = self.batch_size or len(queue) or 1
+
+        for start in range(0, len(queue), batch_size):
+            batch = OrderedDict()
+            for action, item in queue[start:start + batch_size]:
+                batch.setdefault(action, []).append(item)
+            try:
+                response_data = self.upload_batch(**batch)
+            except Exception as exc:
+                Registrar.register_warning(exc)
+                for action, items in batch.items():
+                    results[action].extend([exc] * len(items))
+                continue
+            for action, items in batch.items():
+                action_results = response_data.get(action) or []
+                for count, item in enumerate(items):
+                    if count < len(action_results):
+                        result = self.get_batch_item_result(
+                            action, action_results[count]
+                        )
+                    else:
+                        result = UserWarning(
+                            "no result for %s of %s in batch response" % (
+                                action, item
+                            )
+                        )
+                    results[action].append(result)
+        return results
+
     def get_single_endpoint_item(self, pkey):
         service_endpoint = self.get_single_endpoint(pkey)
         response = self.service.get(service_endpoint)
@@ -853,6 +1116,7 @@ class SyncClientRest(SyncClientAbstract):
             pagination_offset_key=self.pagination_offset_key,
             total_pages_key=self.total_pages_key,
             total_items_key=self.total_items_key,
+            concurrency=self.concurrency,
         )
 
     def get_page_generator(self):
@@ -869,11 +1133,7 @@ class SyncClientRest(SyncClientAbstract):
         """
         Creates an item in the API
         """
-        if hasattr(data, 'items'):
-            data = dict([(key, value) for key, value in data.items()])
-        if isinstance(data, dict):
-            if str(data.get('parent')) == str(-1):
-                del data['parent']
+        data = self.get_create_data(data)
         service_endpoint = self.endpoint_plural
         endpoint_singular = self.endpoint_singular
         endpoint_singular = re.sub('/', '_', endpoint_singular)
@@ -901,6 +1161,16 @@ class SyncClientRest(SyncClientAbstract):
         ), "response has errors: %s" % str(response.json()['errors'])
         return response
 
+    @classmethod
+    def get_create_data(cls, data):
+        """ Clean up the data of an item before it is created. """
+        if hasattr(data, 'items'):
+            data = dict([(key, value) for key, value in data.items()])
+        if isinstance(data, dict):
+            if str(data.get('parent')) == str(-1):
+                del data['parent']
+        return data
+
     def delete_item(self, pkey, **kwargs):
         service_endpoint = "%s/%s" % (self.endpoint_plural, pkey)
         force = kwargs.pop('force', False)
@@ -1074,6 +1344,9 @@ class SyncClientWC(SyncClientRest):
     pagination_number_key = 'page'
     search_param = 'name'
     meta_listed = True
+    batch_supported = True
+    since_param = 'modified_after'
+    since_gmt_param = 'dates_are_gmt'
     total_pages_key = 'x-wp-totalpages'
     total_items_key = 'x-wp-total'
     # TODO: do readonly keys with coldata
@@ -1158,6 +1431,7 @@ class SyncClientWP(SyncClientRest):
     ]
     page_nesting = False
     search_param = 'search'
+    since_param = 'modified_after'
     total_pages_key = 'X-WP-TotalPages'
     total_items_key = 'X-WP-Total'
     pagination_limit_key = 'per_page'
@@ -1184,6 +1458,7 @@ class SyncClientSqlWP(SyncClientAbstract):
     coldata_target = 'wp-sql'
     coldata_target_write = 'wp-sql'
     primary_key_handle = 'id'
+    fetch_size = 1000
 
     """docstring for UsrSyncClientSqlWP"""
 
@@ -1191,6 +1466,7 @@ class SyncClientSqlWP(SyncClientAbstract):
         self.db_params = db_params
         self.tbl_prefix = self.db_params.pop('tbl_prefix', '')
         self.since = kwargs.get('since')
+        self.fetch_size = kwargs.get('fetch_size') or self.fetch_size
         super(SyncClientSqlWP, self).__init__(connect_params, **kwargs)
         # self.fs_params = fs_params
 
@@ -1207,18 +1483,51 @@ class SyncClientSqlWP(SyncClientAbstract):
         else:
             self.service = LocalNullTunnel(**self.connect_params)
 
+    def get_connection(self):
+        """ Connect to the database through the tunnel. """
+        self.assert_connect()
+
+        # srv_offset = self.db_params.pop('srv_offset','')
+        self.db_params['port'] = self.service.local_bind_address[-1]
+        return pymysql.connect(**self.db_params)
+
+    def get_cursor(self, connection):
+        """ Get an unbuffered cursor so rows are streamed from the server. """
+        return connection.cursor(pymysql.cursors.SSCursor)
+
+    def stream_rows(self, sql):
+        """
+        Execute `sql` and yield the headers followed by each row as lists of
+        unicode cells, fetching `fetch_size` rows from the server at a time.
+        """
+        connection = self.get_connection()
+        try:
+            cursor = self.get_cursor(connection)
+            cursor.execute(sql)
+
+            yield [SanitationUtils.coerce_unicode(
+                i[0]) for i in cursor.description]
+
+            while True:
+                rows = cursor.fetchmany(self.fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield [SanitationUtils.coerce_unicode(cell) for cell in row]
+            cursor.close()
+        finally:
+            connection.close()
+
     def get_rows(self, _, **kwargs):
+        """
+        Yield the headers followed by each row of posts joined with their meta.
+        """
         limit = kwargs.get('limit', self.limit)
         filter_pkey = kwargs.get('filter_pkey')
+        since = kwargs.get('since', self.since)
 
         # native_pkey = 'ID'
 
-        self.assert_connect()
-
-        # srv_offset = self.db_params.pop('srv_offset','')
-        self.db_params['port'] = self.service.local_bind_address[-1]
-        cursor = pymysql.connect(**self.db_params).cursor()
-
         wp_db_col_paths = self.coldata_class.get_target_path_translation(
             self.coldata_target
         )
@@ -1254,6 +1563,17 @@ class SyncClientSqlWP(SyncClientAbstract):
             ]
         ))
 
+        core_where_clause = ''
+        if since:
+            core_where_clause = "WHERE core.`{native_modified}` > '{since}'".format(
+                native_modified=self.coldata_class.translate_handle(
+                    'modified_gmt', self.coldata_target
+                ),
+                since=TimeUtils.star_strf_datetime(
+                    self.normalize_since(since), TimeUtils.wp_datetime_format
+                )
+            )
+
         sql_select = """
     SELECT
         {select_clause}
@@ -1261,6 +1581,7 @@ class SyncClientSqlWP(SyncClientAbstract):
         {tbl_core} core
         LEFT JOIN {tbl_meta} meta
         ON ( meta.`{meta_fkey}` = core.`{native_pkey}`)
+    {core_where_clause}
     GROUP BY
         core.`{native_pkey}`""".format(
             native_pkey=native_pkey,
@@ -1268,6 +1589,7 @@ class SyncClientSqlWP(SyncClientAbstract):
             tbl_core=self.tbl_prefix + 'posts',
             tbl_meta=self.tbl_prefix + 'postmeta',
             select_clause=select_clause,
+            core_where_clause=core_where_clause,
         )
 
         if Registrar.DEBUG_API:
@@ -1298,20 +1620,10 @@ FROM
         if Registrar.DEBUG_CLIENT:
             Registrar.register_message(sql_select_filter)
 
-        cursor.execute(sql_select_filter)
-
-        headers = [SanitationUtils.coerce_unicode(
-            i[0]) for i in cursor.description]
-
-        results = [[SanitationUtils.coerce_unicode(
-            cell) for cell in row] for row in cursor]
-
-        return [headers] + results
+        for row in self.stream_rows(sql_select_filter):
+            yield row
 
     def analyse_remote(self, parser, filter_items=None, **kwargs):
 
         rows = self.get_rows(filter_items, **kwargs)
-        # print rows
-        if rows:
-            # print "there are %d results" % len(results)
-            parser.analyse_rows(rows)
+        parser.analyse_rows(rows)
@@ -6,7 +6,6 @@ import re
 from collections import OrderedDict
 
 import paramiko
-import pymysql
 import unicodecsv
 from sshtunnel import SSHTunnelForwarder
 
@@ -282,12 +281,6 @@ class UsrSyncClientSqlWP(SyncClientSqlWP):
         since = kwargs.get('since', self.since)
         limit = kwargs.get('limit', self.limit)
 
-        self.assert_connect()
-
-        # srv_offset = self.db_params.pop('srv_offset','')
-        self.db_params['port'] = self.service.local_bind_address[-1]
-        cursor = pymysql.connect(**self.db_params).cursor()
-
         sm_where_clauses = []
 
         if since:
@@ -333,22 +326,6 @@ class UsrSyncClientSqlWP(SyncClientSqlWP):
 
         # print sql_select_modtime
 
-        if since:
-            cursor.execute(sql_select_modtime)
-            headers = [SanitationUtils.coerce_unicode(
-                i[0]) for i in cursor.description]
-            results = [[SanitationUtils.coerce_unicode(
-                cell) for cell in row] for row in cursor]
-            # table = [headers] + results
-            # print tabulate(table, headers='firstrow')
-            # results = list(cursor)
-            # if len(results) == 0:
-            #     #nothing to analyse
-            #     return
-            # else:
-            #     # n rows to analyse
-            #     print "THERE ARE %d ITEMS" % len(results)
-
         wp_db_meta_cols = ColDataUser.get_wpdb_cols(meta=True)
         wp_db_core_cols = ColDataUser.get_wpdb_cols(meta=False)
 
@@ -449,18 +426,6 @@ ON {um_on_clause}
         if Registrar.DEBUG_CLIENT:
             Registrar.register_message(sql_select_user_modtime)
 
-        cursor.execute(sql_select_user_modtime)
-
-        headers = [SanitationUtils.coerce_unicode(
-            i[0]) for i in cursor.description]
-
-        results = [[SanitationUtils.coerce_unicode(
-            cell) for cell in row] for row in cursor]
-
-        rows = [headers] + results
-
-        # print rows
+        rows = self.stream_rows(sql_select_user_modtime)
 
-        if results:
-            # print "there are %d results" % len(results)
-            parser.analyse_rows(rows)
+        parser.analyse_rows(rows)
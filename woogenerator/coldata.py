@@ -5,9 +5,16 @@ Utility for keeping track of column metadata for translating between databases.
 
 from __future__ import absolute_import
 
+import cPickle
 import functools
+import gzip
+import hashlib
+import inspect
 import itertools
+import operator
+import os
 import re
+import sys
 from collections import OrderedDict
 from copy import copy, deepcopy
 from pprint import pformat, pprint
@@ -16,7 +23,7 @@ import jsonpath_ng
 from jsonpath_ng import jsonpath
 
 from .utils import (FileUtils, JSONPathUtils, MimeUtils, PHPUtils, Registrar,
-                    SanitationUtils, SeqUtils, TimeUtils)
+                    SanitationUtils, SeqUtils, TimeUtils, VectorUtils)
 
 # TODO: Replace dicts with `OrderedDict`s
 """
@@ -442,9 +449,16 @@ class ColDataAbstract(ColDataLegacy):
     data = {
     }
 
-    handle_cache = OrderedDict()
     handles_cache = OrderedDict()
     structure_morph_cache = OrderedDict()
+    accessor_cache = OrderedDict()
+    translation_plan_cache = OrderedDict()
+    columnar_types = True
+    path_getter_cache = {}
+    path_setter_cache = {}
+    path_cow_setter_cache = {}
+    property_tables = {}
+    property_tables_version = 1
     re_simple_path = r'^[A-Za-z_]+$'
 
     @classmethod
@@ -517,43 +531,209 @@ class ColDataAbstract(ColDataLegacy):
             }.get(property_)
 
     @classmethod
-    def get_handle_property(cls, handle, property_, target=None):
+    def get_target_names(cls, targets=None):
+        """
+        Return the names of all targets in the target resolution heirarchy.
+        """
+        if targets is None:
+            targets = cls.targets
+        names = []
+        for this, children in targets.items():
+            names.append(this)
+            if children:
+                names.extend(cls.get_target_names(children))
+        return names
+
+    @classmethod
+    def compile_property_tables(cls):
+        """
+        Resolve the properties of every handle in the context of every target.
+
+        Return a mapping of target (or None) to an `OrderedDict` of handle to
+        the resolved properties of that handle. The properties of a handle are
+        overridden by those declared in each target ancestor in order, which is
+        the same precedence as `find_in`.
+        """
+        tables = {}
+        # targets which declare nothing for a handle share its resolved properties
+        resolved_cache = {}
+        for target in [None] + cls.get_target_names():
+            ancestors = cls.get_target_ancestors(cls.targets, target)
+            table = OrderedDict()
+            for handle, properties in cls.data.items():
+                layers = tuple(
+                    ancestor for ancestor in ancestors
+                    if isinstance(properties.get(ancestor), dict)
+                )
+                resolved_key = (handle, layers)
+                if resolved_key not in resolved_cache:
+                    resolved = dict(properties)
+                    for ancestor in layers:
+                        resolved.update(properties[ancestor])
+                    resolved_cache[resolved_key] = resolved
+                table[handle] = resolved_cache[resolved_key]
+            tables[target] = table
+        return tables
+
+    @classmethod
+    def get_property_table(cls, target=None):
         """
-        Return the value of a handle's property in the context of target. Cache for performace.
+        Return the resolved properties of each handle in the context of
+        `target`, compiling the tables of the class on first use.
         """
-        cache_key = (cls.__name__, handle, property_, target)
-        if cache_key in cls.handle_cache:
-            return copy(cls.handle_cache[cache_key])
-        target_ancestors = cls.get_target_ancestors(cls.targets, target)
-        if target and not target_ancestors:
+        tables = cls.property_tables.get(cls.__name__)
+        if tables is None:
+            tables = cls.compile_property_tables()
+            cls.property_tables[cls.__name__] = tables
+        if target not in tables:
             raise UserWarning("target %s not recognized:\n%s" % (
                 target, pformat(cls.targets)
             ))
-        results = cls.find_in(cls.data, property_, target_ancestors, handle)
-        if results:
-            response = results.items()[-1][1]
-        else:
-            response = cls.get_property_default(property_, handle)
-        cls.handle_cache[cache_key] = response
-        return response
+        return tables[target]
+
+    @classmethod
+    def get_coldata_classes(cls):
+        """
+        Return this class and all of its subclasses.
+        """
+        classes = [cls]
+        for subclass in cls.__subclasses__():
+            for coldata_class in subclass.get_coldata_classes():
+                if coldata_class not in classes:
+                    classes.append(coldata_class)
+        return classes
+
+    @classmethod
+    def get_source_hash(cls, classes=None):
+        """
+        Hash the source of the modules which declare `classes`, or None if the
+        source of any of them is not available.
+        """
+        if classes is None:
+            classes = cls.get_coldata_classes()
+        source_hash = hashlib.sha1(str(cls.property_tables_version))
+        for module_name in sorted(set(
+            coldata_class.__module__ for coldata_class in classes
+        )):
+            try:
+                source_path = inspect.getsourcefile(sys.modules[module_name])
+            except TypeError:
+                source_path = None
+            if not source_path or not os.path.isfile(source_path):
+                return None
+            with open(source_path, 'rb') as source_file:
+                source_hash.update(source_file.read())
+        return source_hash.hexdigest()
+
+    @classmethod
+    def load_property_tables(cls, path):
+        """
+        Load the property tables of all coldata classes from the cache at
+        `path` if it matches the version and source of the coldata classes.
+        Return whether the tables were loaded.
+        """
+        if not path or not os.path.isfile(path):
+            return False
+        classes = cls.get_coldata_classes()
+        source_hash = cls.get_source_hash(classes)
+        try:
+            # unpickling from a gzip file is slow, so decompress it all first
+            with gzip.open(path, 'rb') as cache_file:
+                cache = cPickle.loads(cache_file.read())
+        except Exception as exc:
+            Registrar.register_warning(
+                "could not load coldata cache %s: %s" % (path, exc)
+            )
+            return False
+        if cache.get('version') != cls.property_tables_version \
+                or source_hash is None \
+                or cache.get('source_hash') != source_hash:
+            return False
+        for coldata_class in classes:
+            name = coldata_class.__name__
+            if name in cache['tables']:
+                cls.property_tables[name] = cache['tables'][name]
+        return True
+
+    @classmethod
+    def save_property_tables(cls, path):
+        """
+        Compile the property tables of all coldata classes and save them to the
+        cache at `path`, keyed on the version and source of the classes.
+        """
+        classes = cls.get_coldata_classes()
+        source_hash = cls.get_source_hash(classes)
+        if source_hash is None:
+            return False
+        tables = {}
+        for coldata_class in classes:
+            coldata_class.get_property_table()
+            tables[coldata_class.__name__] = \
+                cls.property_tables[coldata_class.__name__]
+        cache_dir = os.path.dirname(path)
+        if cache_dir and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        # write then rename so that concurrent runs never read a partial cache
+        temp_path = '%s.%d.tmp' % (path, os.getpid())
+        with gzip.open(temp_path, 'wb', 1) as cache_file:
+            cPickle.dump({
+                'version': cls.property_tables_version,
+                'source_hash': source_hash,
+                'tables': tables,
+            }, cache_file, cPickle.HIGHEST_PROTOCOL)
+        os.rename(temp_path, path)
+        return True
+
+    @classmethod
+    def init_property_tables(cls, path):
+        """
+        Load the property tables of all coldata classes from the cache at
+        `path`, or compile them and save them there if the cache is stale.
+        """
+        if not path:
+            return
+        if not cls.load_property_tables(path):
+            cls.save_property_tables(path)
+
+    @classmethod
+    def get_handle_property(cls, handle, property_, target=None):
+        """
+        Return the value of a handle's property in the context of target.
+        """
+        properties = cls.get_property_table(target).get(handle)
+        if properties is not None and property_ in properties:
+            value = properties[property_]
+            if isinstance(value, (dict, list)):
+                value = copy(value)
+            return value
+        return cls.get_property_default(property_, handle)
 
     @classmethod
     def get_handles_property(cls, property_, target=None):
         """
         Return a mapping of handles to the value of `property_` wherever it is
         explicitly declared in the context of `target`. Cache for performance.
+
+        Handles which declare `property_` directly come before those which only
+        declare it in a target, in the same order as `find_in`.
         """
         cache_key = (cls.__name__, property_, target)
         if cache_key in cls.handles_cache:
             return copy(cls.handles_cache[cache_key])
-        target_ancestors = cls.get_target_ancestors(cls.targets, target)
-        if target and not target_ancestors:
-            raise UserWarning("target %s not recognized:\n%s" % (
-                target, pformat(cls.targets)
-            ))
-        results = cls.find_in(cls.data, property_, target_ancestors, )
+        table = cls.get_property_table(target)
+        results = OrderedDict()
+        inherited = []
+        for handle, properties in table.items():
+            if property_ not in properties:
+                continue
+            if property_ in cls.data[handle]:
+                results[handle] = properties[property_]
+            else:
+                inherited.append(handle)
+        for handle in inherited:
+            results[handle] = table[handle][property_]
         cls.handles_cache[cache_key] = results
-        return results
+        return copy(results)
 
     @classmethod
     def get_handles_property_defaults(cls, property_, target=None):
@@ -688,6 +868,177 @@ class ColDataAbstract(ColDataLegacy):
     #     getter = jsonpath_ng.parse(path)
     #     return getter.find(data)
 
+    @classmethod
+    def get_path_fields(cls, finder):
+        """
+        Return the sequence of fields that a parsed jsonpath `finder` walks
+        through if it is made only of singular `Fields` and `Child` objects,
+        otherwise None.
+        """
+        if isinstance(finder, jsonpath.Child):
+            left_fields = cls.get_path_fields(finder.left)
+            right_fields = cls.get_path_fields(finder.right)
+            if left_fields is None or right_fields is None:
+                return
+            return left_fields + right_fields
+        if isinstance(finder, jsonpath.Fields):
+            if len(finder.fields) != 1 or '*' in finder.fields:
+                return
+            return tuple(finder.fields)
+
+    @classmethod
+    def compile_path_getter(cls, path):
+        """
+        Return a function which gets the value at `path` from some data,
+        raising `KeyError` or `IndexError` if it is not found, equivalent to
+        calling `jsonpath_ng.parse(path).find(data)[0].value`. Cache for performance.
+        """
+        if path in cls.path_getter_cache:
+            return cls.path_getter_cache[path]
+        if re.match(cls.re_simple_path, path):
+            getter = operator.itemgetter(path)
+        else:
+            finder = jsonpath_ng.parse('"%s"' % path if ' ' in path else path)
+            fields = cls.get_path_fields(finder)
+            if fields is None:
+                def getter(data):
+                    return finder.find(data)[0].value
+            else:
+                def getter(data):
+                    for field in fields:
+                        try:
+                            data = data[field]
+                        except (TypeError, AttributeError):
+                            raise KeyError(field)
+                    return data
+        cls.path_getter_cache[path] = getter
+        return getter
+
+    @classmethod
+    def compile_path_setter(cls, path):
+        """
+        Return a function which sets the value at `path` in some data, creating
+        the path if it doesn't exist, equivalent to calling
+        `JSONPathUtils.blank_update(jsonpath_ng.parse(path), data, value)`.
+        Cache for performance.
+        """
+        if path in cls.path_setter_cache:
+            return cls.path_setter_cache[path]
+        if re.match(cls.re_simple_path, path):
+            def setter(data, value):
+                data[path] = value
+                return data
+        else:
+            updater = jsonpath_ng.parse(
+                '"%s"' % path if (' ' in path or ':' in path) else path
+            )
+            fields = cls.get_path_fields(updater)
+            if fields is None:
+                def setter(data, value):
+                    return JSONPathUtils.blank_update(updater, data, value)
+            else:
+                branch_fields, leaf_field = fields[:-1], fields[-1]
+                def setter(data, value):
+                    node = data
+                    for field in branch_fields:
+                        try:
+                            node = node[field]
+                        except (TypeError, KeyError, AttributeError):
+                            node[field] = {}
+                            node = node[field]
+                    if leaf_field in node and hasattr(value, '__call__'):
+                        value(node[leaf_field], node, leaf_field)
+                    else:
+                        node[leaf_field] = value
+                    return data
+        cls.path_setter_cache[path] = setter
+        return setter
+
+    @classmethod
+    def compile_path_cow_setter(cls, path):
+        """
+        Return a function which sets the value at `path` in some data like the
+        setter from `compile_path_setter`, but without mutating any container
+        which is not in `owned`, a mapping of `id` to the containers made by
+        the caller. Containers on the path which are not owned are shallow
+        copied and added to `owned` first, so the data the caller was given is
+        never changed. Return the data, which is a copy if it was not owned.
+        Cache for performance.
+        """
+        if path in cls.path_cow_setter_cache:
+            return cls.path_cow_setter_cache[path]
+
+        def own(container, owned):
+            if id(container) not in owned:
+                container = copy(container)
+                owned[id(container)] = container
+            return container
+
+        fields = None
+        if re.match(cls.re_simple_path, path):
+            fields = (path, )
+        else:
+            updater = jsonpath_ng.parse(
+                '"%s"' % path if (' ' in path or ':' in path) else path
+            )
+            fields = cls.get_path_fields(updater)
+        if fields is None:
+            def setter(data, value, owned):
+                if id(data) not in owned:
+                    data = deepcopy(data)
+                    owned[id(data)] = data
+                return JSONPathUtils.blank_update(updater, data, value)
+        else:
+            branch_fields, leaf_field = fields[:-1], fields[-1]
+            def setter(data, value, owned):
+                data = own(data, owned)
+                node = data
+                for field in branch_fields:
+                    try:
+                        child = own(node[field], owned)
+                    except (TypeError, KeyError, AttributeError):
+                        child = {}
+                        owned[id(child)] = child
+                    node[field] = child
+                    node = child
+                if leaf_field in node and hasattr(value, '__call__'):
+                    node[leaf_field] = own(node[leaf_field], owned)
+                    value(node[leaf_field], node, leaf_field)
+                else:
+                    node[leaf_field] = value
+                return data
+        cls.path_cow_setter_cache[path] = setter
+        return setter
+
+    @classmethod
+    def get_path_accessors(cls, target, direction='from'):
+        """
+        Return a mapping of handles to a pair of compiled functions
+        `(getter, setter)` which translate the value of that handle between
+        `target` and core in the given direction, or None if `target` has no
+        path translation. Cache for performance.
+        """
+        cache_key = (cls.__name__, target, direction)
+        if cache_key in cls.accessor_cache:
+            return cls.accessor_cache[cache_key]
+        translation = cls.get_target_path_translation(target)
+        accessors = None
+        if translation:
+            accessors = OrderedDict()
+            for handle, target_path in translation.items():
+                if target_path is None:
+                    continue
+                if direction == 'from':
+                    get_path, set_path = target_path, handle
+                else:
+                    get_path, set_path = handle, target_path
+                accessors[handle] = (
+                    cls.compile_path_getter(get_path),
+                    cls.compile_path_cow_setter(set_path)
+                )
+        cls.accessor_cache[cache_key] = accessors
+        return accessors
+
     @classmethod
     def get_from_path(cls, data, path):
         """
@@ -698,13 +1049,7 @@ class ColDataAbstract(ColDataLegacy):
             return
         if data is None:
             return
-        if re.match(cls.re_simple_path, path):
-            return data[path]
-        if ' ' in path:
-            path = '"%s"' % path
-        getter = jsonpath_ng.parse(path)
-        results = getter.find(data)
-        return results[0].value
+        return cls.compile_path_getter(path)(data)
 
     @classmethod
     def update_in_path(cls, data, path, value):
@@ -712,82 +1057,114 @@ class ColDataAbstract(ColDataLegacy):
             return data
         if data is None:
             return data
-        if re.match(cls.re_simple_path, path):
-            data[path] = value
+        return cls.compile_path_setter(path)(data, value)
+
+    @classmethod
+    def copy_update_in_path(cls, data, path, value, owned=None):
+        """
+        Return a copy of `data` with `value` set at `path`, only copying the
+        containers on `path`, so `data` itself is not changed.
+        """
+        if not path:
             return data
-        if ' ' in path or ':' in path:
-            path = '"%s"' % path
-        updater = jsonpath_ng.parse(path)
-        return JSONPathUtils.blank_update(updater, data, value)
+        if data is None:
+            return data
+        if owned is None:
+            owned = {}
+        return cls.compile_path_cow_setter(path)(data, value, owned)
 
     @classmethod
     def morph_data(cls, data, morph_functions, path_translation):
         """
         Translate the data using functions preserving paths.
+
+        Morph functions must not mutate the values they are given. The data is
+        not mutated either: the containers on the paths of morphed values are
+        copied, and everything else is shared with the result.
         """
-        for handle in morph_functions.keys():
-            if handle in path_translation:
-                target_path = path_translation.get(handle)
-                try:
-                    target_value = deepcopy(cls.get_from_path(
-                        data, target_path
-                    ))
-                except (IndexError, KeyError):
-                    continue
-                try:
-                    target_value = morph_functions.get(handle)(target_value)
-                except (TypeError, ):
-                    continue
-                data = cls.update_in_path(
-                    data, target_path, target_value
-                )
+        return cls.apply_morph_steps(
+            data, cls.get_morph_steps(morph_functions, path_translation)
+        )
+
+    @classmethod
+    def get_morph_steps(cls, morph_functions, path_translation):
+        """
+        Return a list of `(getter, setter, morph_function)` for each handle in
+        `morph_functions` which has a path in `path_translation`.
+        """
+        steps = []
+        for handle, morph_function in morph_functions.items():
+            target_path = path_translation.get(handle)
+            if not target_path:
+                continue
+            steps.append((
+                cls.compile_path_getter(target_path),
+                cls.compile_path_cow_setter(target_path),
+                morph_function
+            ))
+        return steps
+
+    @classmethod
+    def apply_morph_steps(cls, data, steps):
+        """
+        Morph the values of data with steps from `get_morph_steps`, copying
+        the containers on their paths like `morph_data`.
+        """
+        if data is None:
+            return data
+        owned = {}
+        for getter, setter, morph_function in steps:
+            try:
+                target_value = getter(data)
+            except (IndexError, KeyError):
+                continue
+            try:
+                target_value = morph_function(target_value)
+            except (TypeError, ):
+                continue
+            data = setter(data, target_value, owned)
         return data
 
+    @classmethod
+    def apply_path_accessors(cls, data, accessors):
+        """
+        Translate the path structure of data with accessors from
+        `get_path_accessors`, or return data as is if there are none.
+        """
+        if accessors is None:
+            return data
+        response = OrderedDict()
+        owned = {id(response): response}
+        for getter, setter in accessors.values():
+            try:
+                response = setter(response, getter(data), owned)
+            except (IndexError, KeyError):
+                pass
+        return response
+
+    @classmethod
+    def translate_paths(cls, data, target, direction='from'):
+        """
+        Translate the path structure of data between `target` and core in the
+        given direction using the compiled path accessors.
+        """
+        return cls.apply_path_accessors(
+            data, cls.get_path_accessors(target, direction)
+        )
+
     @classmethod
     def translate_paths_from(cls, data, target):
         """
         Translate the path structure of data from `target` to core.
         """
-        translation = cls.get_target_path_translation(target)
-        if translation:
-            response = OrderedDict()
-            for handle, target_path in translation.items():
-                if target_path is None:
-                    continue
-                try:
-                    target_value = cls.get_from_path(data, target_path)
-                    response = cls.update_in_path(
-                        response,
-                        handle,
-                        deepcopy(target_value)
-                    )
-                except (IndexError, KeyError):
-                    pass
-            return response
-        return deepcopy(data)
+        return cls.translate_paths(data, target, 'from')
 
     @classmethod
     def translate_paths_to(cls, data, target):
         """
         Translate the path structure of data from core to `target`.
         """
-        translation = cls.get_target_path_translation(target)
-        if translation:
-            response = OrderedDict()
-            for handle, target_path in translation.items():
-                if target_path is None:
-                    continue
-                try:
-                    target_value = cls.get_from_path(data, handle)
-                    response = cls.update_in_path(
-                        response,
-                        target_path,
-                        deepcopy(target_value)
-                    )
-                except (IndexError, KeyError):
-                    pass
-            return response
-        return deepcopy(data)
+        return cls.translate_paths(data, target, 'to')
 
     @classmethod
     def deconstruct_sub_entity(
@@ -820,32 +1197,30 @@ class ColDataAbstract(ColDataLegacy):
         elif target_structure[0] == 'listed-values':
             target_value_handle = target_structure[1]
             target_value_path = path_translation.get(target_value_handle, target_value_handle)
-            objects = [
-                cls.translate_data_from(
+            objects = cls.translate_batch_from(
+                [
                     cls.update_in_path(
                         {},
                         target_value_path,
                         sub_value
-                    ),
-                    target,
-                    excluding_properties=excluding_properties
-                ) for sub_value in sub_data
-            ]
+                    ) for sub_value in sub_data
+                ],
+                target,
+                excluding_properties=excluding_properties
+            )
         elif target_structure[0] == 'listed-objects':
-            objects = [
-                cls.translate_data_from(
-                    sub_object,
-                    target,
-                    excluding_properties=excluding_properties
-                ) for sub_object in sub_data
-            ]
+            objects = cls.translate_batch_from(
+                sub_data,
+                target,
+                excluding_properties=excluding_properties
+            )
         elif target_structure[0] == 'mapping-value':
             target_key_handle = target_structure[1][0]
             target_key_path = path_translation.get(target_key_handle)
             target_value_handle = target_structure[1][1]
             target_value_path = path_translation.get(target_value_handle, target_value_handle)
-            objects = [
-                cls.translate_data_from(
+            objects = cls.translate_batch_from(
+                [
                     cls.update_in_path(
                         cls.update_in_path(
                             {},
@@ -854,25 +1229,25 @@ class ColDataAbstract(ColDataLegacy):
                         ),
                         target_value_path,
                         sub_value
-                    ),
-                    target,
-                    excluding_properties=excluding_properties
-                ) for sub_key, sub_value in sub_data.items()
-            ]
+                    ) for sub_key, sub_value in sub_data.items()
+                ],
+                target,
+                excluding_properties=excluding_properties
+            )
         elif target_structure[0] == 'mapping-object':
             target_key_handle = target_structure[1][0]
             target_key_path = path_translation.get(target_key_handle)
-            objects = [
-                cls.translate_data_from(
-                    cls.update_in_path(
+            objects = cls.translate_batch_from(
+                [
+                    cls.copy_update_in_path(
                         sub_value,
                         target_key_path,
                         sub_key
-                    ),
-                    target,
-                    excluding_properties=excluding_properties
-                ) for sub_key, sub_value in sub_data.items()
-            ]
+                    ) for sub_key, sub_value in sub_data.items()
+                ],
+                target,
+                excluding_properties=excluding_properties
+            )
         if forced_mapping_handle:
             mapping = {}
             for object_ in objects:
@@ -922,7 +1297,7 @@ class ColDataAbstract(ColDataLegacy):
                 )
                 objects = []
                 for mapping_key, object_ in sub_data.items():
-                    object_ = cls.update_in_path(
+                    object_ = cls.copy_update_in_path(
                         object_,
                         forced_mapping_handle,
                         mapping_key
@@ -943,25 +1318,21 @@ class ColDataAbstract(ColDataLegacy):
             #         ) for sub_object in objects
             #     ]
             if target_structure[0] == 'listed-objects':
-                return [
-                    cls.translate_data_to(
-                        sub_object,
-                        target,
-                        excluding_properties=excluding_properties
-                    ) for sub_object in objects
-                ]
+                return cls.translate_batch_to(
+                    objects,
+                    target,
+                    excluding_properties=excluding_properties
+                )
             if target_structure[0] == 'mapping-value':
                 target_key_handle = target_structure[1][0]
                 target_key_path = path_translation.get(target_key_handle)
                 target_value_handle = target_structure[1][1]
                 target_value_path = path_translation.get(target_value_handle, target_value_handle)
-                translated_objects = [
-                    cls.translate_data_to(
-                        sub_object,
-                        target,
-                        excluding_properties=excluding_properties
-                    ) for sub_object in objects
-                ]
+                translated_objects = cls.translate_batch_to(
+                    objects,
+                    target,
+                    excluding_properties=excluding_properties
+                )
                 return OrderedDict([
                     (
                         cls.get_from_path(translated_object, target_key_path),
@@ -1094,6 +1465,22 @@ class ColDataAbstract(ColDataLegacy):
             'currency': SanitationUtils.similar_currency_comparison,
         }.get(type_, SanitationUtils.identity)
 
+    @classmethod
+    def get_type_morph_functions(cls, target, direction='from'):
+        """
+        Return a mapping of handles to the function which translates their type
+        between `target` and core in the given direction.
+        """
+        get_morph_function = {
+            'from': cls.get_normalizer,
+            'to': cls.get_denormalizer,
+        }[direction]
+        return OrderedDict([
+            (handle, get_morph_function(type_)) \
+            for handle, type_ \
+            in cls.get_handles_property('type', target).items()
+        ])
+
     @classmethod
     def translate_types_from(cls, data, target, path_translation=None):
         """
@@ -1102,14 +1489,9 @@ class ColDataAbstract(ColDataLegacy):
         """
         if path_translation is None:
             path_translation = cls.get_core_path_translation(target)
-        morph_functions = OrderedDict([
-            (handle, cls.get_normalizer(type_)) \
-            for handle, type_ \
-            in cls.get_handles_property('type', target).items()
-        ])
         return cls.morph_data(
             data,
-            morph_functions,
+            cls.get_type_morph_functions(target, 'from'),
             path_translation
         )
 
@@ -1119,17 +1501,11 @@ class ColDataAbstract(ColDataLegacy):
         Perform a translation of types between core and `target` in the paths
         provided by path_translation, preserving those paths.
         """
-        data = deepcopy(data)
         if path_translation is None:
             path_translation = cls.get_core_path_translation(target)
-        morph_functions = OrderedDict([
-            (handle, cls.get_denormalizer(type_)) \
-            for handle, type_ \
-            in cls.get_handles_property('type', target).items()
-        ])
         return cls.morph_data(
             data,
-            morph_functions,
+            cls.get_type_morph_functions(target, 'to'),
             path_translation
         )
 
@@ -1139,20 +1515,23 @@ class ColDataAbstract(ColDataLegacy):
     #     return cls.translate_types_to(data, target_to, path_translation)
 
     @classmethod
-    def translate_data_from(cls, data, target, excluding_properties=None):
+    def get_translation_plan(cls, target, direction='from', excluding_properties=None):
         """
-        Perform a full translation of paths and types between target and core
+        Resolve everything needed to fully translate data between `target` and
+        core in the given direction: the path translations, normalizers and
+        structure morph functions. Return a mapping of `stages`, the
+        `(kind, payload)` stages which data is passed through in order, and
+        `allowed_keys`, the keys of the translated data which are kept. Cache
+        for performance.
         """
-        if not data:
-            return data
-        if not target:
-            return data
         if excluding_properties is None:
             excluding_properties = []
         if 'path' not in excluding_properties:
             excluding_properties = ['path'] + excluding_properties
+        cache_key = (cls.__name__, target, direction, tuple(excluding_properties))
+        if cache_key in cls.translation_plan_cache:
+            return cls.translation_plan_cache[cache_key]
 
-        data = deepcopy(data)
         # split target_path_translation on which handles have sub_data
         target_path_translation = cls.get_target_path_translation(
             target, excluding_properties=excluding_properties
@@ -1160,111 +1539,263 @@ class ColDataAbstract(ColDataLegacy):
         core_path_translation = cls.get_core_path_translation(
             target, excluding_properties=excluding_properties
         )
+        # TODO: roll path_translation_(pre|post) into get_path_translation functions
 
         sub_data_handles = cls.get_property_inclusions('sub_data')
-        # target paths which have sub_data
         path_translation_pre = OrderedDict()
-        # core paths which don't have sub_data
         path_translation_post = OrderedDict()
-        for handle in cls.data.keys():
-            if handle in sub_data_handles:
-                if handle in target_path_translation:
-                    path_translation_pre[handle] = target_path_translation[handle]
-            else:
-                if handle in core_path_translation:
-                    path_translation_post[handle] = core_path_translation[handle]
-
-        # translate handles in target format which have sub_data
-        data = cls.translate_types_from(
-            data, target, path_translation_pre
-        )
+        if direction == 'from':
+            # pre: target paths which have sub_data
+            # post: core paths which don't have sub_data
+            for handle in cls.data.keys():
+                if handle in sub_data_handles:
+                    if handle in target_path_translation:
+                        path_translation_pre[handle] = target_path_translation[handle]
+                else:
+                    if handle in core_path_translation:
+                        path_translation_post[handle] = core_path_translation[handle]
+        else:
+            # pre: core paths which do not have sub data
+            # post: target paths which have sub data
+            for handle in cls.data.keys():
+                if handle in sub_data_handles:
+                    if handle in core_path_translation:
+                        path_translation_post[handle] = target_path_translation[handle]
+                else:
+                    if handle in target_path_translation:
+                        path_translation_pre[handle] = core_path_translation[handle]
 
-        # translate structure
-        data = cls.translate_structure_from(
-            data, target, target_path_translation, excluding_properties
+        type_morph_functions = cls.get_type_morph_functions(target, direction)
+        types_pre = (
+            'types',
+            cls.get_morph_steps(type_morph_functions, path_translation_pre)
         )
-        data = cls.translate_paths_from(
-            data, target
+        structure = (
+            'structure',
+            cls.get_morph_steps(
+                cls.get_structure_morph_functions(
+                    target, direction, excluding_properties
+                ),
+                target_path_translation
+            )
         )
-        data = cls.translate_types_from(
-            data, target, path_translation_post
+        paths = ('paths', cls.get_path_accessors(target, direction))
+        types_post = (
+            'types',
+            cls.get_morph_steps(type_morph_functions, path_translation_post)
         )
+        if direction == 'from':
+            # translate handles in target format which have sub_data, then
+            # structure, paths, and the types of the rest in core format
+            stages = [types_pre, structure, paths, types_post]
+            allowed_keys = set(core_path_translation.values())
+        else:
+            # translate types of non-subdata handles in core format, then
+            # paths, structure, and the types of subdata handles in target format
+            stages = [types_pre, paths, structure, types_post]
+            allowed_keys = set([
+                key.split('.')[0] for key in
+                target_path_translation.values()
+            ])
+        plan = {
+            'stages': stages,
+            'allowed_keys': allowed_keys
+        }
+        cls.translation_plan_cache[cache_key] = plan
+        return plan
 
-        data = OrderedDict([
+    @classmethod
+    def get_simple_translation_plan(cls, from_target, to_target):
+        """
+        Resolve the plan of `translate_data_from_to_simple`, which keeps every
+        key. Cache for performance.
+        """
+        cache_key = (cls.__name__, from_target, to_target, 'simple')
+        if cache_key in cls.translation_plan_cache:
+            return cls.translation_plan_cache[cache_key]
+        plan = {
+            'stages': [
+                ('paths', cls.get_path_accessors(from_target, 'from')),
+                ('types', cls.get_morph_steps(
+                    cls.get_type_morph_functions(from_target, 'from'),
+                    cls.get_core_path_translation(from_target)
+                )),
+                ('types', cls.get_morph_steps(
+                    cls.get_type_morph_functions(to_target, 'to'),
+                    cls.get_core_path_translation(to_target)
+                )),
+                ('paths', cls.get_path_accessors(to_target, 'to')),
+            ],
+            'allowed_keys': None
+        }
+        cls.translation_plan_cache[cache_key] = plan
+        return plan
+
+    @classmethod
+    def apply_plan_stage(cls, data, stage):
+        """
+        Pass data through a `(kind, payload)` stage of a translation plan.
+        """
+        kind, payload = stage
+        if kind == 'paths':
+            return cls.apply_path_accessors(data, payload)
+        return cls.apply_morph_steps(data, payload)
+
+    @classmethod
+    def filter_allowed_keys(cls, data, allowed_keys):
+        if allowed_keys is None:
+            return data
+        return OrderedDict([
             (key, value) \
             for key, value in data.items() \
-            if key in core_path_translation.values()
+            if key in allowed_keys
         ])
 
-        return data
+    @classmethod
+    def apply_translation_plan(cls, data, plan):
+        """
+        Translate data with a plan from `get_translation_plan`.
+        """
+        for stage in plan['stages']:
+            data = cls.apply_plan_stage(data, stage)
+        return cls.filter_allowed_keys(data, plan['allowed_keys'])
 
     @classmethod
-    def translate_data_to(cls, data, target, excluding_properties=None):
+    def apply_type_steps_batch(cls, records, steps):
+        """
+        Morph the values of each of `records` with type steps from
+        `get_morph_steps`. Steps whose normalizer has a column function in
+        `VectorUtils` are applied to the whole column at once, and the rest
+        to each record in turn. Equivalent to `apply_morph_steps` on each
+        record.
+        """
+        records = list(records)
+        owned = [{} for _ in records]
+        # group consecutive steps by whether they can be applied column-wise
+        for columnar, run in itertools.groupby(
+            steps,
+            lambda step: VectorUtils.get_column_function(step[2]) is not None
+        ):
+            run = list(run)
+            if not columnar:
+                for index, record in enumerate(records):
+                    if record is None:
+                        continue
+                    for getter, setter, morph_function in run:
+                        try:
+                            value = getter(record)
+                        except (IndexError, KeyError):
+                            continue
+                        try:
+                            value = morph_function(value)
+                        except (TypeError, ):
+                            continue
+                        record = setter(record, value, owned[index])
+                    records[index] = record
+                continue
+            for getter, setter, morph_function in run:
+                indices = []
+                values = []
+                for index, record in enumerate(records):
+                    if record is None:
+                        continue
+                    try:
+                        values.append(getter(record))
+                    except (IndexError, KeyError):
+                        continue
+                    indices.append(index)
+                results = VectorUtils.map_column(morph_function, values)
+                for index, result in zip(indices, results):
+                    if isinstance(result, TypeError):
+                        continue
+                    records[index] = setter(
+                        records[index], result, owned[index]
+                    )
+        return records
+
+    @classmethod
+    def apply_translation_plan_batch(cls, records, plan):
+        """
+        Translate each of `records` with a plan from `get_translation_plan`,
+        one stage at a time. Type stages are applied column-wise with
+        `apply_type_steps_batch` when `columnar_types` is set and there are
+        enough records for it to pay off.
+        """
+        records = list(records)
+        columnar = cls.columnar_types and len(records) >= VectorUtils.min_length
+        for stage in plan['stages']:
+            kind, payload = stage
+            if columnar and kind == 'types':
+                records = cls.apply_type_steps_batch(records, payload)
+            else:
+                records = [cls.apply_plan_stage(record, stage) for record in records]
+        return [
+            cls.filter_allowed_keys(record, plan['allowed_keys'])
+            for record in records
+        ]
+
+    @classmethod
+    def translate_data_from(cls, data, target, excluding_properties=None):
         """
-        Perform a full translation of paths and types between core and target
+        Perform a full translation of paths and types between target and core.
+        `data` is not mutated, and the result shares any values which are not
+        translated with it.
         """
         if not data:
             return data
         if not target:
             return data
-        if excluding_properties is None:
-            excluding_properties = []
-        if 'path' not in excluding_properties:
-            excluding_properties = ['path'] + excluding_properties
-
-        data = deepcopy(data)
-
-        # split target_path_translation on which handles have sub_data
-        target_path_translation = cls.get_target_path_translation(
-            target, excluding_properties=excluding_properties
+        return cls.apply_translation_plan(
+            data, cls.get_translation_plan(target, 'from', excluding_properties)
         )
-        core_path_translation = cls.get_core_path_translation(
-            target, excluding_properties=excluding_properties
-        )
-        # TODO: roll path_translation_(pre|post) into get_path_translation functions
-
-        sub_data_handles = cls.get_property_inclusions('sub_data')
-        # core paths which do not have sub data
-        path_translation_pre = OrderedDict()
-        # target paths which have sub data
-        path_translation_post = OrderedDict()
-        for handle in cls.data.keys():
-            if handle in sub_data_handles:
-                if handle in core_path_translation:
-                    path_translation_post[handle] = target_path_translation[handle]
-            else:
-                if handle in target_path_translation:
-                    path_translation_pre[handle] = core_path_translation[handle]
 
-        # translate types of non-subdata handles in core format
-        data = cls.translate_types_to(
-            data, target, path_translation_pre
-        )
-        # Translate all paths
-        data = cls.translate_paths_to(
-            data, target
-        )
-        # translate subdata structure
-        data = cls.translate_structure_to(
-            data, target, target_path_translation, excluding_properties
-        )
-        # translate types of subdata handles in target format
-        data = cls.translate_types_to(
-            data, target, path_translation_post
+    @classmethod
+    def translate_data_to(cls, data, target, excluding_properties=None):
+        """
+        Perform a full translation of paths and types between core and target.
+        `data` is not mutated, and the result shares any values which are not
+        translated with it.
+        """
+        if not data:
+            return data
+        if not target:
+            return data
+        return cls.apply_translation_plan(
+            data, cls.get_translation_plan(target, 'to', excluding_properties)
         )
 
-        allowed_keys = set([
-            key.split('.')[0] for key in
-            target_path_translation.values()
-        ])
+    @classmethod
+    def translate_batch(cls, records, target, direction='from', excluding_properties=None):
+        """
+        Translate each of `records` like `translate_data_from` or
+        `translate_data_to`, resolving the translation plan once and
+        normalizing types a column at a time.
+        """
+        if not target:
+            return list(records)
+        records = list(records)
+        plan = cls.get_translation_plan(target, direction, excluding_properties)
+        indices = [index for index, record in enumerate(records) if record]
+        translated = cls.apply_translation_plan_batch(
+            [records[index] for index in indices], plan
+        )
+        for index, record in zip(indices, translated):
+            records[index] = record
+        return records
 
-        data = OrderedDict([
-            (key, value) \
-            for key, value in data.items() \
-            if key in allowed_keys
-        ])
+    @classmethod
+    def translate_batch_from(cls, records, target, excluding_properties=None):
+        """
+        Perform a full translation of each of `records` from `target` to core.
+        """
+        return cls.translate_batch(records, target, 'from', excluding_properties)
 
-        return data
+    @classmethod
+    def translate_batch_to(cls, records, target, excluding_properties=None):
+        """
+        Perform a full translation of each of `records` from core to `target`.
+        """
+        return cls.translate_batch(records, target, 'to', excluding_properties)
 
     @classmethod
     def translate_data_from_to(cls, data, from_target, to_target, excluding_properties=None):
@@ -1277,20 +1808,18 @@ class ColDataAbstract(ColDataLegacy):
         Does naiive data translation that doesn't look at sub entities and
         doesn't delete unrecognised keys.
         """
-        data = deepcopy(data)
-        data = cls.translate_paths_from(
-            data, from_target
-        )
-        data = cls.translate_types_from(
-            data, from_target
-        )
-        data = cls.translate_types_to(
-            data, to_target
+        return cls.apply_translation_plan(
+            data, cls.get_simple_translation_plan(from_target, to_target)
         )
-        data = cls.translate_paths_to(
-            data, to_target
-        )
-        return data
+
+    @classmethod
+    def translate_batch_from_to_simple(cls, records, from_target, to_target):
+        """
+        Translate each of `records` like `translate_data_from_to_simple`,
+        resolving the translation plan once.
+        """
+        plan = cls.get_simple_translation_plan(from_target, to_target)
+        return cls.apply_translation_plan_batch(records, plan)
 
     @classmethod
     def get_sync_handles(cls, master_target=None, slave_target=None):
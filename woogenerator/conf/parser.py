@@ -225,6 +225,10 @@ class ArgumentParserCommon(ArgumentParserProto):
         download_group.add_argument(
             '--since-s',
             help='filter out slave records edited before this date')
+        download_group.add_argument(
+            '--slave-concurrency',
+            help='number of pages to download concurrently from the slave api',
+            type=int)
 
     def add_processing_options(self, processing_group):
         """ Add options pertaining to processing data. """
@@ -467,10 +471,16 @@ class ArgumentParserCommon(ArgumentParserProto):
         self.add_argument(
             '--slave-file',
             help='location of local slave data file')
-        self.add_argument('--pickle-file', help='location of saved state file')
+        self.add_argument(
+            '--save-checkpoints',
+            help='save the output of each stage so the run can be resumed',
+            action='store_true')
+        self.add_argument(
+            '--checkpoint-dir',
+            help='location of saved checkpoints to resume from')
         self.add_argument(
             '--override-progress',
-            help='override progress of saved state')
+            help='override progress of saved checkpoints')
 
         self.add_suppressed_argument('--master-dialect-suggestion')
         self.add_suppressed_argument('--web-dir')
@@ -524,12 +534,55 @@ class ArgumentParserProd(ArgumentParserCommon):
         download_group.add_argument(
             '--variant',
             help='what variant of schema to process the files')
+        download_group.add_argument(
+            '--master-concurrency',
+            help=('number of master sources (rules, specials and the master '
+                  'sheet) to download and analyse concurrently'),
+            type=int)
+        group = download_group.add_mutually_exclusive_group()
+        group.add_argument(
+            '--do-incremental-slave',
+            help=('only download slave items modified since the last download '
+                  'and merge them into the cached slave data'),
+            action="store_true")
+        group.add_argument(
+            '--skip-incremental-slave',
+            help='download all of the slave data',
+            action="store_false",
+            dest='do_incremental_slave')
+        download_group.add_argument(
+            '--slave-cache-format',
+            choices=['json', 'jsonl', 'jsonl.gz'],
+            help=('the format to cache slave api data in. JSON Lines caches '
+                  'are streamed and upserted without being rewritten '
+                  '(default: json)'))
 
     def add_processing_options(self, processing_group):
         super(ArgumentParserProd, self).add_processing_options(processing_group)
 
         self.add_suppressed_argument('--item-depth', type=int)
         self.add_suppressed_argument('--taxo-depth', type=int)
+        processing_group.add_argument(
+            '--master-parse-workers',
+            help=('experimental: number of processes to parse the master '
+                  'file with, split on its top level categories. Only faster '
+                  'with many cores and large files, since the parsed objects '
+                  'are pickled between processes (default: parse in one '
+                  'process)'),
+            type=int
+        )
+
+        group = processing_group.add_mutually_exclusive_group()
+        group.add_argument(
+            '--do-master-cache',
+            help=('reuse the analysis of top level categories of the master '
+                  'file which are unchanged since the last run'),
+            action="store_true")
+        group.add_argument(
+            '--skip-master-cache',
+            help='analyse every row of the master file',
+            action="store_false",
+            dest='do_master_cache')
 
         group = processing_group.add_mutually_exclusive_group()
         group.add_argument(
@@ -636,6 +689,24 @@ class ArgumentParserProd(ArgumentParserCommon):
             '--thumbsize-y',
             help='Y value of thumbnail crop size'
         )
+        images_group.add_argument(
+            '--img-workers',
+            help='number of processes to process images with (default: cpu count)',
+            type=int
+        )
+        group = images_group.add_mutually_exclusive_group()
+        group.add_argument(
+            '--do-img-manifest',
+            help='skip images which are unchanged since they were last processed',
+            action="store_true",
+            default=True
+        )
+        group.add_argument(
+            '--skip-img-manifest',
+            help='process all images regardless of the image manifest',
+            action="store_false",
+            dest='do_img_manifest'
+        )
         group = images_group.add_mutually_exclusive_group()
         group.add_argument(
             '--skip-unattached-images',
@@ -701,6 +772,10 @@ class ArgumentParserProd(ArgumentParserCommon):
         update_group.add_argument(
             '--slave-offset',
             help='offset when using the slave api (for debugging)')
+        update_group.add_argument(
+            '--slave-batch-size',
+            help='upload changes to the slave api in batches of this size',
+            type=int)
 
     # def add_report_options(self, report_group):
     #     super(ArgumentParserProd, self).add_report_options(report_group)
@@ -812,6 +887,12 @@ class ArgumentParserUser(ArgumentParserCommon):
             default=False,
             action="store_true"
         )
+        processing_group.add_argument(
+            '--compact-records',
+            help="store parsed contacts compactly to use less memory",
+            default=False,
+            action="store_true"
+        )
 
     def add_update_options(self, update_group):
         super(ArgumentParserUser, self).add_update_options(update_group)
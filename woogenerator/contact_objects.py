@@ -36,6 +36,11 @@ class FieldGroup(Registrar):
     enforce_mandatory_keys = True
     reprocess_kwargs = False
     similar_all_keys = False
+    # these are only set on instances when they change, which keeps the
+    # attributes of the many field groups of a user small
+    valid = True
+    problematic = False
+    reason = ""
 
     def __init__(self, schema=None, source=None, **kwargs):
         super(FieldGroup, self).__init__()
@@ -45,14 +50,22 @@ class FieldGroup(Registrar):
         self.kwargs = kwargs
         if self.debug:
             self.register_message("kwargs: %s" % pformat(self.kwargs))
-        self.valid = True
-        self.problematic = False
-        self.reason = ""
-        self.properties = OrderedDict()
         self.source = source
         if self.perform_post:
             self.process_kwargs()
 
+    @property
+    def properties(self):
+        """
+        The values of the processed fields, created when first used since
+        most field groups are never processed.
+        """
+        try:
+            return self._properties
+        except AttributeError:
+            self._properties = OrderedDict()
+            return self._properties
+
     @property
     def empty(self):
         if self.enforce_mandatory_keys and self.mandatory_keys:
@@ -86,6 +86,7 @@ python -m woogenerator.generator \
 """
 
 import io
+import json
 import os
 import shutil
 import sys
@@ -95,11 +96,13 @@ import webbrowser
 import zipfile
 from bisect import insort
 from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 from pprint import pformat, pprint
 
 from exitstatus import ExitStatus
 from requests.exceptions import ConnectionError, ConnectTimeout, ReadTimeout
 
+from .coldata import ColDataAbstract
 from .images import process_images
 from .matching import (AttacheeSkuMatcher, AttachmentIDMatcher,
                        CategoryMatcher, ImageMatcher, ProductMatcher,
@@ -111,8 +114,8 @@ from .parsing.api import ApiParseWoo
 from .parsing.dyn import CsvParseDyn
 from .parsing.special import CsvParseSpecial
 from .parsing.woo import WooCatList
-from .utils import (ProgressCounter, Registrar, SanitationUtils, SeqUtils,
-                    TimeUtils)
+from .utils import (JsonLinesCache, ProgressCounter, Registrar,
+                    SanitationUtils, SeqUtils, StageTimer, TimeUtils)
 from .utils.reporter import (ReporterNamespace, do_cat_sync_gruop,
                              do_category_matches_group, do_delta_group,
                              do_duplicates_group, do_duplicates_summary_group,
@@ -148,6 +151,7 @@ def check_warnings(settings):
         Registrar.print_message_dict(1)
 
 
+@StageTimer.timed(items=lambda parsers: len(parsers.master.objects))
 def populate_master_parsers(parsers, settings):
     """Create and populates the various parsers."""
     Registrar.register_message('schema: %s, woo_schemas: %s' % (
@@ -162,34 +166,67 @@ def populate_master_parsers(parsers, settings):
             "master_download_client_args: %s" %
             settings.master_download_client_args)
 
-    with settings.master_download_client_class(**settings.master_download_client_args) as client:
+    # the modification time of the master file before it is downloaded again
+    master_mod_dt = None
+    if os.path.exists(settings.master_path):
+        master_mod_ts = max(
+            os.path.getmtime(settings.master_path), os.path.getctime(settings.master_path)
+        )
+        master_mod_dt = TimeUtils.timestamp2datetime(master_mod_ts)
 
-        if settings.schema_is_woo:
-            if settings.do_dyns:
-                Registrar.register_message("analysing dprc rules")
-                client.analyse_remote(
-                    parsers.dyn,
-                    data_path=settings.dprc_path,
-                    gid=settings.dprc_gid
-                )
-                settings.dprc_rules = parsers.dyn.taxos
-
-                Registrar.register_message("analysing dprp rules")
-                parsers.dyn.clear_transients()
-                client.analyse_remote(
-                    parsers.dyn,
-                    data_path=settings.dprp_path,
-                    gid=settings.dprp_gid
-                )
-                settings.dprp_rules = parsers.dyn.taxos
-
-            if settings.do_specials:
-                Registrar.register_message("analysing specials")
-                client.analyse_remote(
-                    parsers.special,
-                    data_path=settings.specials_path,
-                    gid=settings.spec_gid
+    # the rules and specials are independent of each other, and the master
+    # sheet only needs them once it is parsed, so with master_concurrency they
+    # are loaded in a thread pool while the master sheet downloads.
+    concurrency = settings.get('master_concurrency') or 1
+    pool = None
+    if concurrency > 1:
+        pool = ThreadPool(concurrency)
+
+    try:
+        with settings.master_download_client_class(**settings.master_download_client_args) as client:
+            master_content = None
+            if pool is not None and hasattr(client, 'download_remote') \
+            and not getattr(client, 'skip_download', None):
+                Registrar.register_message("downloading master product data")
+                master_content = pool.apply_async(
+                    client.download_remote, (settings.master_path,),
+                    {'gid': settings.gen_gid}
                 )
+
+            sources = []
+            if settings.schema_is_woo:
+                if settings.do_dyns:
+                    sources.append((
+                        "dprc rules", CsvParseDyn(),
+                        {'data_path': settings.dprc_path, 'gid': settings.dprc_gid}
+                    ))
+                    sources.append((
+                        "dprp rules", parsers.dyn,
+                        {'data_path': settings.dprp_path, 'gid': settings.dprp_gid}
+                    ))
+                if settings.do_specials:
+                    sources.append((
+                        "specials", parsers.special,
+                        {'data_path': settings.specials_path, 'gid': settings.spec_gid}
+                    ))
+
+            results = []
+            for name, parser, analysis_kwargs in sources:
+                Registrar.register_message("analysing %s" % name)
+                if pool is None:
+                    client.analyse_remote(parser, **analysis_kwargs)
+                else:
+                    results.append(pool.apply_async(
+                        client.analyse_remote, (parser,), analysis_kwargs
+                    ))
+            for result in results:
+                result.get()
+
+            if settings.schema_is_woo and settings.do_dyns:
+                settings.dprc_rules = sources[0][1].taxos
+                settings.dprp_rules = sources[1][1].taxos
+
+            if settings.schema_is_woo and settings.do_specials:
                 if Registrar.DEBUG_SPECIAL:
                     Registrar.register_message(
                         "all specials: %s" % parsers.special.tabulate()
@@ -206,51 +243,60 @@ def populate_master_parsers(parsers, settings):
                         "current_special_groups: %s" % settings.current_special_groups
                     )
 
-        master_parser_args = settings.master_parser_args
+            master_parser_args = settings.master_parser_args
 
-        if os.path.exists(settings.master_path):
-            master_mod_ts = max(
-                os.path.getmtime(settings.master_path), os.path.getctime(settings.master_path)
-            )
-            master_mod_dt = TimeUtils.timestamp2datetime(master_mod_ts)
-            master_parser_args['defaults'].update({
-                'modified_local': master_mod_dt,
-                'modified_gmt': TimeUtils.datetime_local2gmt(master_mod_dt)
-            })
-
-
-        parsers.master = settings.master_parser_class(
-            **master_parser_args
-        )
-
-        Registrar.register_progress("analysing master product data")
+            if master_mod_dt is not None:
+                master_parser_args['defaults'].update({
+                    'modified_local': master_mod_dt,
+                    'modified_gmt': TimeUtils.datetime_local2gmt(master_mod_dt)
+                })
 
-        analysis_kwargs = {
-            'data_path': settings.master_path,
-            'gid': settings.gen_gid,
-            'limit': settings['master_parse_limit']
-        }
-        if Registrar.DEBUG_PARSER:
-            Registrar.register_message("analysis_kwargs: %s" % analysis_kwargs)
+            parsers.master = settings.master_parser_class(
+                **master_parser_args
+            )
 
-        client.analyse_remote(parsers.master, **analysis_kwargs)
+            Registrar.register_progress("analysing master product data")
+
+            analysis_kwargs = {
+                'data_path': settings.master_path,
+                'gid': settings.gen_gid,
+                'limit': settings['master_parse_limit']
+            }
+            if Registrar.DEBUG_PARSER:
+                Registrar.register_message("analysis_kwargs: %s" % analysis_kwargs)
+            if master_content is not None:
+                analysis_kwargs['content'] = master_content.get()
+
+            client.analyse_remote(parsers.master, **analysis_kwargs)
+
+            if getattr(parsers.master, 'subtree_cache', None):
+                parsers.add_cache_counts(
+                    'subtree cache',
+                    parsers.master.subtree_cache_hits,
+                    parsers.master.subtree_cache_misses
+                )
 
-        if Registrar.DEBUG_PARSER and hasattr(
-                parsers.master, 'categories_name'):
-            for category_name, category_list in getattr(
-                    parsers.master, 'categories_name').items():
-                if len(category_list) < 2:
-                    continue
-                if SeqUtils.check_equal(
-                        [category.namesum for category in category_list]):
-                    continue
-                Registrar.register_warning("bad category: %50s | %d | %s" % (
-                    category_name[:50], len(category_list), str(category_list)
-                ))
+            if Registrar.DEBUG_PARSER and hasattr(
+                    parsers.master, 'categories_name'):
+                for category_name, category_list in getattr(
+                        parsers.master, 'categories_name').items():
+                    if len(category_list) < 2:
+                        continue
+                    if SeqUtils.check_equal(
+                            [category.namesum for category in category_list]):
+                        continue
+                    Registrar.register_warning("bad category: %50s | %d | %s" % (
+                        category_name[:50], len(category_list), str(category_list)
+                    ))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
-        return parsers
+    return parsers
 
 
+@StageTimer.timed(items=lambda parsers: len(parsers.slave.objects))
 def populate_slave_parsers(parsers, settings):
     """Populate the parsers for data from the slave database."""
 
@@ -279,10 +325,13 @@ def populate_slave_parsers(parsers, settings):
 
         Registrar.register_progress("analysing API product data")
 
-        client.analyse_remote(
-            parsers.slave,
-            data_path=settings.slave_path
-        )
+        if settings.slave_incremental:
+            analyse_slave_incremental(parsers, settings, client)
+        else:
+            client.analyse_remote(
+                parsers.slave,
+                data_path=settings.slave_path
+            )
 
     if settings.schema_is_woo and settings.do_images:
         Registrar.register_progress("analysing API image data")
@@ -303,6 +352,77 @@ def populate_slave_parsers(parsers, settings):
 
     return parsers
 
+def get_slave_watermark(settings):
+    """
+    Return the time after which slave items should be downloaded, either from
+    settings or from the last successful download.
+    """
+    if settings.get('since_s'):
+        return settings['since_s']
+    if os.path.exists(settings.slave_watermark_path):
+        with open(settings.slave_watermark_path) as watermark_file:
+            return json.load(watermark_file).get('since')
+
+def save_slave_watermark(settings, watermark):
+    """ Store the time that the slave data was last downloaded. """
+    with open(settings.slave_watermark_path, 'w') as watermark_file:
+        json.dump({'since': watermark}, watermark_file)
+
+def merge_api_items(cached_items, new_items, key='id'):
+    """
+    Return `cached_items` with any items in `new_items` replacing the cached
+    item with the same `key`, and the rest appended.
+    """
+    merged = OrderedDict()
+    for item in cached_items:
+        merged[item.get(key)] = item
+    for item in new_items:
+        merged[item.get(key)] = item
+    return merged.values()
+
+@StageTimer.timed()
+def analyse_slave_incremental(parsers, settings, client):
+    """
+    Download only the slave items modified since the last download, merge them
+    into the cached slave data and analyse the result.
+    """
+    settings.slave_watermark = TimeUtils.star_strf_datetime(
+        TimeUtils.timestamp2datetime(TimeUtils.current_tsecs()),
+        TimeUtils.iso8601_datetime_format
+    )
+    since = get_slave_watermark(settings)
+    if JsonLinesCache.is_jsonl_path(settings.slave_cache_path):
+        cache = JsonLinesCache(settings.slave_cache_path)
+        if since and len(cache):
+            new_count = cache.upsert(client.get_items(since=since))
+        else:
+            since = None
+            new_count = cache.write(client.get_items(since=None))
+        cache.compact()
+        Registrar.register_progress(
+            "downloaded %d %s modified since %s, upserted into %d cached" % (
+                new_count, client.endpoint_plural, since, len(cache)
+            )
+        )
+        parsers.slave.analyse_api_objs(cache)
+        return
+
+    cached_items = []
+    if since and os.path.exists(settings.slave_cache_path):
+        with open(settings.slave_cache_path) as cache_file:
+            cached_items = SanitationUtils.decode_json(cache_file.read()) or []
+    if not cached_items:
+        since = None
+
+    new_items = list(client.get_items(since=since))
+    Registrar.register_progress(
+        "downloaded %d %s modified since %s, merging with %d cached" % (
+            len(new_items), client.endpoint_plural, since, len(cached_items)
+        )
+    )
+    parsers.slave.analyse_api_objs(merge_api_items(cached_items, new_items))
+
+@StageTimer.timed()
 def export_master_parser(settings, parsers):
     """Export key information from master parser to csv."""
     Registrar.register_progress("Exporting Master info to disk")
@@ -421,6 +541,7 @@ def export_master_parser(settings, parsers):
 
     Registrar.register_progress("CSV Files have been created.")
 
+@StageTimer.timed()
 def cache_api_data(settings, parsers):
     """Export key information from slave parser to csv."""
     if not settings.download_slave:
@@ -431,6 +552,12 @@ def cache_api_data(settings, parsers):
     product_list = container(parsers.slave.products.values())
     product_list.export_api_data(settings.slave_path)
 
+    if settings.slave_incremental and settings.get('slave_watermark'):
+        # a JSON Lines cache is upserted as the items are downloaded
+        if not JsonLinesCache.is_jsonl_path(settings.slave_cache_path):
+            shutil.copyfile(settings.slave_path, settings.slave_cache_path)
+        save_slave_watermark(settings, settings.slave_watermark)
+
     if settings.do_categories and parsers.slave.categories:
         category_container = settings.slave_parser_class.category_container.container
         category_list = category_container(parsers.slave.categories.values())
@@ -441,6 +568,7 @@ def cache_api_data(settings, parsers):
         image_list = attachment_container(parsers.slave.attachments.values())
         image_list.export_api_data(settings.slave_img_path)
 
+@StageTimer.timed()
 def do_match_images(parsers, matches, settings):
     if Registrar.DEBUG_IMG:
         Registrar.register_message(
@@ -836,6 +964,7 @@ AssertionError: can't add match m_object 550|VTS-S.png <ImportWooImg> : m_index
 
     return matches
 
+@StageTimer.timed()
 def do_match_categories(parsers, matches, settings):
 
     if Registrar.DEBUG_CATS:
@@ -911,6 +1040,7 @@ def do_match_attributes(parsers, matches, settings):
     if settings.do_attributes:
         raise NotImplementedError("Do Match Attributes not implemented")
 
+@StageTimer.timed()
 def do_match_prod(parsers, matches, settings):
     """For every item in slave, find its counterpart in master."""
 
@@ -982,6 +1112,7 @@ def do_match_var(parsers, matches, settings):
         matches.variation.duplicate['index'] = variation_matcher.duplicate_matches
 
 
+@StageTimer.timed()
 def do_merge_images(matches, parsers, updates, settings):
     updates.image = UpdateNamespace()
 
@@ -1028,6 +1159,7 @@ def do_merge_images(matches, parsers, updates, settings):
 
     return updates
 
+@StageTimer.timed()
 def do_merge_categories(matches, parsers, updates, settings):
     updates.category = UpdateNamespace()
 
@@ -1077,6 +1209,7 @@ def do_merge_attributes(matches, parsers, updates, settings):
     if settings.do_attributes:
         raise NotImplementedError("Do Merge Attributes not implemented")
 
+@StageTimer.timed()
 def do_merge_prod(matches, parsers, updates, settings):
     """For a given list of matches, return a description of updates required to merge them."""
 
@@ -1151,6 +1284,7 @@ def do_merge_prod(matches, parsers, updates, settings):
                 sync_update
             )
 
+@StageTimer.timed()
 def do_merge_var(matches, parsers, updates, settings):
     if not settings['do_variations']:
         return
@@ -1227,6 +1361,7 @@ def do_merge_var(matches, parsers, updates, settings):
         # TODO: auto create new variations
         raise NotImplementedError()
 
+@StageTimer.timed()
 def do_report_images(reporters, matches, updates, parsers, settings):
     if not settings.get('do_report'):
         return reporters
@@ -1243,6 +1378,7 @@ def do_report_images(reporters, matches, updates, parsers, settings):
 
     return reporters
 
+@StageTimer.timed()
 def do_report_categories(reporters, matches, updates, parsers, settings):
     if not settings.get('do_report'):
         return reporters
@@ -1262,6 +1398,7 @@ def do_report_attributes(reporters, matches, updates, parsers, settings):
     if settings.do_attributes:
         raise NotImplementedError("Do Report Attributes not implemented")
 
+@StageTimer.timed()
 def do_report(reporters, matches, updates, parsers, settings):
     """ Write report of changes to be made. """
 
@@ -1310,6 +1447,7 @@ def do_report(reporters, matches, updates, parsers, settings):
 
     return reporters
 
+@StageTimer.timed()
 def do_report_post(reporters, results, settings):
     """ Reports results from performing updates."""
     # raise NotImplementedError()
@@ -1470,6 +1608,7 @@ def upload_image_changes_slave(parsers, results, settings, client, change_update
 
         results.successes.append(sync_update)
 
+@StageTimer.timed()
 def do_updates_images_master(updates, parsers, results, settings):
 
     for update in updates.image.master:
@@ -1489,6 +1628,7 @@ def do_updates_images_master(updates, parsers, results, settings):
             update.get_master_updates_native()
         )
 
+@StageTimer.timed()
 def do_updates_images_slave(updates, parsers, results, settings):
     """Perform a list of updates on attachments."""
 
@@ -1633,6 +1773,8 @@ def upload_category_changes_slave(parsers, results, settings, client, change_upd
     if not settings['update_slave']:
         return
 
+    batch_updates = []
+
     for count, sync_update in enumerate(change_updates):
         if Registrar.DEBUG_PROGRESS:
             update_progress_counter.maybe_print_update(count)
@@ -1648,6 +1790,9 @@ def upload_category_changes_slave(parsers, results, settings, client, change_upd
             #     # quick hack to stop syncing bad images
             #     if 'src' in changes['image']:
             #         del changes['image']
+            if getattr(client, 'batch_mode', None):
+                batch_updates.append((sync_update, pkey, changes))
+                continue
             response_raw = client.upload_changes(pkey, changes)
             response_api_data = response_raw.json()
         except Exception as exc:
@@ -1656,27 +1801,102 @@ def upload_category_changes_slave(parsers, results, settings, client, change_upd
             )
             continue
 
-        response_core_data = settings.coldata_class_cat.translate_data_from(
-            response_api_data, settings.coldata_cat_target
+        process_slave_change_response(
+            results, settings, client, sync_update, response_api_data,
+            settings.coldata_class_cat
         )
-        response_gen_data = settings.coldata_class_cat.translate_data_to(
-            response_core_data, settings.coldata_gen_target_write
+
+    process_slave_change_batch(
+        results, settings, client,
+        upload_changes_batch(client, batch_updates),
+        settings.coldata_class_cat
+    )
+
+def upload_changes_batch(client, batch_updates):
+    """
+    Upload a list of (sync_update, pkey, changes) in batches.
+
+    Return a list of each sync_update with the api data of its response, or
+    the exception raised if the change could not be uploaded.
+    """
+    if not batch_updates:
+        return []
+    batch_results = client.upload_changes_batch(update=[
+        (pkey, changes) for _, pkey, changes in batch_updates
+    ])
+    return zip(
+        [sync_update for sync_update, _, _ in batch_updates],
+        batch_results['update']
+    )
+
+def translate_slave_change_responses(settings, coldata_class, responses_api_data):
+    """
+    Translate the api data of the responses to slave changes to gen data in
+    one batch.
+    """
+    responses_core_data = coldata_class.translate_batch_from(
+        responses_api_data, settings.coldata_cat_target
+    )
+    return coldata_class.translate_batch_to(
+        responses_core_data, settings.coldata_gen_target_write
+    )
+
+def process_slave_change_batch(
+    results, settings, client, batch_responses, coldata_class
+):
+    """
+    Process each sync_update with the api data of its response from
+    `upload_changes_batch`, translating the responses in one batch.
+    """
+    successes = []
+    for sync_update, response_api_data in batch_responses:
+        if isinstance(response_api_data, Exception):
+            handle_failed_update(
+                sync_update, results, response_api_data, settings,
+                settings.slave_name
+            )
+            continue
+        successes.append((sync_update, response_api_data))
+
+    responses_gen_data = translate_slave_change_responses(
+        settings, coldata_class,
+        [response_api_data for _, response_api_data in successes]
+    )
+    for (sync_update, response_api_data), response_gen_data in zip(
+        successes, responses_gen_data
+    ):
+        process_slave_change_response(
+            results, settings, client, sync_update, response_api_data,
+            coldata_class, response_gen_data=response_gen_data
         )
 
-        if Registrar.DEBUG_API:
-            Registrar.register_message(
-                "%s being updated with parser data: %s" % (
-                    client.endpoint_singular,
-                    pformat(response_gen_data)
-                )
+def process_slave_change_response(
+    results, settings, client, sync_update, response_api_data, coldata_class,
+    response_gen_data=None
+):
+    """
+    Update sync_update with the api data of the response to its slave change.
+    """
+    if response_gen_data is None:
+        response_gen_data = translate_slave_change_responses(
+            settings, coldata_class, [response_api_data]
+        )[0]
+
+    if Registrar.DEBUG_API:
+        Registrar.register_message(
+            "%s being updated with parser data: %s" % (
+                client.endpoint_singular,
+                pformat(response_gen_data)
             )
+        )
 
-        sync_update.old_s_object_gen.update(response_gen_data)
-        sync_update.set_new_s_object_gen(sync_update.old_s_object_gen)
-        sync_update.old_m_object_gen.update(response_gen_data)
+    sync_update.old_s_object_gen.update(response_gen_data)
+    sync_update.set_new_s_object_gen(sync_update.old_s_object_gen)
+    sync_update.old_m_object_gen.update(response_gen_data)
 
-        results.successes.append(sync_update)
+    results.successes.append(sync_update)
 
+@StageTimer.timed()
 def do_updates_categories_master(updates, parsers, results, settings):
     for update in updates.category.master:
         if Registrar.DEBUG_UPDATE:
@@ -1696,6 +1916,7 @@ def do_updates_categories_master(updates, parsers, results, settings):
             update.get_master_updates_native()
         )
 
+@StageTimer.timed()
 def do_updates_categories_slave(updates, parsers, results, settings):
     """Perform a list of updates on categories."""
     if not hasattr(updates, 'category'):
@@ -1844,6 +2065,8 @@ def upload_product_changes(parsers, results, settings, client, change_updates):
     if not settings['update_slave']:
         return
 
+    batch_updates = []
+
     for count, sync_update in enumerate(change_updates):
         if Registrar.DEBUG_PROGRESS:
             update_progress_counter.maybe_print_update(count)
@@ -1854,6 +2077,9 @@ def upload_product_changes(parsers, results, settings, client, change_updates):
         try:
             pkey = sync_update.slave_id
             changes = sync_update.get_slave_updates_native()
+            if getattr(client, 'batch_mode', None):
+                batch_updates.append((sync_update, pkey, changes))
+                continue
             response_raw = client.upload_changes(pkey, changes)
             response_api_data = response_raw.json()
         except Exception as exc:
@@ -1862,27 +2088,18 @@ def upload_product_changes(parsers, results, settings, client, change_updates):
             )
             continue
 
-        response_core_data = settings.coldata_class.translate_data_from(
-            response_api_data, settings.coldata_cat_target
-        )
-        response_gen_data = settings.coldata_class.translate_data_to(
-            response_core_data, settings.coldata_gen_target_write
+        process_slave_change_response(
+            results, settings, client, sync_update, response_api_data,
+            settings.coldata_class
         )
 
-        if Registrar.DEBUG_API:
-            Registrar.register_message(
-                "%s being updated with parser data: %s" % (
-                    client.endpoint_singular,
-                    pformat(response_gen_data)
-                )
-            )
-
-        sync_update.old_s_object_gen.update(response_gen_data)
-        sync_update.set_new_s_object_gen(sync_update.old_s_object_gen)
-        sync_update.old_m_object_gen.update(response_gen_data)
-
-        results.successes.append(sync_update)
+    process_slave_change_batch(
+        results, settings, client,
+        upload_changes_batch(client, batch_updates),
+        settings.coldata_class
+    )
 
+@StageTimer.timed()
 def do_updates_prod(updates, parsers, settings, results):
     """
     Update products in slave.
@@ -1940,14 +2157,18 @@ def do_updates_var(updates, parsers, settings, results):
         return
 
 
+@StageTimer.timed()
 def main(override_args=None, settings=None):
     """Main function for generator."""
     if not settings:
         settings = SettingsNamespaceProd()
     settings.init_settings(override_args)
+    StageTimer.reset()
 
     settings.init_dirs()
 
+    ColDataAbstract.init_property_tables(settings.coldata_cache_path)
+
     ########################################
     # Create Product Parser object
     ########################################
@@ -2047,6 +2268,11 @@ def main(override_args=None, settings=None):
 
     check_warnings(settings)
 
+    if parsers.cache_counts:
+        Registrar.register_progress(
+            "cache summary: \n%s" % parsers.get_cache_summary_text()
+        )
+
     Registrar.register_message(
         "pre-sync summary: \n%s" % reporters.main.get_summary_text()
     )
@@ -2128,6 +2354,18 @@ def catch_main(override_args=None):
             Registrar.register_error(traceback.format_exc())
             Registrar.raise_exception(exc)
 
+    Registrar.register_message(
+        "stage summary: \n%s" % StageTimer.get_summary_text()
+    )
+    try:
+        StageTimer.write_json(settings.rep_stages_path)
+    except Exception as exc:
+        Registrar.register_warning(
+            "could not write stages to %s: %s" % (
+                settings.rep_stages_path, exc
+            )
+        )
+
     with io.open(settings.log_path, 'w+', encoding='utf8') as log_file:
         for source, messages in Registrar.get_message_items(1).items():
             print source
@@ -2143,7 +2381,8 @@ def catch_main(override_args=None):
     #########################################
 
     files_to_zip = [
-        settings.rep_fail_master_csv_path, settings.rep_fail_slave_csv_path, settings.rep_main_path
+        settings.rep_fail_master_csv_path, settings.rep_fail_slave_csv_path, settings.rep_main_path,
+        settings.rep_stages_path
     ]
 
     with zipfile.ZipFile(settings.zip_path, 'w') as zip_file:
@@ -4,6 +4,8 @@ Utilities for processing images and image metadata.
 
 from __future__ import absolute_import
 
+import json
+import multiprocessing
 import os
 import shutil
 import time
@@ -13,7 +15,8 @@ from datetime import datetime
 import piexif
 from PIL import Image, ImageFile, PngImagePlugin
 
-from .utils import MimeUtils, Registrar, SanitationUtils, TimeUtils
+from .utils import (FileUtils, MimeUtils, Registrar, SanitationUtils,
+                    StageTimer, TimeUtils)
 
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 
@@ -40,14 +43,18 @@ class MetaGator(Registrar):
     def is_png(self):
         return MimeUtils.get_ext_mime_type(self.ext) in ['image/png']
 
-    def write_meta(self, title, description):
+    def write_meta(self, title, description, image=None):
+        """
+        Write title and description to the image file, using `image` if it has
+        already been opened.
+        """
         title, description = map(
             SanitationUtils.coerce_ascii, (title, description))
         # print "title, description: ", title, ', ', description
         if self.is_png:
             # print "image is PNG"
             try:
-                new = Image.open(os.path.join(self.dir, self.fname))
+                new = image or Image.open(os.path.join(self.dir, self.fname))
             except Exception as exc:
                 raise Exception('unable to open image: ' + str(exc))
             meta = PngImagePlugin.PngInfo()
@@ -62,7 +69,7 @@ class MetaGator(Registrar):
             # print "image is JPG"
             fullname = os.path.join(self.dir, self.fname)
             try:
-                img = Image.open(fullname)
+                img = image or Image.open(fullname)
             except IOError:
                 raise Exception("file not found: " + fullname)
 
@@ -98,17 +105,21 @@ class MetaGator(Registrar):
         else:
             raise Exception("not an image file: ", self.ext)
 
-    def read_meta(self):
+    def read_meta(self, image=None):
+        """
+        Read title and description from the image file, using `image` if it has
+        already been opened.
+        """
         title, description = u'', u''
 
         if self.is_png:
-            oldimg = Image.open(os.path.join(self.dir, self.fname))
+            oldimg = image or Image.open(os.path.join(self.dir, self.fname))
             title = oldimg.info.get('title', '')
             description = oldimg.info.get('description', '')
         elif self.is_jpg:
             fullname = os.path.join(self.dir, self.fname)
             try:
-                img = Image.open(fullname)
+                img = image or Image.open(fullname)
                 # imgmeta = ImageMetadata(os.path.join(self.dir, self.fname))
                 # imgmeta.read()
             except IOError:
@@ -128,8 +139,8 @@ class MetaGator(Registrar):
             map(SanitationUtils.ascii_to_unicode, [title, description]))
         return {'title': title, 'description': description}
 
-    def update_meta(self, newmeta):
-        oldmeta = self.read_meta()
+    def update_meta(self, newmeta, image=None):
+        oldmeta = self.read_meta(image)
         newmeta = dict([(key, SanitationUtils.coerce_ascii(value))
                         for key, value in newmeta.items()])
         changed = []
@@ -148,7 +159,8 @@ class MetaGator(Registrar):
                 newmeta['title'] = oldmeta['title']
             if 'description' not in changed:
                 newmeta['description'] = oldmeta['description']
-            self.write_meta(newmeta['title'], newmeta['description'])
+            self.write_meta(newmeta['title'], newmeta['description'], image)
+        return changed
 
 
 
@@ -179,128 +191,253 @@ def get_raw_image(settings, img_name):
             return os.path.join(path, img_name)
     raise IOError("no image named %s found" % str(img_name))
 
-def process_image_meta(settings, parsers, img_data):
-    if Registrar.DEBUG_IMG:
-        Registrar.register_message("img_data_id: %s" % id(img_data))
+class ImageManifest(object):
+    """
+    Persistent record of processed images, keyed by file name.
 
-    try:
-        metagator = MetaGator(get_raw_image(settings, img_data.file_name))
-        current_meta = metagator.read_meta()
-        img_data.update({
-            img_data.title_key: current_meta.get('title'),
-            'alt_text': current_meta.get('title'),
-            'caption': current_meta.get('description'),
-            img_data.description_key: current_meta.get('description'),
-            img_data.descsum_key: current_meta.get('description'),
-        })
+    Each entry stores the signature an image was processed with (the content
+    hash of the raw image, thumbsize and requested meta) and the result of
+    processing it, so that images whose signature has not changed can skip
+    processing even when their modified times have been reset.
+    """
+    result_keys = ['meta', 'width', 'height', 'modified_time']
 
-    except Exception as exc:
-        invalid_image(
-            parsers,
-            settings,
-            img_data,
-            "error reading meta: " + str(exc)
-        )
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.isfile(path):
+            with open(path) as manifest_file:
+                self.entries = json.load(manifest_file)
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def update(self, key, result):
+        """ Record the result of `process_image_file` for `key`. """
+        if result.get('manifest_hit'):
+            self.hits += 1
+            return
+        self.misses += 1
+        if not result.get('signature') or any([
+            error in result for error in [
+                'meta_error', 'size_error', 'resize_error'
+            ]
+        ]):
+            self.entries.pop(key, None)
+            return
+        self.entries[key] = {
+            'signature': result['signature'],
+            'result': dict([
+                (result_key, result[result_key])
+                for result_key in self.result_keys
+            ])
+        }
+
+    def save(self):
+        if not self.path:
+            return
+        with open(self.path, 'w') as manifest_file:
+            json.dump(self.entries, manifest_file, indent=2, sort_keys=True)
+
+def get_image_signature(job, content_hash):
+    """ The inputs which determine the result of `process_image_file`. """
+    thumbsize = job['thumbsize']
+    if thumbsize:
+        thumbsize = list(thumbsize)
+    return {
+        'hash': content_hash,
+        'thumbsize': thumbsize,
+        'title': job['title'],
+        'description': job['description'],
+        'do_remeta_images': job['do_remeta_images'],
+        'do_resize_images': job['do_resize_images'],
+    }
+
+def get_manifest_result(job, manifest_entry):
+    """
+    Get the result of `job` from its manifest entry if the signature of the
+    raw image still matches, otherwise None.
+    """
+    if not os.path.isfile(job['raw_path']):
+        return
+    if job['do_resize_images'] and not os.path.isfile(job['dst_path']):
         return
+    content_hash = FileUtils.get_file_hash(job['raw_path'])
+    if manifest_entry['signature'] != get_image_signature(job, content_hash):
+        return content_hash
+    result = dict(manifest_entry['result'])
+    result['file_path'] = job['raw_path']
+    if job['do_resize_images']:
+        result['file_path'] = job['dst_path']
+    result['manifest_hit'] = True
+    return result
+
+def process_image_file(job):
+    """
+    Read and update the meta of a raw image then copy and resize it, decoding
+    the image only once.
 
-    try:
-        title, description = img_data.attaches.title, img_data.attaches.description
-        if settings.do_remeta_images:
-            metagator.update_meta({
-                'title': title,
-                'description': description
-            })
-        img_data.update({
-            img_data.title_key: title,
-            'alt_text': title,
-            'caption': description,
-            img_data.description_key: description,
-            img_data.descsum_key: description,
-        })
+    Runs in a worker process, so `job` and the result are plain dicts.
 
-    except Exception as exc:
-        invalid_image(
-            parsers, settings, img_data, "error updating meta: " + str(exc)
-        )
-        Registrar.register_error(traceback.format_exc())
-        return
-    return img_data
+    Args:
+        job (dict): raw_path, dst_path, title, description, do_remeta_images,
+            do_resize_images and thumbsize of the image, and optionally
+            use_manifest and the manifest_entry of the image.
 
-def process_image_size(settings, parsers, img_data):
-    if Registrar.DEBUG_IMG:
-        Registrar.register_message("img_data_id: %s" % id(img_data))
+    Returns:
+        dict: the current meta, file_path, width, height and modified_time of
+        the image, and the error of whichever stage failed. When using the
+        manifest, also the signature of the image or manifest_hit.
+    """
+    raw_path = job['raw_path']
+    dst_path = job['dst_path']
+    result = {}
 
-    # import pudb; pudb.set_trace()
+    content_hash = None
+    if job.get('manifest_entry'):
+        manifest_result = get_manifest_result(job, job['manifest_entry'])
+        if isinstance(manifest_result, dict):
+            return manifest_result
+        content_hash = manifest_result
 
+    # ------
+    # REMETA
+    # ------
 
-    img_raw_path = get_raw_image(settings, img_data.file_name)
-    if not os.path.isfile(img_raw_path):
-        invalid_image(
-            parsers,
-            settings,
-            img_data, "SOURCE FILE NOT FOUND: %s" % img_raw_path
-        )
-        return
+    try:
+        metagator = MetaGator(raw_path)
+        image = Image.open(raw_path)
+        result['meta'] = metagator.read_meta(image)
+    except Exception as exc:
+        result['meta_error'] = "error reading meta: " + str(exc)
+        return result
 
-    img_src_mod = max(
-        os.path.getmtime(img_raw_path), os.path.getctime(img_raw_path)
-    )
-    winning_time = img_src_mod
+    try:
+        if job['do_remeta_images']:
+            if metagator.update_meta({
+                    'title': job['title'],
+                    'description': job['description']
+            }, image):
+                content_hash = None
+    except Exception as exc:
+        result['meta_error'] = "error updating meta: " + str(exc)
+        result['traceback'] = traceback.format_exc()
+        return result
 
-    img_dst_path = os.path.join(settings.img_dst, img_data.file_name)
+    # ------
+    # RESIZE
+    # ------
 
-    if os.path.isfile(img_dst_path):
+    if not os.path.isfile(raw_path):
+        result['size_error'] = "SOURCE FILE NOT FOUND: %s" % raw_path
+        return result
+
+    img_src_mod = max(os.path.getmtime(raw_path), os.path.getctime(raw_path))
+    winning_time = img_src_mod
+    copied = False
+
+    if os.path.isfile(dst_path):
         img_dst_mod = max(
-            os.path.getmtime(img_dst_path), os.path.getctime(img_dst_path)
+            os.path.getmtime(dst_path), os.path.getctime(dst_path)
         )
-        # print "image mod (src, dst): ", img_src_mod, imgdstmod
         if img_dst_mod > img_src_mod:
             winning_time = img_dst_mod
-        elif settings.do_resize_images:
-            shutil.copy(img_raw_path, img_dst_path)
-    elif settings.do_resize_images:
-        shutil.copy(img_raw_path, img_dst_path)
-        # with open(img_dst_path):
-        #     os.utime(img_dst_path, None)
-        # with open(img_raw_path):
-        #     os.utime(img_dst_path, None)
-
+        elif job['do_resize_images']:
+            shutil.copy(raw_path, dst_path)
+            copied = True
+    elif job['do_resize_images']:
+        shutil.copy(raw_path, dst_path)
+        copied = True
 
-    if settings.do_resize_images:
-        img_data[img_data.file_path_key] = img_dst_path
-
-    if Registrar.DEBUG_IMG:
-        Registrar.register_message("resizing: %s" % img_data.file_name)
-
-        # process_image_meta(settings, parser, img_data)
+    result['file_path'] = raw_path
+    if job['do_resize_images']:
+        result['file_path'] = dst_path
 
     try:
-        image = Image.open(img_data[img_data.file_path_key])
-        if settings.do_resize_images:
-            if image.size[0] > settings.thumbsize[0] \
-            or image.size[1] > settings.thumbsize[1]:
-                image.thumbnail(settings.thumbsize)
-                image.save(img_dst_path)
+        if result['file_path'] != raw_path and not copied:
+            # the compressed image is newer than the raw image
+            image = Image.open(result['file_path'])
+        if job['do_resize_images']:
+            thumbsize = job['thumbsize']
+            if image.size[0] > thumbsize[0] or image.size[1] > thumbsize[1]:
+                image.thumbnail(thumbsize)
+                image.save(dst_path)
 
             img_dst_mod = max(
-                os.path.getmtime(img_dst_path), os.path.getctime(img_dst_path)
+                os.path.getmtime(dst_path), os.path.getctime(dst_path)
             )
             if img_dst_mod > img_src_mod:
                 winning_time = img_dst_mod
 
-        img_data['width'] = image.size[0]
-        img_data['height'] = image.size[1]
-
+        result['width'], result['height'] = image.size
     except IOError as exc:
-        invalid_image(
-            parsers, settings, img_data, "could not resize: " + str(exc)
-        )
+        result['resize_error'] = "could not resize: " + str(exc)
+
+    result['modified_time'] = winning_time
+
+    if job.get('use_manifest'):
+        if content_hash is None:
+            content_hash = FileUtils.get_file_hash(raw_path)
+        result['signature'] = get_image_signature(job, content_hash)
+
+    return result
+
+def process_image_result(settings, parsers, img_data, result):
+    """
+    Update img_data with the result of `process_image_file`, invalidating the
+    image if any stage failed.
+    """
+    if 'meta' not in result:
+        invalid_image(parsers, settings, img_data, result['meta_error'])
+        return
+
+    current_meta = result['meta']
+    img_data.update({
+        img_data.title_key: current_meta.get('title'),
+        'alt_text': current_meta.get('title'),
+        'caption': current_meta.get('description'),
+        img_data.description_key: current_meta.get('description'),
+        img_data.descsum_key: current_meta.get('description'),
+    })
+
+    if 'meta_error' in result:
+        invalid_image(parsers, settings, img_data, result['meta_error'])
+        Registrar.register_error(result['traceback'])
+        return
+
+    title, description = img_data.attaches.title, img_data.attaches.description
+    img_data.update({
+        img_data.title_key: title,
+        'alt_text': title,
+        'caption': description,
+        img_data.description_key: description,
+        img_data.descsum_key: description,
+    })
+
+    if 'size_error' in result:
+        invalid_image(parsers, settings, img_data, result['size_error'])
+        return
 
-    img_data['modified_local'] = TimeUtils.timestamp2datetime(winning_time)
-    img_data['modified_gmt'] = TimeUtils.datetime_local2gmt(img_data['modified_local'])
+    img_data[img_data.file_path_key] = result['file_path']
+
+    if 'resize_error' in result:
+        invalid_image(parsers, settings, img_data, result['resize_error'])
+    else:
+        img_data['width'] = result['width']
+        img_data['height'] = result['height']
+
+    img_data['modified_local'] = TimeUtils.timestamp2datetime(
+        result['modified_time']
+    )
+    img_data['modified_gmt'] = TimeUtils.datetime_local2gmt(
+        img_data['modified_local']
+    )
 
     return img_data
 
+@StageTimer.timed()
 def process_images(settings, parsers):
     """Process the attaches information in from the parsers."""
     Registrar.register_progress("processing attaches")
@@ -379,6 +516,11 @@ def process_images(settings, parsers):
             if settings.do_delete_images:
                 os.remove(os.path.join(settings.img_dst, fname))
 
+    jobs = []
+    manifest = ImageManifest()
+    if settings.get('do_img_manifest'):
+        manifest = ImageManifest(settings.img_manifest_path)
+
     # for img_filename, obj_list in parsers.master.attachments.items():
     for img_data in parsers.master.attachments.values():
         img_filename = os.path.basename(img_data.file_name)
@@ -455,18 +597,49 @@ def process_images(settings, parsers):
             Registrar.register_message("title: %s | description: %s" %
                                        (title, description), img_filename)
 
-        # ------
-        # REMETA
-        # ------
-
-        if not process_image_meta(settings, parsers, img_data):
-            continue
-
-        # ------
-        # RESIZE
-        # ------
-
-        if not process_image_size(settings, parsers, img_data):
-            continue
+        jobs.append((img_data, {
+            'raw_path': img_raw_path,
+            'dst_path': os.path.join(settings.img_dst, img_data.file_name),
+            'title': title,
+            'description': description,
+            'do_remeta_images': settings.do_remeta_images,
+            'do_resize_images': settings.do_resize_images,
+            'thumbsize': settings.thumbsize,
+            'use_manifest': bool(manifest.path),
+            'manifest_entry': manifest.get(img_data.file_name),
+        }))
+
+    StageTimer.add_items(len(jobs))
+
+    # Each image is decoded once by a worker which does remeta and resize,
+    # the results are applied to img_data here in the parent.
+    workers = settings.get('img_workers') or multiprocessing.cpu_count()
+    workers = min(workers, len(jobs))
+    if workers > 1:
+        pool = multiprocessing.Pool(workers)
+        try:
+            results = pool.imap(
+                process_image_file, [job for _, job in jobs], chunksize=4
+            )
+            for (img_data, _), result in zip(jobs, results):
+                manifest.update(img_data.file_name, result)
+                process_image_result(settings, parsers, img_data, result)
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        for img_data, job in jobs:
+            result = process_image_file(job)
+            manifest.update(img_data.file_name, result)
+            process_image_result(settings, parsers, img_data, result)
+
+    if manifest.path:
+        manifest.save()
+        parsers.add_cache_counts('image manifest', manifest.hits, manifest.misses)
+        Registrar.register_progress(
+            "image manifest: %d unchanged (hits), %d processed (misses)" % (
+                manifest.hits, manifest.misses
+            )
+        )
 
     return parsers
@@ -156,7 +156,7 @@ class Match(object):
         k_matches = {}
         for s_object in self.s_objects:
             value = key_fn(s_object)
-            if not value in k_matches.keys():
+            if not value in k_matches:
                 k_matches[value] = Match()
             k_matches[value].add_s_object(s_object)
             # for m_object in self.m_objects:
@@ -164,7 +164,7 @@ class Match(object):
             #         kMatches[value].add_m_object(m_object)
         for m_object in self.m_objects:
             value = key_fn(m_object)
-            if not value in k_matches.keys():
+            if not value in k_matches:
                 k_matches[value] = Match()
             k_matches[value].add_m_object(m_object)
         return k_matches
@@ -277,6 +277,79 @@ def find_p_code_matches(match):
         lambda obj: obj.get('Postcode') or obj.get('Home Postcode') or '')
 
 
+class IndexList(list):
+    """
+    A list of indices which also keeps a hash index of its members so that
+    membership tests are O(1) instead of scanning the whole list.
+    """
+
+    def __init__(self, indices=None):
+        super(IndexList, self).__init__()
+        self._members = {}
+        if indices:
+            self.extend(indices)
+
+    def _add_member(self, index):
+        self._members[index] = self._members.get(index, 0) + 1
+
+    def _remove_member(self, index):
+        self._members[index] -= 1
+        if not self._members[index]:
+            del self._members[index]
+
+    def _rebuild_members(self):
+        self._members = {}
+        for index in self:
+            self._add_member(index)
+
+    def __contains__(self, index):
+        return index in self._members
+
+    def append(self, index):
+        self._add_member(index)
+        return super(IndexList, self).append(index)
+
+    def extend(self, indices):
+        for index in indices:
+            self.append(index)
+
+    def insert(self, position, index):
+        self._add_member(index)
+        return super(IndexList, self).insert(position, index)
+
+    def remove(self, index):
+        super(IndexList, self).remove(index)
+        self._remove_member(index)
+
+    def pop(self, *args):
+        index = super(IndexList, self).pop(*args)
+        self._remove_member(index)
+        return index
+
+    def __setitem__(self, key, value):
+        super(IndexList, self).__setitem__(key, value)
+        self._rebuild_members()
+
+    def __delitem__(self, key):
+        super(IndexList, self).__delitem__(key)
+        self._rebuild_members()
+
+    def __setslice__(self, i, j, sequence):
+        super(IndexList, self).__setslice__(i, j, sequence)
+        self._rebuild_members()
+
+    def __delslice__(self, i, j):
+        super(IndexList, self).__delslice__(i, j)
+        self._rebuild_members()
+
+    def __iadd__(self, indices):
+        self.extend(indices)
+        return self
+
+    def __reduce__(self):
+        return (self.__class__, (list(self), ))
+
+
 class MatchList(list):
     """ A sequence of Match objects indexed by an index_fn"""
 
@@ -288,8 +361,8 @@ class MatchList(list):
             self._index_fn = index_fn
         else:
             self._index_fn = (lambda import_object: import_object.index)
-        self._s_indices = []
-        self._m_indices = []
+        self._s_indices = IndexList()
+        self._m_indices = IndexList()
         if matches:
             for match in matches:
                 assert isinstance(match, Match)
@@ -741,20 +814,28 @@ class FilteringMatcher(AbstractMatcher):
     Matching class that only process ImportObjects if their indices are contained
     in a list of allowed indices
     """
-    # TODO: holy shit this is inefficient
 
     def __init__(self, index_fn, s_match_indices=None, m_match_indices=None):
-        if not s_match_indices:
-            s_match_indices = []
-        if not m_match_indices:
-            m_match_indices = []
         # print "entering FilteringMatcher __init__"
         super(FilteringMatcher, self).__init__(index_fn)
-        self.s_match_indices = s_match_indices
-        self.m_match_indices = m_match_indices
+        self.s_match_indices = self.hash_indices(s_match_indices)
+        self.m_match_indices = self.hash_indices(m_match_indices)
         self.m_filter_fn = lambda user_object: user_object.index not in self.m_match_indices
         self.f_filter_fn = lambda user_object: user_object.index not in self.s_match_indices
 
+    @classmethod
+    def hash_indices(cls, match_indices):
+        """
+        Return `match_indices` as a container with O(1) membership. Hashed
+        containers like the indices of a `MatchList` are kept by reference so
+        that matches added to them later are still excluded.
+        """
+        if match_indices is None:
+            return IndexList()
+        if isinstance(match_indices, (IndexList, set, frozenset, dict)):
+            return match_indices
+        return IndexList(match_indices)
+
 
 class CardMatcher(FilteringMatcher):
     """
@@ -816,6 +897,105 @@ class NocardEmailMatcher(EmailMatcher):
                                                  m_match_indices)
         self.process_registers = self.process_registers_singular_ns
 
+
+class MultiKeyMatcher(Registrar):
+    """
+    Matches master and slave objects on several keys in order of precedence
+    with a single hash join of indices on those keys. Objects in a pure match
+    on one key are excluded from matching on later keys, like running a
+    `FilteringMatcher` for each key on the pure matches of the keys before it.
+    """
+
+    def __init__(self):
+        super(MultiKeyMatcher, self).__init__()
+        self.s_match_indices = IndexList()
+        self.m_match_indices = IndexList()
+        self.keys = OrderedDict()
+
+    def add_key(self, name, matcher, sa_index, ma_index):
+        """
+        Match on `name` with `matcher`, given indices of slave and master
+        objects in nonsingular form, key => [objects], keyed by the result of
+        the matcher's index_fn. Keys are matched in the order they are added.
+        """
+        self.keys[name] = (matcher, sa_index, ma_index)
+
+    @classmethod
+    def index_register(cls, register, index_fn, singular=False):
+        """
+        Group the objects in `register` by the result of `index_fn` in one
+        pass, for registers which aren't already indexed by it.
+        """
+        index = OrderedDict()
+        for reg_values in register.values():
+            if singular:
+                reg_values = [reg_values]
+            for reg_value in reg_values:
+                reg_index = index_fn(reg_value)
+                if reg_index not in index:
+                    index[reg_index] = []
+                index[reg_index].append(reg_value)
+        return index
+
+    @classmethod
+    def join_indices(cls, sa_index, ma_index):
+        """
+        Yield the master and slave objects of each key in either index, in
+        the same order as `AbstractMatcher.process_registers_nonsingular`.
+        """
+        for reg_index, ma_objects in ma_index.items():
+            yield ma_objects, sa_index.get(reg_index, [])
+        for reg_index, sa_objects in sa_index.items():
+            if reg_index not in ma_index:
+                yield [], sa_objects
+
+    def process(self):
+        """
+        Process the matches of each key in order of precedence.
+        """
+        for matcher, sa_index, ma_index in self.keys.values():
+            if isinstance(matcher, FilteringMatcher):
+                matcher.s_match_indices = self.s_match_indices
+                matcher.m_match_indices = self.m_match_indices
+            for ma_objects, sa_objects in self.join_indices(sa_index, ma_index):
+                matcher.process_match(ma_objects, sa_objects)
+            for match in matcher.pure_matches:
+                self.s_match_indices.append(match.s_object.index)
+                self.m_match_indices.append(match.m_object.index)
+
+    def __getitem__(self, name):
+        return self.keys[name][0]
+
+
+class UserMatcher(MultiKeyMatcher):
+    """
+    Matches `parsing.user.ImportUser`s on username, then card, then email for
+    users without a card, using the registers of the user parsers, which are
+    already indexed on username, card and normalized email.
+    """
+
+    def process_parsers(self, sa_parser, ma_parser):
+        """
+        Match the users of slave parser `sa_parser` with those of master
+        parser `ma_parser`.
+        """
+        self.add_key(
+            'username', UsernameMatcher(),
+            sa_parser.usernames, ma_parser.usernames
+        )
+        self.add_key(
+            'card', CardMatcher(), sa_parser.cards, ma_parser.cards
+        )
+        # the nocards register is indexed on the index of the user
+        self.add_key(
+            'email', NocardEmailMatcher(),
+            self.index_register(
+                sa_parser.nocards, EmailMatcher.email_index_fn, singular=True
+            ),
+            ma_parser.emails
+        )
+        self.process()
+
 class AttacheeSkuMatcher(FilteringMatcher):
     @staticmethod
     def attachee_sku_index_fn(attachment_object):
@@ -11,20 +11,22 @@ import zipfile
 from bisect import insort
 from pprint import pformat, pprint
 
-import dill
 import sshtunnel
 from httplib2 import ServerNotFoundError
 from requests.exceptions import ConnectionError, ConnectTimeout, ReadTimeout
 
 from six.moves import input
 
-from .matching import (CardMatcher, ConflictingMatchList, EmailMatcher, Match,
-                       NocardEmailMatcher, UsernameMatcher)
+from .checkpoint import CheckpointStore
+from .coldata import ColDataAbstract
+from .matching import (ConflictingMatchList, EmailMatcher, Match,
+                       UserMatcher)
 from .namespace.core import (MatchNamespace, ParserNamespace, ResultsNamespace,
                              UpdateNamespace)
 from .namespace.user import SettingsNamespaceUser
 from .syncupdate import SyncUpdateUsrApi
-from .utils import ProgressCounter, Registrar, SanitationUtils, TimeUtils
+from .utils import (ProgressCounter, Registrar, SanitationUtils, StageTimer,
+                    TimeUtils)
 from .utils.reporter import (ReporterNamespace, do_delta_group,
                              do_duplicates_group, do_duplicates_summary_group,
                              do_failures_group, do_main_summary_group,
@@ -97,6 +99,7 @@ def populate_filter_settings(settings):
         Registrar.register_message("filter_items: %s" % settings.filter_items)
 
 
+@StageTimer.timed(items=lambda parsers: len(parsers.slave.objects))
 def populate_slave_parsers(parsers, settings):
     """Populate the parsers for data from the slave database."""
     parsers.slave = settings.slave_parser_class(**settings.slave_parser_args)
@@ -145,6 +148,7 @@ def populate_slave_parsers(parsers, settings):
     return parsers
 
 
+@StageTimer.timed()
 def export_slave_parser(parsers, settings):
     """Export slave parser to disk."""
     slave_items = parsers.slave.get_obj_list()
@@ -167,6 +171,7 @@ def export_slave_parser(parsers, settings):
         )
 
 
+@StageTimer.timed(items=lambda parsers: len(parsers.master.objects))
 def populate_master_parsers(parsers, settings):
     """Populate the parsers for data from the slave database."""
     things_to_check = []
@@ -206,6 +211,7 @@ def populate_master_parsers(parsers, settings):
     return parsers
 
 
+@StageTimer.timed()
 def export_master_parser(parsers, settings):
     """Export the Masater parser to disk."""
     master_items = parsers.master.get_obj_list()
@@ -216,6 +222,7 @@ def export_master_parser(parsers, settings):
         )
 
 
+@StageTimer.timed(items=lambda matches: len(matches.globals))
 def do_match(parsers, settings):
     """For every item in slave, find its counterpart in master."""
 
@@ -229,10 +236,14 @@ def do_match(parsers, settings):
     Registrar.register_progress("Processing matches")
 
     parsers.deny_anomalous('sa_parser.nousernames', parsers.slave.nousernames)
+    parsers.deny_anomalous('ma_parser.nocards', parsers.master.nocards)
+    parsers.deny_anomalous("sa_parser.noemails", parsers.slave.noemails)
+
+    # match on username, then card, then email in one pass
+    user_matcher = UserMatcher()
+    user_matcher.process_parsers(parsers.slave, parsers.master)
 
-    username_matcher = UsernameMatcher()
-    username_matcher.process_registers(parsers.slave.usernames,
-                                       parsers.master.usernames)
+    username_matcher = user_matcher['username']
 
     matches.deny_anomalous(
         'usernameMatcher.slaveless_matches', username_matcher.slaveless_matches)
@@ -253,17 +264,10 @@ def do_match(parsers, settings):
             "username duplicates: %s" % len(username_matcher.duplicate_matches)
         )
 
-    # Registrar.register_progress("processing cards")
-
     # for every card in slave not already matched, check that it exists in
     # master
 
-    parsers.deny_anomalous('ma_parser.nocards', parsers.master.nocards)
-
-    card_matcher = CardMatcher(
-        matches.globals.s_indices, matches.globals.m_indices
-    )
-    card_matcher.process_registers(parsers.slave.cards, parsers.master.cards)
+    card_matcher = user_matcher['card']
 
     matches.deny_anomalous(
         'cardMatcher.duplicate_matches', card_matcher.duplicate_matches
@@ -289,17 +293,7 @@ def do_match(parsers, settings):
 
     # #for every email in slave, check that it exists in master
 
-    # Registrar.register_progress("processing emails")
-
-    parsers.deny_anomalous("sa_parser.noemails", parsers.slave.noemails)
-
-    email_matcher = NocardEmailMatcher(
-        matches.globals.s_indices, matches.globals.m_indices
-    )
-
-    email_matcher.process_registers(
-        parsers.slave.nocards,
-        parsers.master.emails)
+    email_matcher = user_matcher['email']
 
     matches.masterless.add_matches(email_matcher.masterless_matches)
     matches.slaveless.add_matches(email_matcher.slaveless_matches)
@@ -322,6 +316,7 @@ def do_match(parsers, settings):
     return matches
 
 
+@StageTimer.timed(items=lambda updates: len(updates.static))
 def do_merge(matches, parsers, settings):
     """For a given list of matches, return a description of updates required to merge them."""
     Registrar.register_progress("BEGINNING MERGE (%d)" % len(matches.globals))
@@ -423,6 +418,7 @@ def do_merge(matches, parsers, settings):
     return updates
 
 
+@StageTimer.timed()
 def do_report(matches, updates, parsers, settings):
     """Write report of changes to be made."""
     reporters = ReporterNamespace()
@@ -480,42 +476,61 @@ def do_report(matches, updates, parsers, settings):
     return reporters
 
 
-def pickle_state(matches=None, updates=None, parsers=None,
-                 settings=None, progress=None):
-    """Save execution state of a pickle file which can be restored later."""
-    # Registrar.register_progress("pickling state")
-    settings.progress = progress
-    pickle_obj = (matches, updates, parsers, settings)
-
-    with open(settings.pickle_path, 'w') as pickle_file:
-        dill.dump(pickle_obj, pickle_file)
-
-    Registrar.register_message("state saved to %s" % settings.pickle_path)
+def save_checkpoint(store, settings, progress, parsers=None, matches=None,
+                    updates=None):
+    """Save the output of the stages completed before `progress`."""
+    Registrar.register_progress("saving checkpoint: %s" % progress)
 
-
-def unpickle_state(settings_pickle):
-    """Restore state from a pickle file."""
+    settings.progress = progress
+    store.save('settings', settings)
+    if parsers is not None:
+        store.save_parsers(parsers)
+    if matches is not None:
+        store.save('matches', matches)
+    if updates is not None:
+        store.save('updates', updates)
+    store.progress = progress
+
+    Registrar.register_message("checkpoint saved to %s" % store.path)
+
+
+def resume_checkpoint(settings_resume):
+    """
+    Resume from a checkpoint, only loading the stages needed from its progress.
+    """
     Registrar.register_progress(
-        "restoring state from pickle of %s" % settings_pickle.import_name
+        "resuming from checkpoint %s" % settings_resume.checkpoint_path
     )
 
-    with open(settings_pickle.pickle_path) as pickle_file:
-        pickle_obj = dill.load(pickle_file)
-        matches, updates, parsers, settings = pickle_obj
-        settings.picklemode = True
+    store = CheckpointStore(settings_resume.checkpoint_path)
+    settings = store.load('settings')
+    settings.picklemode = True
+    settings.progress = settings_resume.get('override_progress') \
+        or store.progress
 
-    if settings_pickle.get('override_progress'):
-        settings.progress = settings_pickle['override_progress']
+    if settings.progress not in ['sync', 'report']:
+        raise UserWarning(
+            "can't resume from progress %s" % settings.progress
+        )
 
-    if settings.progress in ['sync']:
+    parsers, matches = None, None
+    if settings.progress == 'sync':
+        parsers = store.load_parsers()
         matches = do_match(parsers, settings)
         updates = do_merge(matches, parsers, settings)
-    if settings.progress in ['sync', 'report']:
+    else:
+        updates = store.load('updates')
+
+    reporters = ReporterNamespace()
+    if settings.get('do_report'):
+        if parsers is None:
+            parsers = store.load_parsers()
+            matches = store.load('matches')
         reporters = do_report(matches, updates, parsers, settings)
-        results = do_updates(updates, settings)
-        if results:
-            do_report_post(reporters.main, results, settings)
-        return reporters, results
+
+    results = do_updates(updates, settings)
+    do_report_post(reporters, results, settings)
+    return reporters, results
 
 
 def handle_failed_update(update, results, exc, settings, source=None):
@@ -551,6 +566,7 @@ def handle_failed_update(update, results, exc, settings, source=None):
                 pudb.set_trace()
 
 
+@StageTimer.timed(items=lambda results: len(results.successes))
 def do_updates(updates, settings):
     """Perform a list of updates."""
     all_updates = updates.static
@@ -622,6 +638,7 @@ def do_updates(updates, settings):
     return results
 
 
+@StageTimer.timed()
 def do_report_post(reporters, results, settings):
     """ Reports results from performing updates."""
     if settings.get('do_report'):
@@ -635,19 +652,27 @@ def do_report_post(reporters, results, settings):
                 'post', settings.rep_post_path)
 
 
+@StageTimer.timed()
 def main(override_args=None, settings=None):
     """Use settings object to load config file and detect changes in wordpress."""
     if not settings:
         settings = SettingsNamespaceUser()
     settings.init_settings(override_args)
+    StageTimer.reset()
 
-    if hasattr(settings, 'pickle_file') and getattr(settings, 'pickle_file'):
-        return unpickle_state(settings)
+    if settings.get('checkpoint_dir'):
+        return resume_checkpoint(settings)
     else:
         Registrar.register_progress("Starting Merge %s" % settings.import_name)
 
+    store = None
+    if settings.get('save_checkpoints'):
+        store = CheckpointStore(settings.checkpoint_path)
+
     settings.init_dirs()
 
+    ColDataAbstract.init_property_tables(settings.coldata_cache_path)
+
     populate_filter_settings(settings)
 
     parsers = ParserNamespace()
@@ -658,12 +683,17 @@ def main(override_args=None, settings=None):
     if settings['download_master'] or settings['do_filter']:
         export_master_parser(parsers, settings)
 
-    # pickle_state(None, None, parsers, settings, 'sync')
+    if store:
+        save_checkpoint(store, settings, 'sync', parsers=parsers)
 
     matches = do_match(parsers, settings)
     updates = do_merge(matches, parsers, settings)
 
-    # pickle_state(matches, updates, parsers, settings, 'report')
+    if store:
+        save_checkpoint(
+            store, settings, 'report',
+            parsers=parsers, matches=matches, updates=updates
+        )
 
     reporters = do_report(matches, updates, parsers, settings)
 
@@ -708,6 +738,18 @@ def do_summary(settings, reporters=None, results=None,
 
     summary_html = "<p>%s</p>" % re.sub(ur'\n', ur'\n<br/>\n', summary_text)
 
+    Registrar.register_message(
+        "stage summary: \n%s" % StageTimer.get_summary_text()
+    )
+    try:
+        StageTimer.write_json(settings.rep_stages_path)
+    except Exception as exc:
+        Registrar.register_warning(
+            "could not write stages to %s: %s" % (
+                settings.rep_stages_path, exc
+            )
+        )
+
     # TODO: move this block to Registrar.write_log()
     with io.open(settings.log_path, 'w+', encoding='utf8') as log_file:
         for source, messages in Registrar.get_message_items(1).items():
@@ -723,7 +765,8 @@ def do_summary(settings, reporters=None, results=None,
     try:
         files_to_zip = []
         attrs_to_zip = [
-            'log_path'
+            'log_path',
+            'rep_stages_path'
         ]
         reports_to_ignore = [
             # 'dup'
@@ -810,6 +853,9 @@ def do_summary(settings, reporters=None, results=None,
         summary_html += reporters.post.get_summary_html()
         summary_text += "\n%s" % reporters.post.get_summary_text()
 
+    summary_html += StageTimer.get_summary_text('html')
+    summary_text += "\n%s" % StageTimer.get_summary_text()
+
     if settings.get('do_mail') and reporters and results:
         try:
             do_mail(
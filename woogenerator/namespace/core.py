@@ -161,6 +161,8 @@ class SettingsNamespaceProto(argparse.Namespace):
             response['version'] = self.get('wp_api_version')
         if self.get('wp_creds_store'):
             response['creds_store'] = self.get('wp_creds_store')
+        if self.get('slave_concurrency'):
+            response['concurrency'] = self.get('slave_concurrency')
         return response
 
     @property
@@ -177,6 +179,10 @@ class SettingsNamespaceProto(argparse.Namespace):
             response['version'] = self.get('wc_api_version')
         if self.get('wp_creds_store'):
             response['creds_store'] = self.get('wp_creds_store')
+        if self.get('slave_concurrency'):
+            response['concurrency'] = self.get('slave_concurrency')
+        if self.get('slave_batch_size'):
+            response['batch_size'] = self.get('slave_batch_size')
         return response
 
     @property
@@ -238,17 +244,22 @@ class SettingsNamespaceProto(argparse.Namespace):
     # File paths for reporting / piclking
 
     @property
-    def pickle_path(self):
-        if hasattr(self, 'pickle_file') and getattr(self, 'pickle_file'):
-            return getattr(self, 'pickle_file')
+    def checkpoint_path(self):
+        if self.get('checkpoint_dir'):
+            return self.checkpoint_dir
         response = self.import_name
-        if self.get('progress'):
-            response += '_%s' % self['progress']
-        response += '.pickle'
         if self.pickle_dir_full:
             response = os.path.join(self.pickle_dir_full, response)
         return response
 
+    @property
+    def coldata_cache_path(self):
+        """
+        The file which the resolved properties of coldata classes are cached in.
+        """
+        if self.pickle_dir_full:
+            return os.path.join(self.pickle_dir_full, 'coldata-tables.pickle.gz')
+
     @property
     def rep_main_path(self):
         response = '%ssync_report%s.html' % (
@@ -258,6 +269,15 @@ class SettingsNamespaceProto(argparse.Namespace):
             response = os.path.join(self.report_dir_full, response)
         return response
 
+    @property
+    def rep_stages_path(self):
+        response = '%ssync_stages%s.json' % (
+            self.file_prefix, self.file_suffix
+        )
+        if self.report_dir_full:
+            response = os.path.join(self.report_dir_full, response)
+        return response
+
     @property
     def rep_dup_path(self):
         response = "%ssync_report_duplicate_%s.html" % (
@@ -501,6 +521,27 @@ class ParserNamespace(argparse.Namespace):
         self.master = getattr(self, 'master', None)
         self.slave = getattr(self, 'slave', None)
         self.anomalous = {}
+        self.cache_counts = OrderedDict()
+
+    def add_cache_counts(self, name, hits, misses):
+        """
+        Count the items which were reused from the cache `name` (hits) and
+        the items which had to be processed again (misses).
+        """
+        if name not in self.cache_counts:
+            self.cache_counts[name] = OrderedDict([('hits', 0), ('misses', 0)])
+        self.cache_counts[name]['hits'] += hits
+        self.cache_counts[name]['misses'] += misses
+
+    def get_cache_summary_text(self, tablefmt=None):
+        return tabulate(
+            [
+                [name, counts['hits'], counts['misses']]
+                for name, counts in self.cache_counts.items()
+            ],
+            headers=['cache', 'hits', 'misses'],
+            tablefmt=tablefmt or 'simple'
+        )
 
     def deny_anomalous(self, parselist_type, anomalous_parselist, error=False):
         """Add the parselist to the list of anomalous parse lists if it is not empty."""
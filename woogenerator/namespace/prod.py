@@ -169,10 +169,8 @@ class SettingsNamespaceProd(SettingsNamespaceProto):
         return response
 
     @property
-    def slave_path(self):
-        """ The path which the slave data is downloaded to and read from. """
-        if hasattr(self, 'slave_file') and getattr(self, 'slave_file'):
-            return getattr(self, 'slave_file')
+    def slave_path_stem(self):
+        """ The start of the name of files which slave data is cached in. """
         response = '%s%s' % (self.file_prefix, 'slave')
         if self.schema_is_woo:
             response += '_woo_api'
@@ -181,10 +179,53 @@ class SettingsNamespaceProd(SettingsNamespaceProto):
         if self.schema_is_xero:
             response += '_xero_api'
         response += self.file_suffix
-        response += "-" + self.import_name + '.json'
+        return response
+
+    @property
+    def slave_data_ext(self):
+        """ The extension of files which slave api data is cached in. """
+        return '.' + (self.get('slave_cache_format') or 'json')
+
+    @property
+    def slave_path(self):
+        """ The path which the slave data is downloaded to and read from. """
+        if hasattr(self, 'slave_file') and getattr(self, 'slave_file'):
+            return getattr(self, 'slave_file')
+        response = self.slave_path_stem
+        response += "-" + self.import_name + self.slave_data_ext
         response = os.path.join(self.in_dir_full, response)
         return response
 
+    @property
+    def slave_cache_path(self):
+        """
+        The path which incremental downloads of slave data are merged into.
+        """
+        response = self.slave_path_stem + '-cache' + self.slave_data_ext
+        return os.path.join(self.in_dir_full, response)
+
+    @property
+    def master_subtree_cache_path(self):
+        """
+        The directory which the analysed subtrees of master data are cached in.
+        """
+        response = '%s%s-subtrees' % (self.file_prefix, 'master')
+        return os.path.join(self.in_dir_full, response)
+
+    @property
+    def slave_watermark_path(self):
+        """ The path which the time of the last slave download is stored. """
+        response = self.slave_path_stem + '-watermark.json'
+        return os.path.join(self.in_dir_full, response)
+
+    @property
+    def slave_incremental(self):
+        """ Whether only modified slave items should be downloaded. """
+        return bool(
+            self.get('do_incremental_slave') and self['download_slave']
+            and self.schema_is_woo
+        )
+
     @property
     def specials_path(self):
         """ The path which the specials data is downloaded to and read from. """
@@ -305,7 +346,7 @@ class SettingsNamespaceProd(SettingsNamespaceProto):
                 response += '_' + self.get('wc_api_namespace')
         if self.variant:
             response = "-".join([response, self.variant])
-        response += "-" + self.import_name + '.json'
+        response += "-" + self.import_name + self.slave_data_ext
         return os.path.join(self.in_dir_full, response)
 
     @property
@@ -316,7 +357,7 @@ class SettingsNamespaceProd(SettingsNamespaceProto):
         response = '%s%s' % (self.file_prefix, 'slave_img')
         if self.variant:
             response = "-".join([response, self.variant])
-        response += "-" + self.import_name + '.json'
+        response += "-" + self.import_name + self.slave_data_ext
         return os.path.join(self.in_dir_full, response)
 
     @property
@@ -370,6 +411,10 @@ class SettingsNamespaceProd(SettingsNamespaceProto):
             response = os.path.join(self.img_cmp_dir, response)
         return response
 
+    @property
+    def img_manifest_path(self):
+        return self.img_dst + '-manifest.json'
+
     @property
     def sync_handles_prod(self):
         response = self.coldata_class.get_sync_handles(
@@ -500,9 +545,12 @@ class SettingsNamespaceProd(SettingsNamespaceProto):
                 ('dprp_rules', 'dprp_rules'),
                 ('dprc_rules', 'dprc_rules'),
                 ('current_special_groups', 'current_special_groups'),
+                ('workers', 'master_parse_workers'),
         ]:
             if hasattr(self, settings_key):
                 response[key] = getattr(self, settings_key)
+        if getattr(self, 'do_master_cache', None):
+            response['subtree_cache'] = self.master_subtree_cache_path
         if getattr(self, 'do_categories', None) and getattr(
                 self, 'current_special_groups', None):
             response['add_special_categories'] = getattr(
@@ -98,6 +98,7 @@ class SettingsNamespaceUser(SettingsNamespaceProto):
         }
         for key, settings_key in [
                 ('filter_items', 'filter_items'),
+                ('compact_records', 'compact_records'),
         ]:
             if hasattr(self, settings_key):
                 response[key] = getattr(self, settings_key)
@@ -223,6 +224,7 @@ class SettingsNamespaceUser(SettingsNamespaceProto):
         }
         for key, settings_key in [
                 ('filter_items', 'filter_items'),
+                ('compact_records', 'compact_records'),
         ]:
             if hasattr(self, settings_key):
                 response[key] = getattr(self, settings_key)
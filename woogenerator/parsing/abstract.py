@@ -10,8 +10,12 @@ through before changing anything. Sorry about that.
 """
 from __future__ import absolute_import
 
+import cPickle
+import itertools
+import os
 import re
 from collections import OrderedDict
+from cStringIO import StringIO
 from copy import copy, deepcopy
 from pprint import pformat
 
@@ -24,6 +28,129 @@ from ..utils import (ProgressCounter, Registrar, SanitationUtils, SeqUtils,
 
 BLANK_CELL = ''
 
+
+def reconstruct_object(cls, base_class):
+    """
+    Create an empty instance of `cls` for unpickling without calling its
+    __init__, which would register it with its parent and process its meta.
+    """
+    instance = base_class.__new__(cls)
+    base_class.__init__(instance)
+    return instance
+
+
+def get_object_index(object_data):
+    """ Default indexer of an ObjList, a function so that it can be pickled. """
+    return object_data.index
+
+
+class RecordShape(object):
+    """
+    An ordered sequence of keys shared by every `CompactRecord` which has had
+    the same keys set in the same order.
+
+    A shape remembers the shapes it transitions to when a key is added or
+    removed, so records built from the same columns share their shapes.
+    """
+    __slots__ = ['keys', 'additions', 'removals']
+
+    def __init__(self, keys=()):
+        self.keys = tuple(keys)
+        self.additions = {}
+        self.removals = {}
+
+    def add(self, key):
+        """ Return the shape of a record with these keys, then `key`. """
+        shape = self.additions.get(key)
+        if shape is None:
+            shape = RecordShape(self.keys + (key,))
+            self.additions[key] = shape
+        return shape
+
+    def remove(self, key):
+        """ Return the shape of a record with these keys, except `key`. """
+        shape = self.removals.get(key)
+        if shape is None:
+            shape = RecordShape([
+                shape_key for shape_key in self.keys if shape_key != key
+            ])
+            self.removals[key] = shape
+        return shape
+
+
+class CompactRecord(OrderedDict):
+    """
+    An OrderedDict which stores its items in the plain dict table and takes
+    its order from a shared `RecordShape` instead of a linked list per key,
+    using a fraction of the memory for records with many columns.
+
+    Values stay in the dict table so that dict(), json and ** unpacking see
+    them. Deleting a key is O(n) in the number of keys.
+
+    To store an ImportObject subclass compactly, subclass it along with this
+    class and set `record_class`:
+
+        class ImportFooCompact(ImportFoo, CompactRecord):
+            record_class = CompactRecord
+    """
+    empty_shape = RecordShape()
+
+    def __init__(self, *args, **kwargs):
+        self._shape = self.empty_shape
+        OrderedDict.update(self, *args, **kwargs)
+
+    def __setitem__(self, key, value):
+        if not dict.__contains__(self, key):
+            self._shape = self._shape.add(key)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._shape = self._shape.remove(key)
+
+    def __iter__(self):
+        return iter(self._shape.keys)
+
+    def __reversed__(self):
+        return reversed(self._shape.keys)
+
+    def clear(self):
+        dict.clear(self)
+        self._shape = self.empty_shape
+
+    def keys(self):
+        return list(self._shape.keys)
+
+    def values(self):
+        return [self[key] for key in self._shape.keys]
+
+    def items(self):
+        return [(key, self[key]) for key in self._shape.keys]
+
+    def iterkeys(self):
+        return iter(self._shape.keys)
+
+    def itervalues(self):
+        for key in self._shape.keys:
+            yield self[key]
+
+    def iteritems(self):
+        for key in self._shape.keys:
+            yield (key, self[key])
+
+    def popitem(self, last=True):
+        if not self:
+            raise KeyError('dictionary is empty')
+        key = self._shape.keys[-1 if last else 0]
+        value = self.pop(key)
+        return key, value
+
+    def __reduce__(self):
+        inst_dict = vars(self).copy()
+        inst_dict.pop('_shape', None)
+        return (self.__class__, (self.items(),), inst_dict or None)
+
+
 class ImportObject(OrderedDict, Registrar):
     """
     A container for a parsed object.
@@ -32,6 +159,8 @@ class ImportObject(OrderedDict, Registrar):
     rowcount_key = 'rowcount'
     row_key = '_row'
     coldata_gen_target = 'gen-csv'
+    # the mapping class which stores the items
+    record_class = OrderedDict
 
     def __init__(self, *args, **kwargs):
         if self.DEBUG_ABSTRACT:
@@ -63,7 +192,7 @@ class ImportObject(OrderedDict, Registrar):
             data[self.rowcount_key] = rowcount
         row = kwargs.pop('row', None)
 
-        OrderedDict.__init__(self, data)
+        self.record_class.__init__(self, data)
         self._row = row
         if '_row' not in self.keys():
             self['_row'] = []
@@ -92,7 +221,13 @@ class ImportObject(OrderedDict, Registrar):
             self.coldata_gen_target,
             coldata_target
         )
-        extra_colnames = kwargs.get('extra_colnames', OrderedDict())
+        return self.add_extra_colnames(data, kwargs.get('extra_colnames'))
+
+    def add_extra_colnames(self, data, extra_colnames=None):
+        """
+        Copy the columns of the object in `extra_colnames` into `data` under
+        their new names.
+        """
         if extra_colnames:
             for col, name in extra_colnames.items():
                 if col in self:
@@ -198,17 +333,32 @@ class ImportObject(OrderedDict, Registrar):
             del other_dict['rowcount']
         if '_row' in other_dict:
             del other_dict['_row']
-        return OrderedDict.update(self, other_dict)
+        return self.record_class.update(self, other_dict)
 
     def __getstate__(self):
         return self.__dict__
 
     def __setstate__(self, copy_dict):
+        if isinstance(copy_dict, tuple):
+            copy_dict, items = copy_dict
+            for key, value in items:
+                self.record_class.__setitem__(self, key, value)
         self.__dict__.update(copy_dict)
 
-    def __recuce__(self):
-        items = copy(OrderedDict(self.items()))
-        return (self.__class__, (items, ))
+    def __reduce__(self):
+        """
+        Pickle the items and attributes of the object, and unpickle them into
+        an instance created without __init__, so that unpickling does not
+        register it with its parent again or reprocess its meta.
+        """
+        copy_dict = vars(self).copy()
+        for key in vars(self.record_class()):
+            copy_dict.pop(key, None)
+        return (
+            reconstruct_object,
+            (self.__class__, self.record_class),
+            (copy_dict, self.items())
+        )
 
     def __copy__(self):
         items = copy(OrderedDict(self.items()))
@@ -252,7 +402,7 @@ class ObjList(list, Registrar):
         if self.DEBUG_MRO:
             self.register_message('ObjList')
         if indexer is None:
-            indexer = (lambda x: getattr(x, 'index'))
+            indexer = get_object_index
         self.indexer = indexer
         # self._obj_list_type = 'objects'
         # self._objects = []
@@ -297,6 +447,18 @@ class ObjList(list, Registrar):
         self.indices.__delitem__(key)
         return list.__delitem__(self, key)
 
+    def __reduce__(self):
+        return (
+            reconstruct_object,
+            (self.__class__, list),
+            (vars(self).copy(), self[:])
+        )
+
+    def __setstate__(self, state):
+        copy_dict, objects = state
+        self.__dict__.update(copy_dict)
+        list.extend(self, objects)
+
     def get_by_index(self, index):
         return self[self.indices.index(index)]
 
@@ -408,22 +570,170 @@ class ObjList(list, Registrar):
                 (value, value) for key, value in col_names.items()
             ])
             dictwriter.writerow(header_row)
-            objects = []
-            for object_ in self.objects:
-                objects.append(
-                    object_.to_target_type(
-                        coldata_class=coldata_class,
-                        coldata_target=coldata_target,
-                        extra_colnames=extra_colnames
-                    )
-                )
-            dictwriter.writerows(objects)
+            dictwriter.writerows(self.to_target_types(
+                coldata_class=coldata_class,
+                coldata_target=coldata_target,
+                extra_colnames=extra_colnames
+            ))
         self.register_message("WROTE FILE: %s" % file_path)
 
+    def to_target_types(self, coldata_class=None, coldata_target=None,
+                        extra_colnames=None):
+        """
+        Return the objects as dictionaries like `ImportObject.to_target_type`,
+        translating consecutive objects from the same gen target in one batch.
+        """
+        if coldata_class is None:
+            coldata_class = self.coldata_class
+        if coldata_target is None:
+            coldata_target = self.coldata_target
+        response = []
+        for coldata_gen_target, objects in itertools.groupby(
+            self.objects, lambda object_: object_.coldata_gen_target
+        ):
+            objects = list(objects)
+            datas = coldata_class.translate_batch_from_to_simple(
+                [object_.to_dict() for object_ in objects],
+                coldata_gen_target,
+                coldata_target
+            )
+            for object_, data in zip(objects, datas):
+                response.append(
+                    object_.add_extra_colnames(data, extra_colnames)
+                )
+        return response
+
     report_cols = OrderedDict([('_row', {'label': 'Row'}), ('index', {})])
 
 ImportObject.container = ObjList
 
+def dumps_object_graph(value):
+    """
+    Pickle `value`, pickling each ImportObject and ObjList it refers to on
+    its own with references to the others.
+
+    Parsed objects are linked to their parents, children, attachments and
+    attachees, so pickling them recursively can exceed the recursion limit.
+    """
+    buffer_ = StringIO()
+    pickler = cPickle.Pickler(buffer_, cPickle.HIGHEST_PROTOCOL)
+    nodes = []
+    node_ids = {}
+
+    def persistent_id(obj):
+        if isinstance(obj, (ImportObject, ObjList)):
+            if id(obj) not in node_ids:
+                node_ids[id(obj)] = len(nodes)
+                nodes.append(obj)
+            if isinstance(obj, ImportObject):
+                base_class = obj.record_class
+            else:
+                base_class = list
+            return (node_ids[id(obj)], type(obj), base_class)
+
+    pickler.persistent_id = persistent_id
+    pickler.dump(value)
+    # nodes grows as the state of each node refers to new nodes
+    index = 0
+    while index < len(nodes):
+        pickler.dump(nodes[index].__reduce__()[2])
+        index += 1
+    return buffer_.getvalue()
+
+
+def loads_object_graph(string):
+    """ Unpickle a value pickled with dumps_object_graph. """
+    unpickler = cPickle.Unpickler(StringIO(string))
+    nodes = {}
+
+    def persistent_load(node_id):
+        index, cls, base_class = node_id
+        if index not in nodes:
+            nodes[index] = reconstruct_object(cls, base_class)
+        return nodes[index]
+
+    unpickler.persistent_load = persistent_load
+    value = unpickler.load()
+    index = 0
+    while index < len(nodes):
+        nodes[index].__setstate__(unpickler.load())
+        index += 1
+    return value
+
+
+class ObjectSearchIndex(object):
+    """
+    Hash index of the objects in a registry on the values of search keys, so
+    that find_object does not have to scan the registry.
+
+    Objects are indexed on the values they have when they are added, adding a
+    registered object again re-indexes it. Objects put in the registry without
+    being added, like those merged from another parser, are indexed the next
+    time the index is searched. Matches are checked against the current
+    values of the objects, so stale entries are never returned.
+    """
+
+    def __init__(self, registry, search_keys):
+        self.registry = registry
+        self.search_keys = list(search_keys)
+        # search key -> value -> set of registry keys
+        self.values = dict([(search_key, {}) for search_key in search_keys])
+        # registry key -> values it is indexed on
+        self.indexed = {}
+
+    def discard(self, object_key):
+        for search_key, value in self.indexed.pop(object_key, {}).items():
+            object_keys = self.values[search_key].get(value)
+            if object_keys is not None:
+                object_keys.discard(object_key)
+                if not object_keys:
+                    del self.values[search_key][value]
+
+    def add(self, object_key):
+        self.discard(object_key)
+        object_ = self.registry.get(object_key)
+        if object_ is None:
+            return
+        indexed = {}
+        for search_key in self.search_keys:
+            value = object_.get(search_key)
+            if not value:
+                continue
+            try:
+                self.values[search_key].setdefault(value, set()).add(object_key)
+            except TypeError:
+                # unhashable values can't be indexed
+                continue
+            indexed[search_key] = value
+        self.indexed[object_key] = indexed
+
+    def sync(self):
+        """ Index the objects in the registry which have not been added. """
+        if len(self.indexed) == len(self.registry):
+            return
+        for object_key in self.registry:
+            if object_key not in self.indexed:
+                self.add(object_key)
+        if len(self.indexed) != len(self.registry):
+            for object_key in self.indexed.keys():
+                if object_key not in self.registry:
+                    self.discard(object_key)
+
+    def matching_keys(self, search_key, value):
+        """ Get the set of registry keys of objects where search_key is value. """
+        try:
+            object_keys = self.values[search_key].get(value, ())
+        except TypeError:
+            return set([
+                object_key for object_key, object_ in self.registry.items()
+                if object_.get(search_key) == value
+            ])
+        return set([
+            object_key for object_key in object_keys
+            if self.registry[object_key].get(search_key) == value
+        ])
+
+
 class CsvParseBase(Registrar):
     """
     Base class for Parsing spreadsheet-like formats.
@@ -432,6 +742,14 @@ class CsvParseBase(Registrar):
     object_container = ImportObject
     coldata_class = ColDataAbstract
     coldata_gen_target = 'gen-csv'
+    # register name -> ObjectSearchIndex, built when a register is searched
+    search_indices = None
+    # (col, index) pairs compiled by analyse_header, see compile_row_plan
+    row_plan = None
+    # sanitized cells are memoized if they are at most this long
+    sanitized_memo_length = 32
+    # types of default values which don't need to be deepcopied
+    scalar_types = (basestring, int, long, float, bool, type(None))
 
     def __init__(self, cols, defaults, **kwargs):
         # super(CsvParseBase, self).__init__()
@@ -451,15 +769,45 @@ class CsvParseBase(Registrar):
         self.source = kwargs.get('source')
 
     def __getstate__(self):
-        return self.__dict__
+        copy_dict = dict(self.__dict__)
+        # search indices are rebuilt when they are needed
+        copy_dict.pop('search_indices', None)
+        return copy_dict
 
     def __setstate__(self, copy_dict):
         self.__dict__.update(copy_dict)
 
+    def get_search_index(self, register_name, registry, search_keys):
+        """
+        Get the search index of `registry` on `search_keys`, building it if
+        the registry has not been indexed on those keys.
+        """
+        if self.search_indices is None:
+            self.search_indices = {}
+        search_index = self.search_indices.get(register_name)
+        if search_index is None \
+        or search_index.registry is not registry \
+        or search_index.search_keys != list(search_keys):
+            search_index = ObjectSearchIndex(registry, search_keys)
+            self.search_indices[register_name] = search_index
+        return search_index
+
+    def index_registered(self, register_name, registry, index):
+        """
+        Update the search index of `registry`, if it has been built, with the
+        object registered at `index`.
+        """
+        if not self.search_indices:
+            return
+        search_index = self.search_indices.get(register_name)
+        if search_index is not None and search_index.registry is registry:
+            search_index.add(index)
+
     def clear_transients(self):
         if self.DEBUG_MRO:
             self.register_message(' ')
         self.indices = OrderedDict()
+        self.row_plan = None
         self.objects = OrderedDict()
         self.rowcount = 1
 
@@ -472,6 +820,48 @@ class CsvParseBase(Registrar):
             self.object_indexer,
             singular=True,
             register_name='objects')
+        self.index_registered(
+            'objects', self.objects, self.object_indexer(object_data)
+        )
+
+    def merge_register(self, register, other_register, singular=True,
+                       resolver=None, register_name=''):
+        """
+        Register the things in `other_register` in `register`, in order, as
+        register_anything would have registered them.
+        """
+        if resolver is None:
+            resolver = self.conflict_resolver
+        for index, thing in other_register.items():
+            if singular:
+                if index not in register:
+                    register[index] = thing
+                else:
+                    resolver(thing, register[index], index, register_name)
+            else:
+                if index not in register:
+                    register[index] = []
+                for thing_ in thing:
+                    if thing_ not in register[index]:
+                        register[index].append(thing_)
+
+    def get_transients(self):
+        """ Return the attributes set by clear_transients. """
+        empty = object.__new__(type(self))
+        empty.clear_transients()
+        return OrderedDict([
+            (name, getattr(self, name)) for name in vars(empty)
+        ])
+
+    def merge_transients(self, other):
+        """
+        Merge the registers of `other`, a parser which analysed the rows
+        following the rows analysed by this parser.
+        """
+        self.merge_register(
+            self.objects, other.objects, register_name='objects'
+        )
+        self.rowcount = other.rowcount
 
     def analyse_header(self, row):
         sanitized_row = [self.sanitize_cell(cell) for cell in row]
@@ -492,7 +882,53 @@ class CsvParseBase(Registrar):
         if not self.indices:
             warn = UserWarning("could not find any indices")
             self.raise_exception(warn)
+        self.compile_row_plan()
 
+    def compile_row_plan(self):
+        """
+        Compile the indices found by analyse_header into the plan that
+        extract_row follows for each row: the position of each col in the row,
+        or None if the col is filled from the defaults.
+        """
+        self.row_plan = [(col, self.indices.get(col)) for col in self.cols]
+        self.sanitized_memo = {}
+        if self.strict:
+            for col, index in self.row_plan:
+                if index is None and col not in self.defaults:
+                    self.register_message(
+                        'No default for column ' + str(col)
+                    )
+
+    def extract_row(self, row):
+        """
+        Extract the sanitized data of the non-empty cols of a row by following
+        the row plan, the same data as retrieving each col from the row.
+        """
+        row_data = OrderedDict()
+        defaults = self.defaults
+        sanitize_cell = self.sanitize_cell
+        sanitized_memo = self.sanitized_memo
+        memo_length = self.sanitized_memo_length
+        for col, index in self.row_plan:
+            if index is None:
+                cell = defaults.get(col)
+            else:
+                try:
+                    cell = row[index]
+                except IndexError:
+                    # registers the warning
+                    cell = self.retrieve_col_from_row(col, row)
+            if cell is None or unicode(cell) is u"":
+                continue
+            # short cells like blanks and codes repeat a lot
+            if isinstance(cell, unicode) and len(cell) <= memo_length:
+                try:
+                    row_data[col] = sanitized_memo[cell]
+                except KeyError:
+                    row_data[col] = sanitized_memo[cell] = sanitize_cell(cell)
+            else:
+                row_data[col] = sanitize_cell(cell)
+        return row_data
 
     def retrieve_col_from_row(self, col, row):
         # if self.DEBUG_PARSER: print "retrieve_col_from_row | col: ", col
@@ -529,19 +965,31 @@ class CsvParseBase(Registrar):
         return cell
 
     @classmethod
-    def find_object(cls, search_data, registry, search_keys):
+    def find_object(cls, search_data, registry, search_keys, search_index=None):
         """
         Search for an object within a registry on search_keys.
+
+        An object only matches if it matches on all of the search_keys which
+        have a value in search_data. If `search_index` is given it is used
+        instead of scanning the registry.
         """
         response = None
         matching_sets = []
 
+        if search_index is not None:
+            search_index.sync()
+
         for search_key in search_keys:
             value = search_data.get(search_key)
             if value:
                 if Registrar.DEBUG_API:
                     Registrar.register_message(
                         "checking search key %s" % search_key)
+                if search_index is not None:
+                    matching_sets.append(
+                        search_index.matching_keys(search_key, value)
+                    )
+                    continue
                 matching_objects = set()
                 for object_key, object_ in registry.items():
                     if object_.get(search_key) == value:
@@ -581,6 +1029,8 @@ class CsvParseBase(Registrar):
         if 'row_data' in kwargs:
             return kwargs['row_data']
         row = kwargs.get('row', [])
+        if self.row_plan is not None and not self.DEBUG_ABSTRACT:
+            return self.extract_row(row)
         row_data = OrderedDict()
         for col in self.cols:
             retrieved = self.retrieve_col_from_row(col, row)
@@ -626,7 +1076,12 @@ class CsvParseBase(Registrar):
 
         Override in subclasses.
         """
-        return deepcopy(kwargs.get('defaults', self.defaults))
+        defaults = kwargs.get('defaults', self.defaults)
+        if all(
+            isinstance(value, self.scalar_types) for value in defaults.values()
+        ):
+            return copy(defaults)
+        return deepcopy(defaults)
 
     # TODO: remove rowcount, rely on self.rowcount?
     def new_object(self, rowcount, **kwargs):
@@ -679,27 +1134,65 @@ class CsvParseBase(Registrar):
 
         pass
 
-    def analyse_rows(self, unicode_rows, file_name="rows", limit=None):
+    @classmethod
+    def get_stream_size(cls, byte_file_obj):
+        """
+        Get the size in bytes of a seekable stream, or None if unknown.
         """
-        Analyse a list of unicode rows to create objects.
+        try:
+            return os.fstat(byte_file_obj.fileno()).st_size
+        except (AttributeError, IOError, OSError, ValueError):
+            pass
+        try:
+            position = byte_file_obj.tell()
+            byte_file_obj.seek(0, os.SEEK_END)
+            size = byte_file_obj.tell()
+            byte_file_obj.seek(position)
+            return size
+        except (AttributeError, IOError, OSError, ValueError):
+            pass
+
+    def analyse_rows(self, unicode_rows, file_name="rows", limit=None,
+                     stream=None):
         """
+        Analyse an iterable of unicode rows to create objects.
 
+        Rows are consumed lazily so that only the registered objects are kept
+        in memory.
+
+        Arguments:
+        ----
+            unicode_rows (iterable):
+                The rows to be analysed
+            file_name (basestring):
+                Used to differentiate these rows from others in debugging.
+            limit (int):
+                The number of rows to process
+            stream (io.IOBase, optional):
+                The byte stream the rows are read from, used to estimate
+                progress from its position.
+        """
+
+        total = None
+        if hasattr(unicode_rows, '__len__'):
+            total = len(unicode_rows)
         if limit and isinstance(limit, int):
-            unicode_rows = list(unicode_rows)[:limit]
+            unicode_rows = itertools.islice(unicode_rows, limit)
+            if total is not None:
+                total = min(total, limit)
         if self.DEBUG_PROGRESS:
-
-            # last_print = time()
-            rows = []
-            try:
-                for row in unicode_rows:
-                    rows.append(row)
-            except Exception as exc:
-                warn = Exception("could not append row %d, %s: \n\t%s" %
-                                (len(rows), str(exc), repr(rows[-1:])))
-                self.raise_exception(warn)
-            rowlen = len(rows)
-            self.progress_counter = ProgressCounter(rowlen)
-            unicode_rows = rows
+            stream_size = None
+            if stream is not None:
+                stream_size = self.get_stream_size(stream)
+            if stream_size:
+                self.progress_counter = ProgressCounter(
+                    stream_size, items_plural='bytes', verb_past='read'
+                )
+            else:
+                stream = None
+                self.progress_counter = ProgressCounter(
+                    total, items_plural='rows'
+                )
 
         for unicode_row in unicode_rows:
             self.rowcount += 1
@@ -707,7 +1200,10 @@ class CsvParseBase(Registrar):
             if limit and self.rowcount > limit:
                 break
             if self.DEBUG_PROGRESS:
-                self.progress_counter.maybe_print_update(self.rowcount)
+                if stream is not None:
+                    self.progress_counter.maybe_print_update(stream.tell())
+                else:
+                    self.progress_counter.maybe_print_update(self.rowcount)
                 # now = time()
                 # if now - last_print > 1:
                 #     last_print = now
@@ -852,7 +1348,8 @@ class CsvParseBase(Registrar):
         unicodecsvreader = unicodecsv.reader(
             byte_file_obj, dialect=csvdialect, encoding=encoding, strict=True)
         return self.analyse_rows(
-            unicodecsvreader, file_name=stream_name, limit=limit)
+            unicodecsvreader, file_name=stream_name, limit=limit,
+            stream=byte_file_obj)
 
     def analyse_file(self,
                      file_name,
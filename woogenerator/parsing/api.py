@@ -5,13 +5,15 @@ from __future__ import absolute_import, print_function
 
 import datetime
 import io
+import itertools
 from collections import OrderedDict
 from copy import deepcopy
 from pprint import pformat, pprint
 
 from ..coldata import (ColDataProductMeridian, ColDataSubAttachment,
                        ColDataWcProdCategory)
-from ..utils import DescriptorUtils, Registrar, SanitationUtils, SeqUtils
+from ..utils import (DescriptorUtils, JsonLinesCache, Registrar,
+                     SanitationUtils, SeqUtils)
 from .gen import ImportGenItem, ImportGenObject, ImportGenTaxo
 from .shop import (CsvParseShopMixin, ImportShopCategoryMixin,
                    ImportShopAttachmentMixin, ImportShopMixin, ImportShopProductMixin,
@@ -31,20 +33,29 @@ class ApiListMixin(object):
             return obj.isoformat()
         raise TypeError ("Type %s not serializable" % type(obj))
 
+    def iter_api_data(self):
+        for item in self.objects:
+            try:
+                yield dict(item['api_data'])
+            except KeyError:
+                raise UserWarning("could not get api_data from item")
+
     def export_api_data(self, file_path, encoding='utf-8'):
         """
-        Export the items in the object list to a json file in the given file path.
+        Export the items in the object list to a json file in the given file
+        path, or a JSON Lines file if the path ends with `.jsonl(.gz)`.
         """
 
         assert file_path, "needs a filepath"
         assert self.objects, "meeds items"
+        if JsonLinesCache.is_jsonl_path(file_path):
+            JsonLinesCache(file_path, truncate=True).write(
+                self.iter_api_data(), default=ApiListMixin.json_serial
+            )
+            self.register_message("WROTE FILE: %s" % file_path)
+            return
         with open(file_path, 'wb') as out_file:
-            data = []
-            for item in self.objects:
-                try:
-                    data.append(dict(item['api_data']))
-                except KeyError:
-                    raise UserWarning("could not get api_data from item")
+            data = list(self.iter_api_data())
             data = SanitationUtils.encode_json(data, default=ApiListMixin.json_serial)
             data = data.encode(encoding)
             print(data, file=out_file)
@@ -250,6 +261,7 @@ ImportWooApiImg.container = WooApiImgList
 class ApiParseMixin(object):
     root_container = ImportApiRoot
     coldata_gen_target = 'gen-api'
+    api_batch_size = 100
     attachment_container = ImportWooApiImg
     attachment_indexer = attachment_container.get_identifier
 
@@ -279,12 +291,13 @@ class ApiParseMixin(object):
         if self.DEBUG_PARSER:
             self.register_message("Byte sample: %s" % repr(byte_sample))
 
-        decoded = SanitationUtils.decode_json(byte_file_obj.read())
-        if not decoded:
+        if not SanitationUtils.starts_json_array(byte_file_obj):
+            self.register_warning(
+                "could not analyse %s, json is not an array" % stream_name
+            )
             return
-        if isinstance(decoded, list):
-            for decoded_obj in decoded[:limit]:
-                self.analyse_api_obj(decoded_obj)
+        decoded_objs = SanitationUtils.iter_decode_json_array(byte_file_obj)
+        self.analyse_api_objs(itertools.islice(decoded_objs, limit))
 
     def get_kwargs(self, all_data, **kwargs):
         if 'parent' not in kwargs:
@@ -294,21 +307,43 @@ class ApiParseMixin(object):
             kwargs['depth'] = kwargs['parent'].depth + 1
         return kwargs
 
-    def analyse_api_obj(self, api_data, **kwargs):
+    def translate_api_objs(self, api_datas, **kwargs):
         """
-        Analyse an object from the wp api. Assume api_data has not been convert to gen data
+        Translate a list of objects from the api to gen data in one batch.
         """
-
         coldata_class = kwargs.get('coldata_class', self.coldata_class)
         coldata_target = kwargs.get('coldata_target', self.coldata_target)
 
-        core_api_data = coldata_class.translate_data_from(
-            api_data, coldata_target
+        core_api_datas = coldata_class.translate_batch_from(
+            api_datas, coldata_target
         )
-        gen_api_data = coldata_class.translate_data_to(
-            core_api_data, self.coldata_gen_target
+        return coldata_class.translate_batch_to(
+            core_api_datas, self.coldata_gen_target
         )
 
+    def analyse_api_objs(self, api_datas):
+        """
+        Analyse objects from the api, translating them in batches of
+        `api_batch_size`.
+        """
+        api_datas = iter(api_datas)
+        while True:
+            batch = list(itertools.islice(api_datas, self.api_batch_size))
+            if not batch:
+                break
+            gen_api_datas = self.translate_api_objs(batch)
+            for api_data, gen_api_data in zip(batch, gen_api_datas):
+                self.analyse_api_obj(api_data, gen_api_data=gen_api_data)
+
+    def analyse_api_obj(self, api_data, **kwargs):
+        """
+        Analyse an object from the wp api. Assume api_data has not been convert
+        to gen data, unless it is given as `gen_api_data`.
+        """
+        gen_api_data = kwargs.pop('gen_api_data', None)
+        if gen_api_data is None:
+            gen_api_data = self.translate_api_objs([api_data], **kwargs)[0]
+
         row_data = deepcopy(gen_api_data)
         row_data['api_data'] = api_data
         if not 'type' in row_data:
@@ -546,7 +581,7 @@ class ApiParseWoo(
 
     def process_api_categories_raw(self, categories_api):
         """
-        Translate and process a list of api-formatted categories.
+        Translate and process an iterable of api-formatted categories.
         """
         categories_gen = [
             self.translate_category_api_gen(category_api_data) \
@@ -658,12 +693,12 @@ class ApiParseWoo(
                 self.register_error(exc)
         return container
 
-    def analyse_api_obj(self, api_data):
+    def analyse_api_obj(self, api_data, **kwargs):
         """
         Analyse an object from the api.
         """
 
-        object_data = ApiParseMixin.analyse_api_obj(self, api_data)
+        object_data = ApiParseMixin.analyse_api_obj(self, api_data, **kwargs)
 
         if 'category_objects' in object_data:
             for category in object_data['category_objects']:
@@ -708,12 +743,12 @@ class ApiParseWooLegacy(ApiParseWoo):
     meta_get_key = 'meta'
     meta_listed = False
 
-    def analyse_api_obj(self, api_data):
+    def analyse_api_obj(self, api_data, **kwargs):
         """
         Analyse an object from the api.
         """
 
-        object_data = ApiParseMixin.analyse_api_obj(self, api_data)
+        object_data = ApiParseMixin.analyse_api_obj(self, api_data, **kwargs)
 
         if 'categories' in api_data:
             for category in api_data['categories']:
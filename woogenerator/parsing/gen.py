@@ -286,6 +286,11 @@ class CsvParseGenTree(CsvParseTree, CsvParseGenMixin):
     object_container = CsvParseGenMixin.object_container
     taxo_container = CsvParseGenMixin.taxo_container
     item_container = CsvParseGenMixin.item_container
+    subtree_fingerprint_attrs = CsvParseTree.subtree_fingerprint_attrs + [
+        'schema', 'taxo_subs', 'item_subs'
+    ]
+    # the generator sets these to the modification time of the master file
+    subtree_volatile_defaults = ['modified_local', 'modified_gmt']
 
     def __init__(self, cols, defaults, schema, **kwargs):
         taxo_subs = kwargs.pop('taxo_subs', {})
@@ -575,6 +575,51 @@ class CsvParseShopMixin(object):
 
         self.categories_name = OrderedDict()
 
+    def merge_attachments(self, other):
+        """
+        Merge the attachments of `other`, sharing any attachment which is
+        already registered here, the way process_image would have found it.
+        """
+        for index, img_data in other.attachments.items():
+            found_data = self.attachments.get(index)
+            if found_data is None:
+                self.attachments[index] = img_data
+                continue
+            found_data.update(dict([
+                (key, img_data[key])
+                for key in [img_data.file_path_key, img_data.rowcount_key]
+                if key in img_data
+            ]))
+            found_data.process_meta()
+            for attachee in img_data.attaches:
+                for key, value in attachee.attachments.items():
+                    if value is img_data:
+                        attachee.attachments[key] = found_data
+                found_data.register_attachee(attachee)
+
+    def merge_transients(self, other):
+        self.merge_register(
+            self.products, other.products,
+            resolver=self.product_resolver, register_name='products'
+        )
+        self.merge_register(
+            self.categories, other.categories,
+            resolver=self.passive_resolver, register_name='categories'
+        )
+        self.merge_register(self.attributes, other.attributes, singular=False)
+        self.merge_register(
+            self.vattributes, other.vattributes, singular=False
+        )
+        self.merge_register(
+            self.variations, other.variations,
+            resolver=self.duplicate_obj_exc_resolver,
+            register_name='variations'
+        )
+        self.merge_attachments(other)
+        self.merge_register(
+            self.categories_name, other.categories_name, singular=False
+        )
+
     @property
     def images():
         raise DeprecationWarning('.images replaced with .attachments')
@@ -607,6 +652,9 @@ class CsvParseShopMixin(object):
             # resolver=self.attachment_resolver,
             register_name='attachments'
         )
+        self.index_registered(
+            'attachments', self.attachments, self.attachment_indexer(img_data)
+        )
         if object_data:
             object_data.register_attachment(img_data)
             if self.DEBUG_IMG:
@@ -656,6 +704,9 @@ class CsvParseShopMixin(object):
             singular=True,
             register_name='categories'
         )
+        self.index_registered(
+            'categories', self.categories, self.category_indexer(cat_data)
+        )
         self.register_anything(
             cat_data,
             self.categories_name,
@@ -3,11 +3,20 @@ Classes that add the concept of heirarchy to the CSVParse classes and correspond
 """
 from __future__ import absolute_import
 
+import gzip
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
 import weakref
 from collections import OrderedDict
 
-from ..utils import Registrar
-from .abstract import CsvParseBase, ImportObject, ObjList
+import dill
+
+from ..utils import Registrar, TimeUtils
+from .abstract import (CsvParseBase, ImportObject, ObjList,
+                       dumps_object_graph, loads_object_graph)
 
 
 class ImportTreeRootableMixin(object):
@@ -15,11 +24,23 @@ class ImportTreeRootableMixin(object):
 
 
 class ImportTreeObject(ImportObject):
-    """ Implements the tree interface for tree objects """
+    """
+    Implements the tree interface for tree objects
+
+    The ancestors of each object and the values of keys it inherits from them
+    are memoized. The memos of an object and its descendants are cleared when
+    its parent is reassigned, and the inherited values of a key are cleared
+    from its descendants when the key changes.
+    """
     is_root = None
     is_item = None
     is_taxo = None
     _depth = None
+    _parent = None
+    # memoized tuple of ancestors and inherited values of keys
+    _ancestors = None
+    _inherited = None
+    memo_attrs = ['_ancestors', '_inherited']
     verify_meta_keys = []
     child_indexer = Registrar.get_object_rowcount
 
@@ -81,16 +102,61 @@ class ImportTreeObject(ImportObject):
                 str(key), type(self)
             )
 
-    #
+    @property
+    def parent(self):
+        return self._parent
+
+    @parent.setter
+    def parent(self, parent):
+        self._parent = parent
+        self.clear_memos()
+
+    def clear_memos(self):
+        """ Clear the memos of self and its descendants. """
+        for attr in self.memo_attrs:
+            vars(self).pop(attr, None)
+        for child in getattr(self, 'child_register', {}).values():
+            child.clear_memos()
+
+    def clear_inherited(self, key):
+        """ Clear the inherited values of `key` from the descendants of self. """
+        for child in getattr(self, 'child_register', {}).values():
+            if child._inherited and key in child._inherited:
+                del child._inherited[key]
+                child.clear_inherited(key)
+
+    def __setitem__(self, key, value):
+        super(ImportTreeObject, self).__setitem__(key, value)
+        if self._inherited and key in self._inherited:
+            self.clear_inherited(key)
+
+    def __delitem__(self, key):
+        super(ImportTreeObject, self).__delitem__(key)
+        if self._inherited and key in self._inherited:
+            self.clear_inherited(key)
+
+    def __reduce__(self):
+        reconstructor, args, (copy_dict, items) = \
+            super(ImportTreeObject, self).__reduce__()
+        for attr in self.memo_attrs:
+            copy_dict.pop(attr, None)
+        return reconstructor, args, (copy_dict, items)
+
+    @property
+    def ancestor_tuple(self):
+        "memoized tuple of all ancestors not including self or root"
+        if self._ancestors is None:
+            parent = self.parent
+            if parent is None or parent.is_root:
+                self._ancestors = ()
+            else:
+                self._ancestors = parent.ancestor_tuple + (parent,)
+        return self._ancestors
+
     @property
     def ancestors(self):
         "gets all ancestors not including self or root"
-        this = self.parent
-        ancestors = []
-        while this and not this.is_root:
-            ancestors.insert(0, this)
-            this = this.parent
-        return ancestors
+        return list(self.ancestor_tuple)
 
     #
     def register_child(self, child_data):
@@ -133,14 +199,26 @@ class ImportTreeObject(ImportObject):
     def inheritence_ancestors(self):
         return self.ancestors
 
+    def get_inherited_value(self, key):
+        """ Get the value of `key` in the closest ancestor where it is set. """
+        if self._inherited is None:
+            self._inherited = {}
+        if key not in self._inherited:
+            value = None
+            parent = self.parent
+            if parent is not None and not parent.is_root:
+                # memoize all the way up so that a change to an ancestor's key
+                # can find the descendants to clear
+                value = parent.get_inherited_value(key)
+                value = parent.get(key) or value
+            self._inherited[key] = value
+        return self._inherited[key]
+
     def inherit_key(self, key):
         if not self.get(key):
-            inheritence = filter(None, map(
-                lambda x: x.get(key),
-                self.inheritence_ancestors
-            ))
-            if inheritence:
-                self[key] = inheritence[-1]
+            value = self.get_inherited_value(key)
+            if value:
+                self[key] = value
 
     @property
     def depth(self):
@@ -158,15 +236,13 @@ class ImportTreeObject(ImportObject):
 
     @property
     def taxo_ancestors(self):
-        return filter(lambda x: x.is_taxo, self.ancestors)
+        return [ancestor for ancestor in self.ancestor_tuple if ancestor.is_taxo]
 
     def get_ancestor_key(self, key):
-        # ancestors = self.getAncestors()
-        return [ancestor.get(key) for ancestor in self.ancestors]
+        return [ancestor.get(key) for ancestor in self.ancestor_tuple]
 
     def get_ancestor_self_key(self, key):
-        # ancestors = self.getAncestors()
-        return [ancestor.get(key) for ancestor in [self] + self.ancestors]
+        return [self.get(key)] + self.get_ancestor_key(key)
 
     def get_first_filtd_anc_self_key(self, key):
         ancestor_values = self.get_ancestor_self_key(key)
@@ -200,7 +276,7 @@ class ImportTreeItem(ImportTreeObject):
 
     @property
     def item_ancestors(self):
-        return filter(lambda x: x.is_item, self.ancestors)
+        return [ancestor for ancestor in self.ancestor_tuple if ancestor.is_item]
 
 
 class ImportTreeTaxo(ImportTreeObject):
@@ -321,6 +397,7 @@ class CsvParseTreeMixin(object):
             # resolver = self.passive_resolver,
             register_name='taxos',
         )
+        self.index_registered('taxos', self.taxos, self.taxo_indexer(taxo_data))
 
     def register_object(self, object_data):
         assert isinstance(object_data, ImportTreeObject)
@@ -351,10 +428,146 @@ class CsvParseTreeMixin(object):
             kwargs['parent'] = self.root_data
         return CsvParseBase.get_empty_instance(self, **kwargs)
 
+    def merge_transients(self, other):
+        self.merge_register(self.items, other.items, register_name='items')
+        self.merge_register(self.taxos, other.taxos, register_name='taxos')
+        for child in other.root_data.children:
+            child.parent = self.root_data
+        self.merge_register(
+            self.root_data.child_register,
+            other.root_data.child_register,
+            register_name='parent'
+        )
+        self.stack = other.stack
+
+
+def analyse_tree_chunk(job):
+    """
+    Analyse a chunk of whole depth 0 subtrees, usually in a worker process.
+
+    Arguments:
+    ----
+        job (tuple):
+            The pickled parser which has analysed the header, the rowcount
+            before the first row of the chunk, the rows of the chunk and the
+            name used to differentiate these rows in debugging.
+
+    Returns:
+    ----
+        The pickled transients of the parser, the errors and warnings
+        registered while analysing the chunk and the volatile defaults of the
+        parser.
+    """
+    parser_state, rowcount, unicode_rows, file_name = job
+    errors, warnings = Registrar.errors, Registrar.warnings
+    Registrar.errors = OrderedDict()
+    Registrar.warnings = OrderedDict()
+    try:
+        parser = dill.loads(parser_state)
+        parser.rowcount = rowcount
+        CsvParseBase.analyse_rows(parser, unicode_rows, file_name=file_name)
+        volatile_defaults = dict(
+            (key, parser.defaults.get(key))
+            for key in parser.subtree_volatile_defaults
+        )
+        return dumps_object_graph((
+            parser.get_transients(), Registrar.errors, Registrar.warnings,
+            volatile_defaults
+        ))
+    finally:
+        Registrar.errors, Registrar.warnings = errors, warnings
+
+
+class SubtreeCache(Registrar):
+    """
+    Store the analysed chunks of a tree file so that they can be reused by
+    the next run if their rows have not changed.
+
+    Each chunk is stored as the gzipped result of `analyse_tree_chunk` in the
+    cache directory, keyed on the hash of the chunk, and listed with the format
+    version in a JSON manifest. Chunks which are not used by a run are removed
+    when the manifest is saved.
+    """
+    version = 2
+    manifest_name = 'subtrees.json'
+    compresslevel = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.manifest = {
+            'version': self.version,
+            'subtrees': {}
+        }
+        self.used = set()
+        self.hits = 0
+        self.misses = 0
+        if os.path.isfile(self.manifest_path):
+            with open(self.manifest_path) as manifest_file:
+                manifest = json.load(manifest_file)
+            # chunks from another version are reanalysed and replaced
+            if manifest.get('version') == self.version:
+                self.manifest = manifest
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.path, self.manifest_name)
+
+    def get_subtree_path(self, key):
+        return os.path.join(self.path, '%s.pickle.gz' % key)
+
+    def load(self, key):
+        """ Return the stored result of the chunk with `key` if it exists. """
+        subtree_path = self.get_subtree_path(key)
+        if key not in self.manifest['subtrees'] \
+                or not os.path.isfile(subtree_path):
+            self.misses += 1
+            return None
+        with gzip.open(subtree_path, 'rb') as subtree_file:
+            result = subtree_file.read()
+        self.hits += 1
+        self.used.add(key)
+        return result
+
+    def save(self, key, result, row_count=None):
+        """ Store the result of the chunk with `key`. """
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        subtree_path = self.get_subtree_path(key)
+        with gzip.open(subtree_path, 'wb', self.compresslevel) as subtree_file:
+            subtree_file.write(result)
+        self.used.add(key)
+        self.manifest['subtrees'][key] = {
+            'file': os.path.basename(subtree_path),
+            'rows': row_count,
+            'saved': TimeUtils.get_ms_timestamp(),
+        }
+
+    def save_manifest(self):
+        """ Save the manifest, removing chunks which were not used. """
+        for key in self.manifest['subtrees'].keys():
+            if key in self.used:
+                continue
+            subtree_path = self.get_subtree_path(key)
+            if os.path.isfile(subtree_path):
+                os.remove(subtree_path)
+            del self.manifest['subtrees'][key]
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        with open(self.manifest_path, 'w') as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=2)
+
+
 class CsvParseTree(CsvParseBase, CsvParseTreeMixin):
     object_container = CsvParseTreeMixin.object_container
     item_indexer = CsvParseBase.get_object_rowcount
     taxo_indexer = CsvParseBase.get_object_rowcount
+    # attributes which change how rows are analysed, invalidating the cache
+    subtree_fingerprint_attrs = [
+        'indices', 'defaults', 'taxo_depth', 'item_depth', 'meta_width'
+    ]
+    # defaults which change between runs without changing how rows are
+    # analysed, updated on objects loaded from the cache
+    subtree_volatile_defaults = []
 
     def __init__(self, cols, defaults, taxo_depth,
                  item_depth, meta_width=0, **kwargs):
@@ -362,6 +575,10 @@ class CsvParseTree(CsvParseBase, CsvParseTreeMixin):
         self.item_depth = item_depth
         # self.max_depth  = taxo_depth + item_depth
         self.meta_width = meta_width
+        self.workers = kwargs.pop('workers', None)
+        self.subtree_cache = kwargs.pop('subtree_cache', None)
+        self.subtree_cache_hits = 0
+        self.subtree_cache_misses = 0
         for base_class in [CsvParseBase]:
             if hasattr(base_class, '__init__'):
                 base_class.__init__(self, cols, defaults, **kwargs)
@@ -381,10 +598,243 @@ class CsvParseTree(CsvParseBase, CsvParseTreeMixin):
             if hasattr(base_class, 'clear_transients'):
                 base_class.register_object(self, object_data)
 
+    def merge_transients(self, other):
+        for base_class in CsvParseTree.__bases__:
+            if hasattr(base_class, 'merge_transients'):
+                base_class.merge_transients(self, other)
+
+    def get_tree_subtrees(self, unicode_rows):
+        """
+        Analyse the header and split the remaining rows into depth 0 subtrees.
+
+        The ancestor context of a depth 0 row is only the root, so each subtree
+        can be analysed independently of the rows before it.
+
+        Returns:
+        ----
+            A list of (rowcount, rows) tuples where rowcount is the rowcount
+            before the first row of the subtree.
+        """
+        subtrees = []
+        for unicode_row in unicode_rows:
+            self.rowcount += 1
+            if not self.indices:
+                if any(unicode_row):
+                    self.analyse_header(unicode_row)
+                continue
+            if not subtrees or (
+                    any(unicode_row) and self.depth(unicode_row) == 0):
+                subtrees.append((self.rowcount - 1, []))
+            subtrees[-1][1].append(unicode_row)
+        return subtrees
+
+    @classmethod
+    def group_subtrees(cls, subtrees, chunk_count):
+        """
+        Group contiguous subtrees into about `chunk_count` chunks with a similar
+        number of rows.
+        """
+        row_total = sum(len(rows) for _, rows in subtrees)
+        chunks = []
+        for rowcount, rows in subtrees:
+            if not chunks or \
+                    len(chunks[-1][1]) * chunk_count >= row_total:
+                chunks.append((rowcount, []))
+            chunks[-1][1].extend(rows)
+        return chunks
+
+    def get_merkle_hash(self, unicode_rows):
+        """
+        Hash rows so that the hash of each row covers the hashes of the rows
+        of its descendants, and return the hash of all the rows.
+
+        Rows without a depth are hashed as leaves of the row above them.
+        """
+        # each node is [depth, row hash, child hashes], under a virtual root
+        stack = [[-1, '', []]]
+
+        def pop_node():
+            _, row_hash, child_hashes = stack.pop()
+            node_hash = hashlib.sha1(
+                row_hash + ''.join(child_hashes)
+            ).hexdigest()
+            if stack:
+                stack[-1][2].append(node_hash)
+            return node_hash
+
+        for unicode_row in unicode_rows:
+            this_depth = self.depth(unicode_row)
+            if this_depth < 0:
+                this_depth = self.max_depth
+            while stack[-1][0] >= this_depth:
+                pop_node()
+            stack.append([
+                this_depth, hashlib.sha1(repr(unicode_row)).hexdigest(), []
+            ])
+        while len(stack) > 1:
+            pop_node()
+        return pop_node()
+
+    def get_subtree_fingerprint(self):
+        """
+        Hash everything other than the rows of a chunk that changes how it is
+        analysed.
+        """
+        fingerprint = [SubtreeCache.version, type(self).__name__]
+        for attr in self.subtree_fingerprint_attrs:
+            value = getattr(self, attr, None)
+            if attr == 'defaults':
+                value = [
+                    (key, default) for key, default in value.items()
+                    if key not in self.subtree_volatile_defaults
+                ]
+            fingerprint.append((attr, value))
+        return hashlib.sha1(repr(fingerprint)).hexdigest()
+
+    def get_subtree_key(self, fingerprint, rowcount, unicode_rows):
+        """
+        Hash a chunk of rows with the fingerprint of the parser and the
+        rowcount before the chunk, since objects are indexed by rowcount.
+        Inserting or removing rows changes the key of every chunk after them.
+        """
+        return hashlib.sha1('%s|%d|%s' % (
+            fingerprint, rowcount, self.get_merkle_hash(unicode_rows)
+        )).hexdigest()
+
+    def refresh_volatile_defaults(self, other, volatile_defaults):
+        """
+        Update values of objects in `other` which were set from volatile
+        defaults that have since changed.
+        """
+        changed = dict(
+            (key, value) for key, value in volatile_defaults.items()
+            if self.defaults.get(key) != value
+        )
+        if not changed:
+            return
+        nodes = list(other.root_data.children)
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(node.children)
+            for key, value in changed.items():
+                if key in node and node[key] == value:
+                    node[key] = self.defaults.get(key)
+
+    def merge_chunk(self, result):
+        """ Merge the result of `analyse_tree_chunk` into this parser. """
+        transients, errors, warnings, volatile_defaults = \
+            loads_object_graph(result)
+        parser = object.__new__(type(self))
+        parser.__dict__.update(transients)
+        self.refresh_volatile_defaults(parser, volatile_defaults)
+        self.merge_transients(parser)
+        self.merge_register(Registrar.errors, errors, singular=False)
+        self.merge_register(Registrar.warnings, warnings, singular=False)
+
+    def analyse_rows_parallel(self, unicode_rows, file_name="rows",
+                              workers=None):
+        """
+        Analyse rows by splitting them into chunks of depth 0 subtrees which
+        are analysed separately, then merging the registers of the chunks in
+        order, as if the rows had been analysed here.
+
+        Chunks are analysed in worker processes if there is more than one
+        worker. If there is a subtree cache, each depth 0 subtree is its own
+        chunk, and chunks which are unchanged since the last run are loaded
+        from the cache instead of being analysed. With one worker and no
+        subtree cache the rows are analysed in this process without
+        splitting or pickling them.
+        """
+        if workers is None:
+            workers = self.workers or multiprocessing.cpu_count()
+        if workers <= 1 and not self.subtree_cache:
+            return super(CsvParseTree, self).analyse_rows(
+                unicode_rows, file_name=file_name
+            )
+        subtrees = self.get_tree_subtrees(unicode_rows)
+        cache = None
+        if self.subtree_cache:
+            cache = SubtreeCache(self.subtree_cache)
+            fingerprint = self.get_subtree_fingerprint()
+            chunks = subtrees
+        else:
+            chunks = self.group_subtrees(subtrees, workers)
+
+        keys = []
+        results = []
+        for chunk_rowcount, rows in chunks:
+            key = None
+            result = None
+            if cache:
+                key = self.get_subtree_key(fingerprint, chunk_rowcount, rows)
+                result = cache.load(key)
+            keys.append(key)
+            results.append(result)
+
+        jobs = []
+        if None in results:
+            parser_state = dill.dumps(self, dill.HIGHEST_PROTOCOL)
+            jobs = [
+                (parser_state, chunk_rowcount, rows, file_name)
+                for (chunk_rowcount, rows), result in zip(chunks, results)
+                if result is None
+            ]
+        if self.DEBUG_PARSER:
+            self.register_message(
+                "analysing %d of %d chunks with %d workers" % (
+                    len(jobs), len(chunks), workers
+                )
+            )
+
+        pool = None
+        if workers > 1 and len(jobs) > 1:
+            pool = multiprocessing.Pool(min(workers, len(jobs)))
+            analysed = pool.imap(analyse_tree_chunk, jobs)
+        else:
+            analysed = itertools.imap(analyse_tree_chunk, jobs)
+        try:
+            for (_, rows), key, result in zip(chunks, keys, results):
+                if result is None:
+                    result = next(analysed)
+                    if cache:
+                        cache.save(key, result, len(rows))
+                self.merge_chunk(result)
+        finally:
+            if pool:
+                pool.terminate()
+                pool.join()
+
+        if cache:
+            cache.save_manifest()
+            self.subtree_cache_hits += cache.hits
+            self.subtree_cache_misses += cache.misses
+            self.register_progress(
+                "subtree cache: %d reused (hits), %d analysed (misses)" % (
+                    cache.hits, cache.misses
+                )
+            )
+
+        return self.objects
+
+    def analyse_rows(self, unicode_rows, file_name="rows", limit=None,
+                     stream=None):
+        """
+        Analyse rows by depth 0 subtree if there is a subtree cache or more
+        than one worker, otherwise analyse them in this process.
+        """
+        if (self.subtree_cache or (self.workers and self.workers > 1)) \
+                and not limit and not self.objects:
+            return self.analyse_rows_parallel(
+                unicode_rows, file_name, self.workers or 1
+            )
+        return super(CsvParseTree, self).analyse_rows(
+            unicode_rows, file_name=file_name, limit=limit, stream=stream
+        )
+
     def depth(self, row):
-        sanitized_row = [self.sanitize_cell(cell) for cell in row]
-        for i, sanitized_cell in enumerate(sanitized_row):
-            if sanitized_cell:
+        # only sanitize the cells up to the first non-empty cell
+        for i, cell in enumerate(row):
+            if self.sanitize_cell(cell):
                 return i
             if i >= self.max_depth:
                 break
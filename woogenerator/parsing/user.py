@@ -11,7 +11,7 @@ from ..contact_objects import (ContactAddress, ContactName, ContactPhones,
                                RoleGroup, SocialMediaFields)
 from ..utils import DescriptorUtils, Registrar, SanitationUtils, SeqUtils
 from ..utils.clock import TimeUtils
-from .abstract import CsvParseBase, ImportObject, ObjList
+from .abstract import CompactRecord, CsvParseBase, ImportObject, ObjList
 
 
 class UsrObjList(ObjList):
@@ -416,6 +416,11 @@ class ImportUser(ImportObject):
         )
 
 
+class ImportUserCompact(ImportUser, CompactRecord):
+    """ An `ImportUser` which is stored as a `CompactRecord`. """
+    record_class = CompactRecord
+
+
 class CsvParseUser(CsvParseBase):
 
     object_container = ImportUser
@@ -427,7 +432,8 @@ class CsvParseUser(CsvParseBase):
                  filter_items=None,
                  limit=None,
                  source=None,
-                 schema=None):
+                 schema=None,
+                 compact_records=False):
         if self.DEBUG_MRO:
             self.register_message(' ')
         self.schema = schema
@@ -446,6 +452,8 @@ class CsvParseUser(CsvParseBase):
             cols, defaults, limit=limit, source=source)
         self.contact_schema = contact_schema
         self.filter_items = filter_items
+        if compact_records:
+            self.object_container = ImportUserCompact
 
     def clear_transients(self):
         if self.DEBUG_MRO:
@@ -771,6 +779,10 @@ class ApiParseUser(CsvParseUser):
                 "parser_data: {}".format(pformat(parser_data)))
         return parser_data
 
+    def analyse_api_objs(self, api_datas):
+        for api_data in api_datas:
+            self.analyse_api_obj(api_data)
+
     def analyse_api_obj(self, api_data):
         kwargs = {'api_data': api_data}
         object_data = self.new_object(rowcount=self.rowcount, **kwargs)
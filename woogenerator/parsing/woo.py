@@ -199,6 +199,17 @@ class ImportWooProduct(ImportWooItem, ImportShopProductMixin):
             self.categories.values() + super(ImportWooProduct, self).inheritence_ancestors
         )
 
+    def inherit_key(self, key):
+        # categories are inherited from as well as ancestors, so the values
+        # memoized on the tree do not apply
+        if not self.get(key):
+            inheritence = filter(None, map(
+                lambda x: x.get(key),
+                self.inheritence_ancestors
+            ))
+            if inheritence:
+                self[key] = inheritence[-1]
+
     def get_extra_special_category_components(self, specials_name):
         components = {}
         ancestors_self = self.taxo_ancestors + [self]
@@ -419,11 +430,19 @@ class CsvParseWooMixin(object):
 
     def find_category(self, search_data):
         registry = self.taxos
-        return self.find_object(search_data, registry, self.cat_search_keys)
+        search_keys = self.cat_search_keys
+        return self.find_object(
+            search_data, registry, search_keys,
+            self.get_search_index('taxos', registry, search_keys)
+        )
 
     def find_image(self, search_data):
         registry = self.attachments
-        return self.find_object(search_data, registry, self.img_search_keys)
+        search_keys = self.img_search_keys
+        return self.find_object(
+            search_data, registry, search_keys,
+            self.get_search_index('attachments', registry, search_keys)
+        )
 
     @classmethod
     def get_title(cls, object_data):
@@ -565,6 +584,9 @@ class CsvParseWoo(CsvParseGenTree, CsvParseShopMixin, CsvParseWooMixin):
     specials_category_name = None
     # Whether to add products into special categories if they are on special
     add_special_categories = False
+    subtree_fingerprint_attrs = CsvParseGenTree.subtree_fingerprint_attrs + [
+        'do_images', 'do_specials', 'specials_category_name'
+    ]
 
     @property
     def containers(self):
@@ -673,6 +695,21 @@ class CsvParseWoo(CsvParseGenTree, CsvParseShopMixin, CsvParseWooMixin):
         self.onspecial_products = OrderedDict()
         self.onspecial_variations = OrderedDict()
 
+    def merge_transients(self, other):
+        for base_class in CsvParseWoo.__bases__:
+            if hasattr(base_class, 'merge_transients'):
+                base_class.merge_transients(self, other)
+        self.merge_register(
+            self.special_items, other.special_items, singular=False
+        )
+        for register_name in [
+                'updated_products', 'updated_variations',
+                'onspecial_products', 'onspecial_variations']:
+            self.merge_register(
+                getattr(self, register_name), getattr(other, register_name),
+                register_name=register_name
+            )
+
     def register_object(self, object_data):
         for base_class in CsvParseWoo.__bases__:
             if hasattr(base_class, 'register_object'):
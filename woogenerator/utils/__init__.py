@@ -13,7 +13,9 @@ sys.path.insert(0, PACKAGE_LOCATION)
 
 from .core import (SanitationUtils, DescriptorUtils, SeqUtils, DebugUtils,
                    Registrar, ValidationUtils, PHPUtils, ProgressCounter,
-                   UnicodeCsvDialectUtils, FileUtils, JSONPathUtils, MimeUtils)
+                   UnicodeCsvDialectUtils, FileUtils, JSONPathUtils, MimeUtils,
+                   VectorUtils)
+from .jsonl import JsonLinesCache
 from .contact import NameUtils, AddressUtils
-from .clock import TimeUtils
+from .clock import StageTimer, TimeUtils
 from .inheritence import InheritenceUtils, overrides
@@ -5,17 +5,28 @@ from __future__ import absolute_import
 
 import calendar
 import datetime
+import functools
+import json
+import sys
 import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from copy import deepcopy
 from numbers import Number
 
 import pytz
 import tzlocal
 from pytz import timezone
+from tabulate import tabulate
 from tzlocal import get_localzone
 
 from .core import SanitationUtils
 
+try:
+    import resource
+except ImportError:
+    resource = None
+
 
 class TimeUtils(object):
     """
@@ -523,3 +534,148 @@ class TimeUtils(object):
         if not time_struct:
             time_struct = cls.current_loctstruct()
         return time.strftime(cls.wp_datetime_format, time_struct)
+
+
+class StageTimer(object):
+    """
+    Record the wall time, CPU time, RSS growth and item counts of the stages
+    of a run.
+
+    Stages started while another stage is running are recorded as sub-stages
+    of that stage. A stage which runs more than once accumulates its times,
+    RSS growth and item counts. The RSS growth of a stage is how much the
+    process's peak RSS rose while it ran, the process's peak RSS itself is
+    recorded as process_peak_rss. Call reset at the start of each run.
+    """
+    stages = OrderedDict()
+    _stack = []
+
+    # ru_maxrss is in bytes on OSX and kilobytes elsewhere
+    rss_scale = 1 if sys.platform == 'darwin' else 1024
+
+    @classmethod
+    def reset(cls):
+        cls.stages = OrderedDict()
+        cls._stack = []
+
+    @classmethod
+    def get_cpu_time(cls):
+        """ Get the user + system CPU time of this process in seconds. """
+        if resource is None:
+            return time.clock()
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_utime + usage.ru_stime
+
+    @classmethod
+    def get_peak_rss(cls):
+        """ Get the peak resident set size of this process in bytes. """
+        if resource is None:
+            return
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_maxrss * cls.rss_scale
+
+    @classmethod
+    @contextmanager
+    def stage(cls, name, items=None):
+        """
+        Record the stage `name` for the duration of the context, yielding its
+        record so that items can be counted.
+        """
+        path = '/'.join(cls._stack + [name])
+        if path not in cls.stages:
+            cls.stages[path] = OrderedDict([
+                ('stage', path),
+                ('depth', len(cls._stack)),
+                ('calls', 0),
+                ('wall_time', 0.0),
+                ('cpu_time', 0.0),
+                ('rss_growth', None),
+                ('process_peak_rss', None),
+                ('items', None),
+            ])
+        record = cls.stages[path]
+        record['calls'] += 1
+        if items is not None:
+            cls.add_items(items, record)
+        cls._stack.append(name)
+        start_wall, start_cpu = time.time(), cls.get_cpu_time()
+        start_rss = cls.get_peak_rss()
+        try:
+            yield record
+        finally:
+            cls._stack.pop()
+            record['wall_time'] += time.time() - start_wall
+            record['cpu_time'] += cls.get_cpu_time() - start_cpu
+            peak_rss = cls.get_peak_rss()
+            if peak_rss is not None:
+                record['rss_growth'] = \
+                    (record['rss_growth'] or 0) + peak_rss - start_rss
+                record['process_peak_rss'] = peak_rss
+
+    @classmethod
+    def timed(cls, name=None, items=None):
+        """
+        Decorate a function so that each call is recorded as a stage.
+
+        Args:
+            name (str): the name of the stage, defaults to the function name.
+            items (callable): gets the item count from the function's return
+                value.
+        """
+        def decorator(function):
+            stage_name = name or function.__name__
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with cls.stage(stage_name) as record:
+                    response = function(*args, **kwargs)
+                    if items is not None:
+                        cls.add_items(items(response), record)
+                    return response
+            return wrapper
+        return decorator
+
+    @classmethod
+    def add_items(cls, count, record=None):
+        """ Count items processed by `record`, or the current stage. """
+        if record is None:
+            if not cls._stack:
+                return
+            record = cls.stages['/'.join(cls._stack)]
+        record['items'] = (record['items'] or 0) + count
+
+    @classmethod
+    def get_summary_rows(cls):
+        for record in cls.stages.values():
+            rss_growth, peak_rss = [
+                None if size is None else '%.1f' % (size / 1048576.0)
+                for size in (record['rss_growth'], record['process_peak_rss'])
+            ]
+            yield [
+                record['stage'],
+                record['calls'],
+                '%.3f' % record['wall_time'],
+                '%.3f' % record['cpu_time'],
+                rss_growth,
+                peak_rss,
+                record['items'],
+            ]
+
+    @classmethod
+    def get_summary_text(cls, tablefmt=None):
+        return tabulate(
+            list(cls.get_summary_rows()),
+            headers=[
+                'stage', 'calls', 'wall (s)', 'cpu (s)', 'rss growth (MB)',
+                'process peak rss (MB)', 'items'
+            ],
+            tablefmt=tablefmt or 'simple'
+        )
+
+    @classmethod
+    def write_json(cls, path):
+        """ Write the stage records to `path` as JSON. """
+        with open(path, 'w') as stages_file:
+            json.dump(
+                {'stages': cls.stages.values()}, stages_file, indent=2
+            )
@@ -4,6 +4,7 @@ from __future__ import absolute_import
 import base64
 import cgi
 import functools
+import hashlib
 import inspect
 import itertools
 import json
@@ -26,6 +27,11 @@ from kitchen.text import converters
 
 from jsonpath_ng import jsonpath
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 DEFAULT_ENCODING = 'utf8'
 
 
@@ -610,42 +616,53 @@ class SanitationUtils(object):
         else:
             return None
 
+    # sanitizer chains, composed the first time they are used
+    composed_sanitizers = {}
+
     @classmethod
     def sanitize_cell(cls, cell):
-        return cls.compose(
-            cls.remove_leading_dollar_wspace,
-            cls.remove_leading_percent_wspace,
-            cls.remove_lone_dashes,
-            # cls.strip_extra_whitespace,
-            # cls.strip_all_whitespace,
-            cls.remove_thousands_separator,
-            cls.remove_lone_white_space,
-            cls.strip_leading_whitespace,
-            cls.strip_tailing_whitespace,
-            cls.sanitize_newlines,
-            cls.strip_tailing_newline,
-            cls.strip_leading_newline,
-            cls.remove_null,
-            cls.coerce_unicode,
-        )(cell)
+        sanitizer = cls.composed_sanitizers.get('cell')
+        if sanitizer is None:
+            sanitizer = cls.compose(
+                cls.remove_leading_dollar_wspace,
+                cls.remove_leading_percent_wspace,
+                cls.remove_lone_dashes,
+                # cls.strip_extra_whitespace,
+                # cls.strip_all_whitespace,
+                cls.remove_thousands_separator,
+                cls.remove_lone_white_space,
+                cls.strip_leading_whitespace,
+                cls.strip_tailing_whitespace,
+                cls.sanitize_newlines,
+                cls.strip_tailing_newline,
+                cls.strip_leading_newline,
+                cls.remove_null,
+                cls.coerce_unicode,
+            )
+            cls.composed_sanitizers['cell'] = sanitizer
+        return sanitizer(cell)
 
     @classmethod
     def sanitize_special_cell(cls, cell):
-        return cls.compose(
-            # cls.remove_leading_dollar_wspace,
-            # cls.remove_leading_percent_wspace,
-            # cls.remove_lone_dashes,
-            # cls.strip_extra_whitespace,
-            cls.remove_thousands_separator,
-            cls.remove_lone_white_space,
-            cls.strip_leading_whitespace,
-            cls.strip_tailing_whitespace,
-            cls.sanitize_newlines,
-            cls.strip_tailing_newline,
-            cls.strip_leading_newline,
-            cls.remove_null,
-            cls.coerce_unicode
-        )(cell)
+        sanitizer = cls.composed_sanitizers.get('special_cell')
+        if sanitizer is None:
+            sanitizer = cls.compose(
+                # cls.remove_leading_dollar_wspace,
+                # cls.remove_leading_percent_wspace,
+                # cls.remove_lone_dashes,
+                # cls.strip_extra_whitespace,
+                cls.remove_thousands_separator,
+                cls.remove_lone_white_space,
+                cls.strip_leading_whitespace,
+                cls.strip_tailing_whitespace,
+                cls.sanitize_newlines,
+                cls.strip_tailing_newline,
+                cls.strip_leading_newline,
+                cls.remove_null,
+                cls.coerce_unicode
+            )
+            cls.composed_sanitizers['special_cell'] = sanitizer
+        return sanitizer(cell)
 
     @classmethod
     def sanitize_class(cls, string):
@@ -947,6 +964,84 @@ class SanitationUtils(object):
         attrs = json.loads(json_str, **kwargs)
         return attrs
 
+    @classmethod
+    def starts_json_array(cls, file_obj, sample_size=1000):
+        """
+        Peek at the start of the seekable `file_obj` and check whether it
+        holds a JSON array.
+        """
+        position = file_obj.tell()
+        sample = file_obj.read(sample_size)
+        file_obj.seek(position)
+        return sample.lstrip()[:1] == b'['
+
+    @classmethod
+    def iter_decode_json_array(cls, file_obj, chunk_size=65536, **kwargs):
+        """
+        Yield the items of the JSON array in `file_obj` as they are decoded.
+
+        The file is read `chunk_size` bytes at a time and only the unread part
+        of the buffer is kept, so at most one item is held in memory, and
+        closing the generator early stops reading the file. Raise ValueError
+        if the file does not hold a JSON array, use starts_json_array to check
+        beforehand.
+        """
+        decoder = json.JSONDecoder(**kwargs)
+        stream_name = getattr(file_obj, 'name', 'stream')
+        state = {'buf': b'', 'pos': 0, 'eof': False}
+
+        def read_more():
+            """ Drop the consumed part of the buffer and read another chunk. """
+            buf = state['buf'][state['pos']:]
+            # grow the read with the buffer so that large items stay linear
+            chunk = file_obj.read(max(chunk_size, len(buf)))
+            if not chunk:
+                state['eof'] = True
+            state['buf'], state['pos'] = buf + chunk, 0
+
+        def next_char():
+            """ Skip whitespace and return the next character, if any. """
+            while True:
+                buf, pos = state['buf'], state['pos']
+                while pos < len(buf) and buf[pos] in b' \t\n\r':
+                    pos += 1
+                state['pos'] = pos
+                if pos < len(buf) or state['eof']:
+                    return buf[pos:pos + 1]
+                read_more()
+
+        def expect(chars):
+            char = next_char()
+            if not char or char not in chars:
+                raise ValueError("expected one of %r at character %d of %s, "
+                                 "found %r" % (chars, state['pos'],
+                                               stream_name, char))
+            state['pos'] += 1
+            return char
+
+        expect(b'[')
+        if next_char() == b']':
+            return
+        while True:
+            next_char()
+            while True:
+                try:
+                    item, end = decoder.raw_decode(state['buf'], state['pos'])
+                except ValueError:
+                    # the item may just be incomplete until the file is read
+                    if state['eof']:
+                        raise
+                else:
+                    # a number can be cut short by the end of the buffer
+                    tail = state['buf'][end:end + 1]
+                    if state['eof'] or (tail and tail not in b'.eE+-0123456789'):
+                        break
+                read_more()
+            state['pos'] = end
+            yield item
+            if expect(b',]') == b']':
+                return
+
     @classmethod
     def encode_json(cls, obj, **kwargs):
         assert isinstance(obj, (dict, list))
@@ -1130,6 +1225,106 @@ class SeqUtils(object):
             return True
         return all(first == rest for rest in iterator)
 
+class VectorUtils(object):
+    """
+    Utilities for applying the normalizers of float and currency values to
+    whole columns of values with numpy.
+
+    Each column function returns the same list as mapping its scalar function
+    over the values, or None if it can't guarantee that for these values, in
+    which case the scalar function should be used instead. Without numpy there
+    are no column functions.
+    """
+    min_length = 8
+    string_types = frozenset([str, unicode])
+    number_types = frozenset([str, unicode, int, float, bool])
+
+    @classmethod
+    def get_column_function(cls, function):
+        """
+        Return the column function equivalent to the scalar `function` if
+        there is one.
+        """
+        if numpy is None:
+            return None
+        return {
+            float: cls.float_column,
+            SanitationUtils.similar_currency_comparison: cls.currency_column,
+        }.get(function)
+
+    @classmethod
+    def map_column(cls, function, values, skip_exceptions=(TypeError, )):
+        """
+        Return `function` applied to each of `values`, in one go if it has a
+        column function. Values which `function` raises one of
+        `skip_exceptions` for are replaced by the exception.
+        """
+        if len(values) >= cls.min_length:
+            column_function = cls.get_column_function(function)
+            if column_function is not None:
+                try:
+                    response = column_function(values)
+                except Exception:
+                    response = None
+                if response is not None:
+                    return response
+        response = []
+        for value in values:
+            try:
+                response.append(function(value))
+            except skip_exceptions as exc:
+                response.append(exc)
+        return response
+
+    @classmethod
+    def has_types(cls, values, types):
+        return set(map(type, values)) <= types
+
+    @classmethod
+    def float_column(cls, values):
+        if not cls.has_types(values, cls.number_types):
+            return
+        return numpy.array(values, dtype=object).astype(numpy.float64).tolist()
+
+    @classmethod
+    def currency_column(cls, values):
+        """
+        Round prices like `SanitationUtils.similar_currency_comparison`.
+        Prices which are not plain numbers, or which are too close to a half
+        cent to be sure that they round the same way, are left to the scalar
+        function.
+        """
+        if not cls.has_types(values, cls.string_types):
+            return
+        strings = numpy.array(values, dtype=numpy.unicode_)
+        empty = strings == u''
+        plain = ~empty & (numpy.char.find(strings, u'$') < 0)
+        prices = numpy.zeros(len(values))
+        prices[plain] = strings[plain].astype(numpy.float64)
+        precision = SanitationUtils.currency_precision
+        scaled = prices * 10 ** precision
+        with numpy.errstate(invalid='ignore'):
+            exact = plain & numpy.isfinite(scaled) \
+                & (numpy.abs(scaled) < 2 ** 50) \
+                & (numpy.abs(scaled - numpy.floor(scaled) - 0.5) > 1e-6)
+        formatted = numpy.char.mod(
+            '%.' + str(precision) + 'f', numpy.round(prices, precision)
+        ).tolist()
+        response = []
+        for value, is_empty, is_exact, price in zip(
+            values, empty.tolist(), exact.tolist(), formatted
+        ):
+            if is_empty:
+                response.append(SanitationUtils.coerce_unicode(''))
+            elif is_exact:
+                response.append(price)
+            else:
+                response.append(
+                    SanitationUtils.similar_currency_comparison(value)
+                )
+        return response
+
+
 class JSONPathUtils(object):
     class NonSingularPathError(UserWarning):
         pass
@@ -1929,9 +2124,15 @@ class ProgressCounter(object):
             percentage = 0
             if self.total > 0:
                 percentage = 100 * count / self.total
-            line = "(%3d%%) %10d of %10d %s %s" % (
-                percentage, count, self.total, self.items_plural, self.verb_past
-            )
+            if self.total is None:
+                line = "%10d %s %s" % (
+                    count, self.items_plural, self.verb_past
+                )
+            else:
+                line = "(%3d%%) %10d of %10d %s %s" % (
+                    percentage, count, self.total, self.items_plural,
+                    self.verb_past
+                )
             if percentage > 1 and percentage < 100:
                 time_elapsed = self.last_print - self.first_print
                 ratio = (float(self.total) / (count) - 1.0)
@@ -1946,7 +2147,7 @@ class ProgressCounter(object):
             sys.stdout.write(line)
             sys.stdout.flush()
             self.print_count += 1
-        if count == self.total - 1:
+        if self.total is not None and count == self.total - 1:
             print "\n"
 
 
@@ -2029,3 +2230,12 @@ class FileUtils(object):
     def get_file_name(cls, path):
         file_name, _ = os.path.splitext(os.path.basename(path))
         return file_name
+
+    @classmethod
+    def get_file_hash(cls, path, block_size=65536):
+        """ Get the sha1 hex digest of a file's contents. """
+        digest = hashlib.sha1()
+        with open(path, 'rb') as file_:
+            for block in iter(lambda: file_.read(block_size), b''):
+                digest.update(block)
+        return digest.hexdigest()
@@ -0,0 +1,205 @@
+"""
+Store api data as JSON Lines so that records can be streamed and upserted.
+"""
+
+from __future__ import absolute_import
+
+import gzip
+import json
+import os
+from collections import OrderedDict
+
+from .core import Registrar, SanitationUtils
+
+
+class JsonLinesCache(Registrar):
+    """
+    A file of api records, one JSON object per line, gzipped if the path ends
+    with `.gz`.
+
+    Records are upserted by appending them to the file. An index of the
+    offset of the latest line of each record by its `key` is kept next to
+    the file, so a superseded line is skipped when the file is streamed, and
+    the file is only rewritten when it is compacted.
+
+    If the file is about to be overwritten with `write`, pass `truncate` to
+    skip loading its index.
+    """
+    extensions = ('.jsonl', '.jsonl.gz')
+    index_suffix = '.index.json'
+    compresslevel = 1
+
+    def __init__(self, path, key='id', truncate=False):
+        self.path = path
+        self.key = key
+        self.offsets = OrderedDict()
+        self.length = 0
+        self.line_count = 0
+        if not truncate:
+            self.load_index()
+
+    @classmethod
+    def is_jsonl_path(cls, path):
+        return bool(path) and path.endswith(cls.extensions)
+
+    @property
+    def compressed(self):
+        return self.path.endswith('.gz')
+
+    @property
+    def index_path(self):
+        return self.path + self.index_suffix
+
+    @property
+    def superseded_count(self):
+        """ The number of lines which a later line of the same record replaces. """
+        return self.line_count - len(self.offsets)
+
+    def open(self, mode):
+        if self.compressed:
+            if 'r' in mode:
+                return gzip.open(self.path, mode)
+            return gzip.open(self.path, mode, self.compresslevel)
+        return open(self.path, mode)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, key):
+        return key in self.offsets
+
+    def get_key(self, record):
+        return record.get(self.key) if isinstance(record, dict) else None
+
+    def load_index(self):
+        """
+        Load the index if it matches the file on disk, otherwise rebuild it by
+        reading every line of the file.
+        """
+        if not os.path.exists(self.path):
+            return
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as index_file:
+                index = json.load(index_file)
+            if index.get('file_size') == os.path.getsize(self.path) \
+                    and index.get('key') == self.key:
+                self.offsets = OrderedDict(
+                    (key, offset) for key, offset in index['offsets']
+                )
+                self.length = index['length']
+                self.line_count = index['line_count']
+                return
+
+        if self.DEBUG_MESSAGE:
+            self.register_message("rebuilding index of %s" % self.path)
+        for offset, line in self.iter_offset_lines():
+            self.length = offset + len(line)
+            if line.strip():
+                self.index_record(offset, SanitationUtils.decode_json(line))
+        self.save_index()
+
+    def save_index(self):
+        with open(self.index_path, 'w') as index_file:
+            json.dump({
+                'key': self.key,
+                'file_size': os.path.getsize(self.path),
+                'length': self.length,
+                'line_count': self.line_count,
+                'offsets': self.offsets.items(),
+            }, index_file)
+
+    def index_record(self, offset, record):
+        key = self.get_key(record)
+        if key is not None:
+            self.offsets[key] = offset
+        self.line_count += 1
+
+    def iter_offset_lines(self):
+        """ Yield the offset and contents of every line in the file. """
+        offset = 0
+        with self.open('rb') as cache_file:
+            for line in iter(cache_file.readline, b''):
+                yield offset, line
+                offset += len(line)
+
+    def __iter__(self):
+        """
+        Yield the latest version of every record in the order of the file,
+        so a record which has been upserted is yielded where it was appended.
+        """
+        for offset, line in self.iter_offset_lines():
+            if not line.strip():
+                continue
+            record = SanitationUtils.decode_json(line)
+            key = self.get_key(record)
+            if key is None or self.offsets.get(key) == offset:
+                yield record
+
+    def get(self, key, default=None):
+        """ Read the latest version of the record with `key`. """
+        if key not in self.offsets:
+            return default
+        with self.open('rb') as cache_file:
+            cache_file.seek(self.offsets[key])
+            return SanitationUtils.decode_json(cache_file.readline())
+
+    def encode_record(self, record, **kwargs):
+        line = SanitationUtils.encode_json(record, **kwargs)
+        if isinstance(line, unicode):
+            line = line.encode('utf8')
+        return line + b'\n'
+
+    def upsert(self, records, **kwargs):
+        """
+        Append `records` to the file, replacing any record with the same key.
+        `kwargs` are passed to `SanitationUtils.encode_json`.
+        """
+        count = 0
+        with self.open('ab') as cache_file:
+            for record in records:
+                line = self.encode_record(record, **kwargs)
+                cache_file.write(line)
+                self.index_record(self.length, record)
+                self.length += len(line)
+                count += 1
+        self.save_index()
+        return count
+
+    def write(self, records, **kwargs):
+        """
+        Replace the contents of the file with `records`. They are written to
+        a temporary file which is only renamed over the file once they have
+        all been written, so the file is left as it was if `records` raises.
+        """
+        tmp_path = os.path.join(
+            os.path.dirname(self.path), 'tmp-' + os.path.basename(self.path)
+        )
+        tmp_cache = JsonLinesCache(tmp_path, self.key, truncate=True)
+        for path in [tmp_path, tmp_cache.index_path]:
+            if os.path.exists(path):
+                os.remove(path)
+        try:
+            with tmp_cache.open('wb'):
+                pass
+            count = tmp_cache.upsert(records, **kwargs)
+        except BaseException:
+            for path in [tmp_path, tmp_cache.index_path]:
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+        os.rename(tmp_path, self.path)
+        os.remove(tmp_cache.index_path)
+        self.offsets = tmp_cache.offsets
+        self.length = tmp_cache.length
+        self.line_count = tmp_cache.line_count
+        self.save_index()
+        return count
+
+    def compact(self, force=False):
+        """
+        Rewrite the file without superseded lines if they outnumber the
+        records, or if `force`.
+        """
+        if not (force or self.superseded_count > len(self)):
+            return
+        self.write(self)
@@ -789,6 +789,18 @@ def do_main_summary_group(reporter, matches, updates, parsers, settings):
             data=render_help_instructions
         )
     )
+    if getattr(parsers, 'cache_counts', None):
+        group.add_section(
+            reporter.Section(
+                'cache_counts',
+                title='Caches',
+                description=(
+                    "Items reused from the caches of previous runs (hits) and "
+                    "items which were processed again (misses)."
+                ),
+                data=parsers.get_cache_summary_text
+            )
+        )
     if group:
         reporter.add_group(group)
 